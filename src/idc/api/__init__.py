@@ -1,5 +1,6 @@
+import importlib
+
 from ._colors import rgb2yiq, text_color
-from ._fonts import DEFAULT_FONT_FAMILY, load_font, text_size
 from ._data import ImageData, jpeg_quality, array_to_image, empty_image, save_image
 from ._data import FORMATS, FORMAT_JPEG, FORMAT_PNG, FORMAT_BMP, FORMAT_EXTENSIONS
 from ._data import ensure_rgb, rgb_required_info, ensure_grayscale, grayscale_required_info, ensure_binary, binary_required_info, binarize_image, image_to_bytesio, remove_alpha, ensure_indexed_palette
@@ -7,16 +8,58 @@ from ._data import REQUIRED_FORMAT_ANY, REQUIRED_FORMAT_RGB, REQUIRED_FORMAT_GRA
 from ._depth import DepthData, DepthInformation, depth_to_grayscale, depth_from_grayscale
 from ._device import DEVICES, DEVICE_AUTO, DEVICE_CPU, DEVICE_CUDA
 from ._imgcls import ImageClassificationData
-from ._imgseg import ImageSegmentationData, ImageSegmentationAnnotations, combine_layers, split_layers
+from ._imgseg import ImageSegmentationData, ImageSegmentationAnnotations, combine_layers, composite_layers, split_layers
+from ._imgseg import Layers, PackedLayer, CroppedLayer, RLELayer, encode_layer, index_map_dtype, remap_index_map, split_index_map, split_values, default_layer_storage, LAYER_STORAGES, LAYER_STORAGE_DENSE, LAYER_STORAGE_PACKED, LAYER_STORAGE_CROPPED, LAYER_STORAGE_RLE, IDC_LAYER_STORAGE
 from ._imgseg import imgseg_from_indexedpng, imgseg_from_bluechannel, imgseg_from_grayscale, imgseg_to_indexedpng, imgseg_to_grayscale, imgseg_to_bluechannel, imgseg_from_instancepng
 from ._imgseg import from_indexedpng, from_bluechannel, from_grayscale, to_indexedpng, to_bluechannel, to_grayscale
-from ._objdet import ObjectDetectionData, get_object_label, set_object_label, DEFAULT_LABEL, LABEL_KEY
-from ._utils import locate_image, load_image_from_bytes, load_image_from_file, JPEG_EXTENSIONS, PNG_EXTENSIONS
+from ._rle import rle_encode, rle_encode_region, polygon_to_rle, rle_decode, rle_compress, rle_decompress, rle_area, rle_bbox, mask_to_coco_rle, coco_rle_counts, coco_rle_to_mask, is_coco_rle, KEY_RLE, KEY_RLE_SIZE, KEY_RLE_CROWD
+from ._objdet import ObjectDetectionData, ColumnarLocatedObjects, get_object_label, set_object_label, DEFAULT_LABEL, LABEL_KEY
+from ._utils import locate_image, locate_file_cached, clear_locate_cache, image_size_from_annotation, load_image_from_bytes, load_image_from_file, JPEG_EXTENSIONS, PNG_EXTENSIONS, IMAGE_EXTENSIONS
 from ._utils import load_labels, save_labels, save_labels_csv
 from ._utils import crop_image, pad_image
 from ._data_types import DATATYPE_DEPTH, DATATYPE_IMGCLS, DATATYPE_OBJDET, DATATYPE_IMGSEG, DATATYPES, DATATYPES_LONG, data_type_to_class, data_types_help, DataTypeSupporter
-from ._geometry import locatedobjects_to_shapely, shapely_to_locatedobject, locatedobject_polygon_to_shapely, locatedobject_bbox_to_shapely
-from ._geometry import intersect_over_union, COMBINATIONS, INTERSECT, UNION
-from ._geometry import merge_polygons, fit_located_object, fit_layers, fit_matrix, adjust_matrix
-from ._contours import MIN_RECT_WIDTH, MIN_RECT_HEIGHT, contours_to_objdet, objdet_from_instancepng
+from ._rasterize import Rasterizer, locatedobject_to_points, RASTERIZERS, RASTERIZER_PIL, RASTERIZER_CV2, DEFAULT_RASTERIZER
 from ._filter import APPLY_TO, APPLY_TO_IMAGE, APPLY_TO_ANNOTATIONS, APPLY_TO_BOTH, add_apply_to_param
+
+# modules with heavy dependencies (matplotlib, OpenCV, shapely) only get imported on first use
+_LAZY_IMPORTS = {
+    "._fonts": [
+        "DEFAULT_FONT_FAMILY", "load_font", "text_size",
+    ],
+    "._geometry": [
+        "locatedobjects_to_shapely", "shapely_to_locatedobject", "shapely_to_locatedobjects",
+        "locatedobject_polygon_to_shapely", "locatedobject_bbox_to_shapely", "intersect_over_union",
+        "locatedobjects_to_bboxes", "bbox_iou_matrix", "polygon_iou_matrix", "COMBINATIONS", "INTERSECT", "UNION",
+        "merge_polygons", "fit_located_object", "fit_layers", "fit_matrix", "adjust_matrix",
+    ],
+    "._contours": [
+        "MIN_RECT_WIDTH", "MIN_RECT_HEIGHT", "contours_to_objdet", "objdet_from_instancepng", "label_map_bboxes",
+        "label_map_contours", "layer_contours", "mask_contours",
+    ],
+}
+_LAZY_NAMES = {name: module for module, names in _LAZY_IMPORTS.items() for name in names}
+
+
+def __getattr__(name: str):
+    """
+    Imports the modules with heavy dependencies on first access of one of their names.
+
+    :param name: the name to look up
+    :type name: str
+    :return: the object associated with the name
+    """
+    if name in _LAZY_NAMES:
+        value = getattr(importlib.import_module(_LAZY_NAMES[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError("module '%s' has no attribute '%s'" % (__name__, name))
+
+
+def __dir__():
+    """
+    Returns the names available in the module, including the ones that get imported lazily.
+
+    :return: the names
+    :rtype: list
+    """
+    return sorted(set(globals().keys()) | set(_LAZY_NAMES.keys()))
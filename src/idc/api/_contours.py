@@ -1,38 +1,17 @@
 import logging
+from typing import Dict, Iterator, Tuple
 
 import cv2
 import numpy as np
+import shapely
 from PIL import Image
-from shapely import Polygon
 from wai.common.adams.imaging.locateobjects import LocatedObjects
-from ._geometry import shapely_to_locatedobject
+from ._geometry import shapely_to_locatedobjects
 
 MIN_RECT_WIDTH = "min_rect_width"
 MIN_RECT_HEIGHT = "min_rect_height"
 
 
-def _check_dimension(dim, min_size: int = None, max_size: int = None) -> bool:
-    """
-    Checks whether the dimension fits the min/max size.
-
-    :param dim: the width/height to check
-    :type dim: int
-    :param min_size: the minimum size
-    :type min_size: int or None
-    :param max_size: the maximum size
-    :type max_size: int or None
-    :return: True if within specified min/max
-    :rtype: bool
-    """
-    if min_size is not None:
-        if dim < min_size:
-            return False
-    if max_size is not None:
-        if dim > max_size:
-            return False
-    return True
-
-
 def contours_to_objdet(contours, ann: LocatedObjects, label: str, min_size: int = None, max_size: int = None,
                        calculate_min_rect: bool = False):
     """
@@ -50,29 +29,122 @@ def contours_to_objdet(contours, ann: LocatedObjects, label: str, min_size: int
     :param calculate_min_rect: whether to calculate the min_rect width/height as well
     :type calculate_min_rect: bool
     """
-    for i in range(len(contours)):
-        if len(contours[i]) > 2:
-            polygon = Polygon(np.squeeze(contours[i]))
-            # Convert invalid polygon to valid
-            if not polygon.is_valid:
-                polygon = polygon.buffer(0)
-            if polygon.area == 0.0:
-                continue
-            lobj = shapely_to_locatedobject(polygon, label=label)
-            if min_size is not None:
-                if not _check_dimension(lobj.width) or not _check_dimension(lobj.height, min_size=min_size, max_size=max_size):
-                    continue
-            if max_size is not None:
-                if not _check_dimension(lobj.width) or not _check_dimension(lobj.height, min_size=min_size, max_size=max_size):
-                    continue
-            if calculate_min_rect:
-                rect = cv2.minAreaRect(contours[i])
-                (_, _), (w, h), angle = rect
-                if not _check_dimension(w) or not _check_dimension(h):
-                    continue
-                lobj.metadata[MIN_RECT_WIDTH] = w
-                lobj.metadata[MIN_RECT_HEIGHT] = h
-            ann.append(lobj)
+    # only contours with at least three points
+    contours = [contour for contour in contours if len(contour) > 2]
+    if len(contours) == 0:
+        return
+
+    # create all polygons at once
+    lengths = np.array([len(contour) for contour in contours])
+    coords = np.concatenate([contour.reshape((-1, 2)) for contour in contours])
+    polygons = shapely.polygons(shapely.linearrings(coords, indices=np.repeat(np.arange(len(contours)), lengths)))
+
+    # Convert invalid polygons to valid
+    invalid = ~shapely.is_valid(polygons)
+    if np.any(invalid):
+        polygons[invalid] = shapely.buffer(polygons[invalid], 0)
+
+    # filter on area and size before creating any objects
+    keep = shapely.area(polygons) != 0.0
+    bounds = shapely.bounds(polygons)
+    widths = np.trunc(bounds[:, 2] - bounds[:, 0] + 1)
+    heights = np.trunc(bounds[:, 3] - bounds[:, 1] + 1)
+    if min_size is not None:
+        keep &= (widths >= min_size) & (heights >= min_size)
+    if max_size is not None:
+        keep &= (widths <= max_size) & (heights <= max_size)
+
+    keep = np.flatnonzero(keep)
+    for i, lobj in zip(keep.tolist(), shapely_to_locatedobjects(polygons[keep], label=label)):
+        if calculate_min_rect:
+            rect = cv2.minAreaRect(contours[i])
+            (_, _), (w, h), angle = rect
+            lobj.metadata[MIN_RECT_WIDTH] = w
+            lobj.metadata[MIN_RECT_HEIGHT] = h
+        ann.append(lobj)
+
+
+def label_map_bboxes(arr: np.ndarray, background: int = 0) -> Dict[int, Tuple[int, int, int, int]]:
+    """
+    Determines the bounding boxes of all the values in the label map in a single pass.
+
+    :param arr: the label map to analyze (2D array of integers)
+    :type arr: np.ndarray
+    :param background: the value of the background, which gets skipped
+    :type background: int
+    :return: the value -> bbox (x0, y0, x1, y1; inclusive) mapping
+    :rtype: dict
+    """
+    width = arr.shape[1]
+    flat = arr.ravel()
+    pos = np.flatnonzero(flat != background)
+    if len(pos) == 0:
+        return dict()
+    values = flat[pos]
+    # stable sort (radix sort for 8/16 bit) keeps positions ascending per value
+    order = np.argsort(values, kind="stable")
+    values = values[order]
+    pos = pos[order]
+    starts = np.flatnonzero(np.concatenate(([True], values[1:] != values[:-1])))
+    ys = pos // width
+    xs = pos - ys * width
+    x0 = np.minimum.reduceat(xs, starts)
+    x1 = np.maximum.reduceat(xs, starts)
+    y0 = ys[starts]
+    y1 = ys[np.append(starts[1:], len(ys)) - 1]
+    result = dict()
+    for i, value in enumerate(values[starts].tolist()):
+        result[value] = (int(x0[i]), int(y0[i]), int(x1[i]), int(y1[i]))
+    return result
+
+
+def mask_contours(mask: np.ndarray, x: int = 0, y: int = 0):
+    """
+    Determines the contours in the binary mask, which is located at x/y in the image.
+
+    :param mask: the mask to analyze, anything >0 is considered foreground
+    :type mask: np.ndarray
+    :param x: the horizontal position of the mask in the image
+    :type x: int
+    :param y: the vertical position of the mask in the image
+    :type y: int
+    :return: the contours, using image coordinates
+    """
+    # add 1 pixel border, as findContours does not handle objects at the image border
+    padded = np.zeros((mask.shape[0] + 2, mask.shape[1] + 2), dtype=np.uint8)
+    np.greater(mask, 0, out=padded[1:-1, 1:-1].view(bool))
+    contours, _ = cv2.findContours(padded, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE, offset=(x - 1, y - 1))
+    return contours
+
+
+def layer_contours(layer: np.ndarray):
+    """
+    Determines the contours in the binary layer, only analyzing the bounding box of the annotated pixels.
+
+    :param layer: the layer to analyze, anything >0 is considered foreground
+    :type layer: np.ndarray
+    :return: the contours
+    """
+    rows = np.flatnonzero(layer.any(axis=1))
+    if len(rows) == 0:
+        return ()
+    cols = np.flatnonzero(layer.any(axis=0))
+    return mask_contours(layer[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1], x=int(cols[0]), y=int(rows[0]))
+
+
+def label_map_contours(arr: np.ndarray, background: int = 0) -> Iterator[Tuple[int, Tuple]]:
+    """
+    Determines the contours for all the values in the label map. Locates all the values in a single pass
+    and then only analyzes the bounding box of each of the values.
+
+    :param arr: the label map to analyze (2D array of integers)
+    :type arr: np.ndarray
+    :param background: the value of the background, which gets skipped
+    :type background: int
+    :return: iterator of value and associated contours, in ascending order of values
+    """
+    for value, (x0, y0, x1, y1) in label_map_bboxes(arr, background=background).items():
+        yield value, mask_contours(arr[y0:y1 + 1, x0:x1 + 1] == value, x=x0, y=y0)
 
 
 def objdet_from_instancepng(img: Image.Image, label: str, min_size: int = None, max_size: int = None,
@@ -92,21 +164,20 @@ def objdet_from_instancepng(img: Image.Image, label: str, min_size: int = None,
     :type max_size: int
     :param logger: the (optional) logger for logging messages
     :type logger: logging.Logger
-    :param background: the index (0-255) of the background, default 0
+    :param background: the index of the background, default 0
     :type background: int
     :return: the generated annotations
     :rtype: LocatedObjects
     """
-    arr = np.asarray(img).astype(np.uint8)
-    unique = np.unique(arr)
+    arr = np.asarray(img)
+    # 16/32 bit images can contain more than 255 instances
+    if arr.dtype.kind not in "ui":
+        arr = arr.astype(np.uint8)
     result = LocatedObjects()
-    for index in list(unique):
-        # skip background
-        if index == background:
+    for index, contours in label_map_contours(arr, background=background):
+        # 0 is never an instance
+        if index == 0:
             continue
-        layer = np.where(arr == index, arr, 0)
-        layer = np.where(layer > 0, 1, 0)
-        contours, _ = cv2.findContours(np.array(layer).astype(np.uint8), cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
         if logger is not None:
             logger.info("%s - # of contours: %s" % (label, str(len(contours))))
         contours_to_objdet(contours, result, label, min_size=min_size, max_size=max_size)
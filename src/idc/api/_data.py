@@ -159,6 +159,59 @@ def empty_image(mode: str, width: int, height: int, image_format: str) -> Tuple[
     return img, img_bytes
 
 
+class _CopyOnWrite:
+    """
+    Holds a value that is shared between containers. A container that requests the value
+    while other containers still share it receives its own (deep) copy, i.e., the copy happens
+    on first access through the container's property (as the value could get modified afterwards),
+    not on the actual modification. Read-only checks within the containers use _peek instead.
+    """
+
+    def __init__(self, value: Any):
+        """
+        Initializes the wrapper.
+
+        :param value: the value to share
+        """
+        self.value = value
+        self.num_shared = 1
+
+    def acquire(self) -> '_CopyOnWrite':
+        """
+        Registers another container that shares the value.
+
+        :return: itself
+        :rtype: _CopyOnWrite
+        """
+        self.num_shared += 1
+        return self
+
+    def release(self, copy_value: bool = True) -> Any:
+        """
+        Removes a container from sharing the value.
+
+        :param copy_value: whether to return a copy of the value if still shared by other containers
+        :type copy_value: bool
+        :return: the value, a copy if still shared (and copy_value is True)
+        """
+        self.num_shared -= 1
+        if copy_value and (self.num_shared > 0):
+            return copy.deepcopy(self.value)
+        return self.value
+
+
+def _peek(value: Any) -> Any:
+    """
+    Returns the actual value, without copying values that are shared between containers.
+
+    :param value: the value or _CopyOnWrite wrapper
+    :return: the actual value
+    """
+    if isinstance(value, _CopyOnWrite):
+        return value.value
+    return value
+
+
 class ImageData(AnnotationHandler, MetaDataHandler, NameSupporter, SourceSupporter, BytesSupporter, LoggingHandler):
 
     def __init__(self, source: str = None, image_name: str = None, data: bytes = None,
@@ -179,7 +232,11 @@ class ImageData(AnnotationHandler, MetaDataHandler, NameSupporter, SourceSupport
         self._data = data
         """ the binary image data. """
         self._image = image
-        """ the Pillow image. """
+        """ the Pillow image (or _CopyOnWrite wrapper when shared with duplicates). """
+        self._image_loaded = False
+        """ whether the Pillow image was loaded from the data/source, i.e., can be reloaded. """
+        self._image_replaced = False
+        """ whether the Pillow image replaced the one of the source, i.e., the source no longer represents it. """
         self._image_format = image_format
         """ the format of the image. """
         self._image_size = image_size
@@ -187,7 +244,7 @@ class ImageData(AnnotationHandler, MetaDataHandler, NameSupporter, SourceSupport
         self._metadata = metadata
         """ the dictionary with optional meta-data. """
         self._annotation = None
-        """ the associated annotation data. """
+        """ the associated annotation data (or _CopyOnWrite wrapper when shared with duplicates). """
         self.annotation = annotation
 
     def logger(self) -> logging.Logger:
@@ -214,21 +271,26 @@ class ImageData(AnnotationHandler, MetaDataHandler, NameSupporter, SourceSupport
     @property
     def image(self) -> Optional[Image.Image]:
         """
-        Returns the image, loads it if necessary.
+        Returns the image, loads it if necessary. If the image is still shared with
+        other containers (see duplicate), the container receives its own copy first.
 
         :return: the pillow image data structure, None if not available or failed to load
         :rtype: Image.Image
         """
+        if isinstance(self._image, _CopyOnWrite):
+            self._image = self._image.release()
         if self._image is not None:
             return self._image
         if self._data is not None:
             self._image = load_image_from_bytes(self._data)
             self._image_format = self._image.format
+            self._image_loaded = True
             return self._image
         if self._source is not None:
             self._image_name = os.path.basename(self._source)
             self._image = Image.open(self._source)
             self._image_format = self._image.format
+            self._image_loaded = True
             return self._image
         return None
 
@@ -242,10 +304,25 @@ class ImageData(AnnotationHandler, MetaDataHandler, NameSupporter, SourceSupport
         """
         if self._data is not None:
             return self._data
-        if self._source is not None:
+        if (self._source is not None) and not self._image_replaced:
             with open(self._source, "rb") as fp:
                 return fp.read()
-        return image_to_bytesio(self.image, self.image_format).getvalue()
+        if self._image is None:
+            return None
+        # encode the in-memory image only once
+        self._data = image_to_bytesio(_peek(self._image), self.image_format).getvalue()
+        return self._data
+
+    @property
+    def image_dirty(self) -> bool:
+        """
+        Returns whether the container only holds the in-memory image, i.e., the image has not been
+        encoded into bytes yet (which happens on demand, e.g., when saving the image).
+
+        :return: True if only the in-memory image is available
+        :rtype: bool
+        """
+        return (self._image is not None) and (self._data is None) and ((self._source is None) or self._image_replaced)
 
     @property
     def image_name(self) -> Optional[str]:
@@ -275,13 +352,14 @@ class ImageData(AnnotationHandler, MetaDataHandler, NameSupporter, SourceSupport
     @property
     def image_format(self) -> Optional[str]:
         """
-        Returns the format of the image.
+        Returns the format of the image. Determined from the source/data if necessary, falls back on
+        the extension of the image name for in-memory images.
 
         :return: the image format, can be None
         :rtype: str
         """
         if self._image_format is None:
-            if self.source is not None:
+            if (self.source is not None) and not self._image_replaced:
                 to_check = self.source
             else:
                 to_check = self.data
@@ -293,8 +371,11 @@ class ImageData(AnnotationHandler, MetaDataHandler, NameSupporter, SourceSupport
                 elif is_bmp(to_check):
                     self._image_format = FORMAT_BMP
         if self._image_format is None:
-            if self.image is None:
+            if (_peek(self._image) is None) and (self.image is None):
                 return None
+        # in-memory image without bytes/source? use the format implied by the extension of the name
+        if (self._image_format is None) and (self._image_name is not None):
+            self._image_format = Image.registered_extensions().get(os.path.splitext(self._image_name)[1].lower())
         return self._image_format
 
     @property
@@ -319,7 +400,7 @@ class ImageData(AnnotationHandler, MetaDataHandler, NameSupporter, SourceSupport
                 # imagesize < 2.0.0 throws an exception for invalid images
                 pass
 
-        if self._source is not None:
+        if (self._source is not None) and not self._image_replaced:
             try:
                 size = imagesize.get(self._source)
                 # imagesize >= 2.0.0 returns (-1, -1) for invalid images
@@ -330,8 +411,12 @@ class ImageData(AnnotationHandler, MetaDataHandler, NameSupporter, SourceSupport
                 # imagesize < 2.0.0 throws an exception for invalid images
                 pass
 
-        if self.image is not None:
-            return self.image.size
+        # avoid copying an image that is shared with other containers
+        image = _peek(self._image)
+        if image is None:
+            image = self.image
+        if image is not None:
+            return image.size
 
         return None
 
@@ -405,11 +490,18 @@ class ImageData(AnnotationHandler, MetaDataHandler, NameSupporter, SourceSupport
             if not os.path.exists(parent_dir):
                 self.logger().info("Creating dir: %s" % parent_dir)
                 os.makedirs(parent_dir)
-        if (self._data is None) and (self._source is not None) and (os.path.exists(self._source)):
+        if (self._data is None) and (self._source is not None) and (not self._image_replaced) and (os.path.exists(self._source)):
             shutil.copy(self._source, path)
             return True
         if self._image is not None:
-            save_image(self._image, path)
+            # image generated in memory? encode it only once in the container's format if possible
+            if (not self._image_loaded) and ((self._data is not None) or (self._source is None) or self._image_replaced) \
+                    and (self.image_format is not None) \
+                    and (Image.registered_extensions().get(os.path.splitext(path)[1].lower()) == self.image_format):
+                with open(path, "wb") as fp:
+                    fp.write(self.image_bytes)
+                return True
+            save_image(_peek(self._image), path)
             return True
         if self._data is not None:
             with open(path, "wb") as fp:
@@ -420,10 +512,13 @@ class ImageData(AnnotationHandler, MetaDataHandler, NameSupporter, SourceSupport
     @property
     def annotation(self) -> Optional[Any]:
         """
-        Returns the current annotation, if any.
+        Returns the current annotation, if any. If the annotation is still shared with
+        other containers (see duplicate), the container receives its own copy first.
 
         :return: the annotation
         """
+        if isinstance(self._annotation, _CopyOnWrite):
+            self._annotation = self._annotation.release()
         return self._annotation
 
     @annotation.setter
@@ -433,6 +528,8 @@ class ImageData(AnnotationHandler, MetaDataHandler, NameSupporter, SourceSupport
 
         :param ann: the annotation, can be None
         """
+        if isinstance(self._annotation, _CopyOnWrite):
+            self._annotation.release(copy_value=False)
         self._annotation = self._check_annotation(ann)
 
     def _is_correct_annotation_type(self, ann: Any):
@@ -463,7 +560,16 @@ class ImageData(AnnotationHandler, MetaDataHandler, NameSupporter, SourceSupport
         :return: True if annotations present
         :rtype: bool
         """
-        return self.annotation is not None
+        return self._peek_annotation() is not None
+
+    def _peek_annotation(self) -> Optional[Any]:
+        """
+        Returns the annotation for read-only access, without copying an annotation that is
+        still shared with other containers. The returned annotation must not be modified.
+
+        :return: the annotation, if any
+        """
+        return _peek(self._annotation)
 
     def set_annotation(self, ann: Optional[Any]):
         """
@@ -551,6 +657,12 @@ class ImageData(AnnotationHandler, MetaDataHandler, NameSupporter, SourceSupport
                   metadata: Dict = None, annotation=None):
         """
         Duplicates the container overwriting existing data with any provided data.
+        Bytes are shared, as they are immutable. When providing an image without data, the data and size
+        of this container get dropped and the image is treated as not yet encoded. Images and annotations get shared with copy-on-write
+        semantics: a container only receives its own copy when accessing them through the image/annotation
+        properties while they are still shared with other containers (copy on first access rather than on
+        modification); read-only checks like has_annotation, to_dict and image_size do not copy. Only the meta-data gets copied immediately, so duplicating
+        a container for updating its meta-data is cheap.
 
         :param source: the source to use
         :type source: str
@@ -578,23 +690,59 @@ class ImageData(AnnotationHandler, MetaDataHandler, NameSupporter, SourceSupport
                 source = self._source
         if name is None:
             name = self._image_name
-        if data is None:
-            data = safe_deepcopy(self._data)
-        # if the source changes, we need to force loading the image
-        if ((image is None) and (self._image is not None)) or (source != self._source):
-            image = copy.deepcopy(self.image)
+        replace_image = (image is not None) and (data is None)
+        share_image = False
+        if image is None:
+            # if the source changes, we need to force loading the image
+            if source != self._source:
+                self.image
+            share_image = (self._image is not None)
+        if (data is None) and not replace_image:
+            data = self._data
         if image_format is None:
-            image_format = self._image_format
-        if size is None:
-            size = safe_deepcopy(self._image_size)
+            # the format can no longer be determined from the data/source once the image got replaced
+            image_format = self.image_format if replace_image else self._image_format
+        if (size is None) and not replace_image:
+            size = self._image_size
         if metadata is None:
             metadata = safe_deepcopy(self._metadata)
-        if annotation is None:
-            annotation = safe_deepcopy(self.annotation)
 
-        return type(self)(source=source, image_name=name, data=data,
-                          image=image, image_format=image_format, image_size=size,
-                          metadata=metadata, annotation=annotation)
+        result = type(self)(source=source, image_name=name, data=data,
+                            image=image, image_format=image_format, image_size=size,
+                            metadata=metadata, annotation=annotation)
+        if share_image:
+            result._image = self._share("_image")
+            result._image_loaded = self._image_loaded and (data is self._data) and (source == self._source)
+            result._image_replaced = self._image_replaced
+        elif replace_image:
+            result._image_replaced = True
+        if (annotation is None) and (self._annotation is not None):
+            result._annotation = self._share("_annotation")
+        return result
+
+    def _share(self, attr: str) -> _CopyOnWrite:
+        """
+        Wraps the value of the attribute for sharing it with another container.
+
+        :param attr: the name of the attribute to share
+        :type attr: str
+        :return: the wrapper that the other container needs to use
+        :rtype: _CopyOnWrite
+        """
+        value = getattr(self, attr)
+        if not isinstance(value, _CopyOnWrite):
+            value = _CopyOnWrite(value)
+            setattr(self, attr, value)
+        return value.acquire()
+
+    def __del__(self):
+        """
+        Stops sharing any images/annotations with other containers.
+        """
+        for attr in ["_image", "_annotation"]:
+            value = self.__dict__.get(attr)
+            if isinstance(value, _CopyOnWrite):
+                value.release(copy_value=False)
 
     def _annotation_to_dict(self):
         """
@@ -605,6 +753,24 @@ class ImageData(AnnotationHandler, MetaDataHandler, NameSupporter, SourceSupport
         """
         raise NotImplementedError()
 
+    def __getstate__(self) -> Dict:
+        """
+        Returns the state for pickling, e.g., when sending the container to another process.
+        Images that were loaded from the data/source get omitted, as they can be reloaded
+        from the (much smaller) encoded bytes.
+
+        :return: the state
+        :rtype: dict
+        """
+        result = self.__dict__.copy()
+        result["_logger"] = None
+        result["_image"] = _peek(self._image)
+        result["_annotation"] = _peek(self._annotation)
+        if self._image_loaded:
+            result["_image"] = None
+            result["_image_loaded"] = False
+        return result
+
     def to_dict(self, source: bool = True, image: bool = True, annotation: bool = True, metadata: bool = True):
         """
         Returns itself as a dictionary that can be saved as JSON.
@@ -633,7 +799,7 @@ class ImageData(AnnotationHandler, MetaDataHandler, NameSupporter, SourceSupport
             result["height"] = self.image_height
         if image:
             result["image"] = base64.encodebytes(self.image_bytes).decode("ascii")
-        if annotation and (self.annotation is not None):
+        if annotation and (self._peek_annotation() is not None):
             result["annotation"] = self._annotation_to_dict()
         if metadata and (self.get_metadata() is not None):
             result["metadata"] = copy.deepcopy(self.get_metadata())
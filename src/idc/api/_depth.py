@@ -59,7 +59,8 @@ class DepthData(ImageData):
         :return: True if annotations present
         :rtype: bool
         """
-        return (self.annotation is not None) and (self.annotation.size > 0)
+        ann = self._peek_annotation()
+        return (ann is not None) and (ann.size > 0)
 
     def _is_correct_annotation_type(self, ann: Any):
         """
@@ -92,7 +93,7 @@ class DepthData(ImageData):
         :rtype: dict
         """
         return {
-            "depth": base64.encodebytes(self.annotation.data.tobytes()).decode("ascii")
+            "depth": base64.encodebytes(self._peek_annotation().data.tobytes()).decode("ascii")
         }
 
 
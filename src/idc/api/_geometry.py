@@ -1,11 +1,10 @@
 import logging
-import math
 import numpy as np
 import statistics
 from typing import List, Optional
 
 import shapely
-from shapely import Polygon, MultiPolygon, LineString, GeometryCollection, distance
+from shapely import Polygon, MultiPolygon, GeometryCollection, STRtree
 from shapely.geometry.base import BaseGeometry
 from shapely.ops import unary_union
 from wai.common.adams.imaging.locateobjects import LocatedObjects, LocatedObject
@@ -88,6 +87,50 @@ def shapely_to_locatedobject(geometry: BaseGeometry, label: str = None) -> Locat
     return result
 
 
+def shapely_to_locatedobjects(geometries: np.ndarray, label: str = None) -> List[LocatedObject]:
+    """
+    Turns the array of shapely geometries back into located objects, processing all geometries at once.
+    Assumes absolute coordinates. Produces the same objects as shapely_to_locatedobject.
+
+    :param geometries: the geometries to convert
+    :type geometries: np.ndarray
+    :param label: the label to set (when not None)
+    :type label: str
+    :return: the generated objects
+    :rtype: list
+    """
+    geometries = np.array(geometries, dtype=object).ravel()
+    # use convex hull in case of MultiPolygon
+    type_ids = shapely.get_type_id(geometries)
+    multi = type_ids == shapely.GeometryType.MULTIPOLYGON
+    if np.any(multi):
+        geometries[multi] = shapely.convex_hull(geometries[multi])
+        type_ids = shapely.get_type_id(geometries)
+
+    bounds = shapely.bounds(geometries)
+    xs = np.trunc(bounds[:, 0]).astype(np.int64).tolist()
+    ys = np.trunc(bounds[:, 1]).astype(np.int64).tolist()
+    widths = np.trunc(bounds[:, 2] - bounds[:, 0] + 1).astype(np.int64).tolist()
+    heights = np.trunc(bounds[:, 3] - bounds[:, 1] + 1).astype(np.int64).tolist()
+
+    # coordinates of all polygons at once
+    polygons = np.flatnonzero(type_ids == shapely.GeometryType.POLYGON)
+    coords, index = shapely.get_coordinates(shapely.get_exterior_ring(geometries[polygons]), return_index=True)
+    coords = np.trunc(coords).astype(np.int64)
+    splits = np.searchsorted(index, np.arange(1, len(polygons)))
+    points = dict(zip(polygons.tolist(), np.split(coords, splits)))
+
+    result = []
+    for i in range(len(geometries)):
+        lobj = LocatedObject(xs[i], ys[i], widths[i], heights[i])
+        if label is not None:
+            lobj.metadata[LABEL_KEY] = label
+        if i in points:
+            lobj.set_polygon(WaiPolygon(*[WaiPoint(x=x, y=y) for x, y in points[i].tolist()]))
+        result.append(lobj)
+    return result
+
+
 def locatedobjects_to_shapely(located_objects: LocatedObjects) -> List[Polygon]:
     """
     Turns the located objects into shapely polygons.
@@ -126,6 +169,87 @@ def intersect_over_union(poly1: Polygon, poly2: Polygon) -> float:
         return 0
 
 
+def locatedobjects_to_bboxes(located_objects: LocatedObjects) -> np.ndarray:
+    """
+    Turns the bounding boxes of the located objects into a numpy array, using the same
+    coordinates as locatedobject_bbox_to_shapely.
+
+    :param located_objects: the objects to convert
+    :type located_objects: LocatedObjects
+    :return: the array of bboxes (N x 4: min x, min y, max x, max y)
+    :rtype: np.ndarray
+    """
+    result = np.zeros((len(located_objects), 4), dtype=np.float64)
+    for i, obj in enumerate(located_objects):
+        result[i] = (obj.x, obj.y, obj.x + obj.width - 1, obj.y + obj.height - 1)
+    return result
+
+
+def bbox_iou_matrix(bboxes1: np.ndarray, bboxes2: np.ndarray) -> np.ndarray:
+    """
+    Calculates the IoU (intersect over union) for all combinations of the two sets of bounding boxes.
+
+    :param bboxes1: the first set of bboxes (N x 4: min x, min y, max x, max y)
+    :type bboxes1: np.ndarray
+    :param bboxes2: the second set of bboxes (M x 4: min x, min y, max x, max y)
+    :type bboxes2: np.ndarray
+    :return: the IoU matrix (N x M)
+    :rtype: np.ndarray
+    """
+    bboxes1 = np.asarray(bboxes1, dtype=np.float64).reshape((-1, 4))
+    bboxes2 = np.asarray(bboxes2, dtype=np.float64).reshape((-1, 4))
+    width = np.minimum(bboxes1[:, None, 2], bboxes2[None, :, 2]) - np.maximum(bboxes1[:, None, 0], bboxes2[None, :, 0])
+    height = np.minimum(bboxes1[:, None, 3], bboxes2[None, :, 3]) - np.maximum(bboxes1[:, None, 1], bboxes2[None, :, 1])
+    intersection = np.clip(width, 0, None) * np.clip(height, 0, None)
+    area1 = (bboxes1[:, 2] - bboxes1[:, 0]) * (bboxes1[:, 3] - bboxes1[:, 1])
+    area2 = (bboxes2[:, 2] - bboxes2[:, 0]) * (bboxes2[:, 3] - bboxes2[:, 1])
+    union = area1[:, None] + area2[None, :] - intersection
+    result = np.zeros(intersection.shape, dtype=np.float64)
+    np.divide(intersection, union, out=result, where=intersection > 0)
+    return result
+
+
+def polygon_iou_matrix(polys1: List[BaseGeometry], polys2: List[BaseGeometry], prepared: bool = False) -> np.ndarray:
+    """
+    Calculates the IoU (intersect over union) for all combinations of the two sets of polygons.
+    Only pairs with intersecting bounding boxes (determined via STRtree) get compared or, if the
+    second set consists of prepared geometries (see shapely.prepare), only intersecting pairs.
+
+    :param polys1: the first set of polygons (N)
+    :type polys1: list
+    :param polys2: the second set of polygons (M)
+    :type polys2: list
+    :param prepared: whether the second set of polygons has been prepared, uses the accelerated intersects predicate instead of the STRtree
+    :type prepared: bool
+    :return: the IoU matrix (N x M)
+    :rtype: np.ndarray
+    """
+    polys1 = np.asarray(polys1, dtype=object).ravel()
+    polys2 = np.asarray(polys2, dtype=object).ravel()
+    result = np.zeros((len(polys1), len(polys2)), dtype=np.float64)
+    if (len(polys1) == 0) or (len(polys2) == 0):
+        return result
+
+    if prepared:
+        first, second = np.nonzero(shapely.intersects(polys2[None, :], polys1[:, None]))
+    else:
+        first, second = STRtree(polys2).query(polys1)
+    if len(first) == 0:
+        return result
+    try:
+        intersection = shapely.area(shapely.intersection(polys1[first], polys2[second]))
+    except Exception:
+        # fall back on comparing one pair at a time (eg invalid geometries)
+        for i, n in zip(first.tolist(), second.tolist()):
+            result[i, n] = intersect_over_union(polys1[i], polys2[n])
+        return result
+    union = shapely.area(polys1[first]) + shapely.area(polys2[second]) - intersection
+    iou = np.zeros(len(intersection), dtype=np.float64)
+    np.divide(intersection, union, out=iou, where=intersection > 0)
+    result[first, second] = iou
+    return result
+
+
 def merge_polygons(combined: Optional[ObjectDetectionData], max_slope_diff: float = 1e-6, max_dist: float = 1.0) -> Optional[ObjectDetectionData]:
     """
     Merges adjacent polygons. Discards metadata apart from score, which it averages across merged objects,
@@ -144,95 +268,96 @@ def merge_polygons(combined: Optional[ObjectDetectionData], max_slope_diff: floa
     if combined is None:
         return None
 
-    # for each polygon
-    #   for each vertex in polygon
-    #      compute slope
-    # determine parallel vertices between objects
-    # compute distance between parallel vertices
-    # determine sets of objects to merge
+    # collect the vertices (= edges) of all objects in flat arrays
+    # determine candidate pairs of vertices via spatial index
+    # keep parallel vertices of different objects with same label that are close enough
+    # determine sets of objects to merge via union-find
 
-    # determine vertices/slopes/intercepts
-    vertices = dict()
-    slopes = dict()
     normalized = combined.is_normalized()
     absolute = combined.get_absolute()
 
     if (normalized is None) or (absolute is None):
         return None
 
+    starts = []
+    ends = []
+    owners = []
+    label_ids = []
+    label_lookup = dict()
     for i in range(len(absolute)):
-        vertices[i] = []
-        slopes[i] = []
         if absolute[i].has_polygon():
             xs = absolute[i].get_polygon_x()
             ys = absolute[i].get_polygon_y()
         else:
             xs = [absolute[i].x, absolute[i].x + absolute[i].width - 1, absolute[i].x + absolute[i].width - 1, absolute[i].x]
             ys = [absolute[i].y, absolute[i].y, absolute[i].y + absolute[i].height - 1, absolute[i].y + absolute[i].height - 1]
-        for n in range(len(xs)):
-            # vertex: (x0,y0,x1,y1)
-            vertices[i].append(LineString([(xs[n - 1], ys[n - 1]), (xs[n], ys[n])]))
-            # slope: m = (y1-y0) / (x1-x0)
-            if xs[n] - xs[n - 1] == 0:
-                slope = math.inf
-            else:
-                slope = (ys[n] - ys[n - 1]) / (xs[n] - xs[n - 1])
-            slopes[i].append(slope)
-
-    # determine parallel vertices of objects with same label
-    parallel = dict()
-    for i in range(len(slopes)):
-        label_i = get_object_label(absolute[i])
-        for n in range(i + 1, len(slopes), 1):
-            # only consider objects with the same label
-            label_n = get_object_label(absolute[n])
-            if label_i != label_n:
-                continue
-            for i_i in range(len(slopes[i])):
-                for n_n in range(len(slopes[n])):
-                    is_parallel = False
-
-                    # horizontal lines
-                    if (slopes[i][i_i] == 0) and (slopes[n][n_n] == 0):
-                        is_parallel = True
-
-                    # vertical lines
-                    elif math.isinf(slopes[i][i_i]) and math.isinf(slopes[n][n_n]):
-                        is_parallel = True
-
-                    # compare slope
-                    else:
-                        slope_diff = abs(slopes[i][i_i] - slopes[n][n_n])
-                        if slope_diff <= max_slope_diff:
-                            is_parallel = True
-
-                    # check distance of parallel vertices
-                    if is_parallel:
-                        d = distance(vertices[i][i_i], vertices[n][n_n])
-                        if d <= max_dist:
-                            if i not in parallel:
-                                parallel[i] = set()
-                            parallel[i].add(n)
-
-    # create sets of objects to merge
-    merge_sets = []
+        coords = np.column_stack((np.asarray(xs, dtype=np.float64), np.asarray(ys, dtype=np.float64)))
+        # vertex n: (x[n-1],y[n-1]) -> (x[n],y[n])
+        starts.append(np.roll(coords, 1, axis=0))
+        ends.append(coords)
+        owners.append(np.full(len(coords), i, dtype=np.int64))
+        label = get_object_label(absolute[i])
+        if label not in label_lookup:
+            label_lookup[label] = len(label_lookup)
+        label_ids.append(label_lookup[label])
+
+    parent = list(range(len(absolute)))
+
+    def _find(a: int) -> int:
+        while parent[a] != a:
+            parent[a] = parent[parent[a]]
+            a = parent[a]
+        return a
+
+    if len(starts) > 1:
+        starts = np.concatenate(starts)
+        ends = np.concatenate(ends)
+        owners = np.concatenate(owners)
+        label_ids = np.asarray(label_ids, dtype=np.int64)[owners]
+        vertices = shapely.linestrings(np.stack((starts, ends), axis=1))
+        # slope: m = (y1-y0) / (x1-x0)
+        dx = ends[:, 0] - starts[:, 0]
+        dy = ends[:, 1] - starts[:, 1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            slopes = np.where(dx == 0, np.inf, dy / np.where(dx == 0, 1, dx))
+
+        # candidates: vertices whose bounding boxes are within the maximum distance
+        bounds = shapely.bounds(vertices)
+        search = shapely.box(bounds[:, 0] - max_dist, bounds[:, 1] - max_dist, bounds[:, 2] + max_dist, bounds[:, 3] + max_dist)
+        first, second = STRtree(vertices).query(search)
+        # only pairs of different objects (once) with the same label
+        keep = (owners[first] < owners[second]) & (label_ids[first] == label_ids[second])
+        first = first[keep]
+        second = second[keep]
+        # horizontal lines, vertical lines or similar slopes
+        slopes_first = slopes[first]
+        slopes_second = slopes[second]
+        with np.errstate(invalid="ignore"):
+            is_parallel = ((slopes_first == 0) & (slopes_second == 0)) \
+                          | (np.isinf(slopes_first) & np.isinf(slopes_second)) \
+                          | (np.abs(slopes_first - slopes_second) <= max_slope_diff)
+        first = first[is_parallel]
+        second = second[is_parallel]
+        # check distance of parallel vertices
+        close = shapely.distance(vertices[first], vertices[second]) <= max_dist
+        for i, n in zip(owners[first[close]].tolist(), owners[second[close]].tolist()):
+            root_i = _find(i)
+            root_n = _find(n)
+            if root_i != root_n:
+                parent[max(root_i, root_n)] = min(root_i, root_n)
+
+    # create sets of objects to merge, ordered by their first object
+    merge_sets = dict()
     to_merge = set()
-    for i, ns in parallel.items():
-        all_ = [i, *ns]
-        found = None
-        for a in all_:
-            to_merge.add(a)
-            for n, merge_set in enumerate(merge_sets):
-                if a in merge_set:
-                    found = n
-                    break
-            if found is not None:
-                break
-        if found is None:
-            merge_sets.append(set(all_))
-        else:
-            for a in all_:
-                merge_sets[found].add(a)
+    for i in range(len(absolute)):
+        root = _find(i)
+        if root != i:
+            to_merge.add(root)
+            to_merge.add(i)
+            if root not in merge_sets:
+                merge_sets[root] = [root]
+            merge_sets[root].append(i)
+    merge_sets = [merge_sets[root] for root in sorted(merge_sets.keys())]
 
     if len(merge_sets) > 0:
         # transfer all objects that won't get merged
@@ -243,18 +368,12 @@ def merge_polygons(combined: Optional[ObjectDetectionData], max_slope_diff: floa
 
         # merge sets
         for merge_set in merge_sets:
-            label = None
-            merged = None
+            label = get_object_label(absolute[merge_set[0]])
             scores = []
             for i in merge_set:
-                if label is None:
-                    label = get_object_label(absolute[i])
                 if "score" in absolute[i].metadata:
                     scores.append(float(absolute[i].metadata["score"]))
-                if merged is None:
-                    merged = locatedobject_polygon_to_shapely(absolute[i])
-                else:
-                    merged = shapely.union(merged, locatedobject_polygon_to_shapely(absolute[i]))
+            merged = shapely.union_all([locatedobject_polygon_to_shapely(absolute[i]) for i in merge_set])
             obj = shapely_to_locatedobject(merged, label=label)
             # set average score
             if len(scores) > 0:
@@ -24,7 +24,8 @@ class ImageClassificationData(ImageData):
         :return: True if annotations present
         :rtype: bool
         """
-        return (self.annotation is not None) and (len(self.annotation) > 0)
+        ann = self._peek_annotation()
+        return (ann is not None) and (len(ann) > 0)
 
     def _is_correct_annotation_type(self, ann: Any):
         """
@@ -42,4 +43,4 @@ class ImageClassificationData(ImageData):
         :return: the generated dictionary
         :rtype: dict
         """
-        return {"label": self.annotation}
+        return {"label": self._peek_annotation()}
@@ -1,12 +1,408 @@
 import base64
 import io
 import logging
-from typing import Tuple, Dict, List, Any
+import os
+from collections.abc import MutableMapping
+from typing import Tuple, Dict, List, Any, Iterator, Union
 
 import numpy as np
 from PIL import Image
 
 from ._data import ImageData
+from ._rle import rle_encode, rle_decode
+
+
+LAYER_STORAGE_DENSE = "dense"
+LAYER_STORAGE_PACKED = "packed"
+LAYER_STORAGE_CROPPED = "cropped"
+LAYER_STORAGE_RLE = "rle"
+LAYER_STORAGES = [
+    LAYER_STORAGE_DENSE,
+    LAYER_STORAGE_PACKED,
+    LAYER_STORAGE_CROPPED,
+    LAYER_STORAGE_RLE,
+]
+
+IDC_LAYER_STORAGE = "IDC_LAYER_STORAGE"
+""" the environment variable for overriding the default storage of segmentation layers. """
+
+DEFAULT_LAYER_STORAGE = LAYER_STORAGE_DENSE
+""" the default storage for segmentation layers. """
+
+
+def default_layer_storage() -> str:
+    """
+    Returns the default storage to use for segmentation layers.
+    Uses the IDC_LAYER_STORAGE environment variable if set.
+
+    :return: the storage
+    :rtype: str
+    """
+    result = os.getenv(IDC_LAYER_STORAGE, DEFAULT_LAYER_STORAGE).lower()
+    if result not in LAYER_STORAGES:
+        result = DEFAULT_LAYER_STORAGE
+    return result
+
+
+class PackedLayer:
+    """
+    Stores a binary layer with one bit per pixel.
+    """
+
+    def __init__(self, layer: np.ndarray):
+        """
+        Initializes the layer.
+
+        :param layer: the binary layer (0/255) to store
+        :type layer: np.ndarray
+        """
+        self.shape = layer.shape
+        self.bits = np.packbits(layer > 0)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Returns the number of bytes used for storing the layer.
+
+        :return: the number of bytes
+        :rtype: int
+        """
+        return self.bits.nbytes
+
+    def to_array(self) -> np.ndarray:
+        """
+        Materializes the layer.
+
+        :return: the binary layer (0/255)
+        :rtype: np.ndarray
+        """
+        result = np.unpackbits(self.bits, count=self.shape[0] * self.shape[1])
+        result *= 255
+        return result.reshape(self.shape)
+
+
+class CroppedLayer:
+    """
+    Stores a binary layer as the bounding box around the annotated pixels.
+    """
+
+    def __init__(self, layer: np.ndarray):
+        """
+        Initializes the layer.
+
+        :param layer: the binary layer (0/255) to store
+        :type layer: np.ndarray
+        """
+        self.shape = layer.shape
+        rows = np.flatnonzero(layer.any(axis=1))
+        if len(rows) == 0:
+            self.offset = (0, 0)
+            self.mask = np.zeros((0, 0), dtype=np.uint8)
+        else:
+            cols = np.flatnonzero(layer.any(axis=0))
+            self.offset = (int(rows[0]), int(cols[0]))
+            self.mask = np.where(layer[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1] > 0, 255, 0).astype(np.uint8)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Returns the number of bytes used for storing the layer.
+
+        :return: the number of bytes
+        :rtype: int
+        """
+        return self.mask.nbytes
+
+    def to_array(self) -> np.ndarray:
+        """
+        Materializes the layer.
+
+        :return: the binary layer (0/255)
+        :rtype: np.ndarray
+        """
+        result = np.zeros(self.shape, dtype=np.uint8)
+        y, x = self.offset
+        h, w = self.mask.shape
+        result[y:y + h, x:x + w] = self.mask
+        return result
+
+
+class RLELayer:
+    """
+    Stores a binary layer as run-lengths (column-major order, like COCO).
+    """
+
+    def __init__(self, layer: np.ndarray):
+        """
+        Initializes the layer.
+
+        :param layer: the binary layer (0/255) to store
+        :type layer: np.ndarray
+        """
+        self.shape = layer.shape
+        self.counts = rle_encode(layer)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Returns the number of bytes used for storing the layer.
+
+        :return: the number of bytes
+        :rtype: int
+        """
+        return self.counts.nbytes
+
+    def to_array(self) -> np.ndarray:
+        """
+        Materializes the layer.
+
+        :return: the binary layer (0/255)
+        :rtype: np.ndarray
+        """
+        return rle_decode(self.counts, self.shape[0], self.shape[1])
+
+
+def encode_layer(layer: np.ndarray, storage: str) -> Union[np.ndarray, PackedLayer, CroppedLayer, RLELayer]:
+    """
+    Turns the binary layer into the specified storage.
+
+    :param layer: the binary layer (0/255) to encode
+    :type layer: np.ndarray
+    :param storage: the storage to use, see LAYER_STORAGES
+    :type storage: str
+    :return: the encoded layer
+    """
+    if storage == LAYER_STORAGE_DENSE:
+        return layer
+    elif storage == LAYER_STORAGE_PACKED:
+        return PackedLayer(layer)
+    elif storage == LAYER_STORAGE_CROPPED:
+        return CroppedLayer(layer)
+    elif storage == LAYER_STORAGE_RLE:
+        return RLELayer(layer)
+    else:
+        raise Exception("Unsupported layer storage: %s" % storage)
+
+
+class Layers(MutableMapping):
+    """
+    The label -> layer association. Layers that are not stored densely get materialized
+    on access as read-only arrays, i.e., updated layers need to be stored again.
+    """
+
+    def __init__(self, layers: Dict[str, np.ndarray] = None, storage: str = None):
+        """
+        Initializes the layers.
+
+        :param layers: the label -> numpy array association, binary (0/255), uint8
+        :type layers: dict
+        :param storage: the storage to use, see LAYER_STORAGES; uses default_layer_storage() if None
+        :type storage: str
+        """
+        if storage is None:
+            storage = default_layer_storage()
+        if storage not in LAYER_STORAGES:
+            raise Exception("Unsupported layer storage: %s" % storage)
+        self._storage = storage
+        self._layers = dict()
+        if layers is not None:
+            if isinstance(layers, Layers) and (layers.storage == storage):
+                self._layers.update(layers._layers)
+            else:
+                for label in layers:
+                    self[label] = layers[label]
+
+    @property
+    def storage(self) -> str:
+        """
+        Returns the storage in use.
+
+        :return: the storage, see LAYER_STORAGES
+        :rtype: str
+        """
+        return self._storage
+
+    @storage.setter
+    def storage(self, storage: str):
+        """
+        Sets the storage to use, re-encodes the stored layers.
+
+        :param storage: the storage, see LAYER_STORAGES
+        :type storage: str
+        """
+        if storage not in LAYER_STORAGES:
+            raise Exception("Unsupported layer storage: %s" % storage)
+        if storage == self._storage:
+            return
+        layers = dict()
+        for label in self._layers:
+            layers[label] = encode_layer(self[label], storage)
+        self._storage = storage
+        self._layers = layers
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Returns the number of bytes used for storing the layers.
+
+        :return: the number of bytes
+        :rtype: int
+        """
+        return sum([layer.nbytes for layer in self._layers.values()])
+
+    def store(self, label: str, layer: np.ndarray, storage: str = None):
+        """
+        Stores the layer under the label.
+
+        :param label: the label of the layer
+        :type label: str
+        :param layer: the binary layer (0/255), uint8
+        :type layer: np.ndarray
+        :param storage: the storage to use for this layer, uses the current one if None
+        :type storage: str
+        """
+        if layer.dtype != np.uint8:
+            raise Exception("Layers must be %s, but got %s for label '%s'!" % (str(np.dtype(np.uint8)), str(layer.dtype), label))
+        if storage is None:
+            storage = self._storage
+        self._layers[label] = encode_layer(layer, storage)
+
+    def encoded(self, label: str) -> Union[np.ndarray, PackedLayer, CroppedLayer, RLELayer]:
+        """
+        Returns the layer as it is stored, i.e., without materializing it.
+
+        :param label: the label of the layer
+        :type label: str
+        :return: the stored layer
+        """
+        return self._layers[label]
+
+    def __getitem__(self, label: str) -> np.ndarray:
+        layer = self._layers[label]
+        if isinstance(layer, np.ndarray):
+            return layer
+        result = layer.to_array()
+        result.flags.writeable = False
+        return result
+
+    def __setitem__(self, label: str, layer: np.ndarray):
+        self.store(label, layer)
+
+    def __delitem__(self, label: str):
+        del self._layers[label]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._layers)
+
+    def __len__(self) -> int:
+        return len(self._layers)
+
+    def __contains__(self, label) -> bool:
+        return label in self._layers
+
+    def __repr__(self) -> str:
+        return "Layers(storage=%s, labels=%s)" % (self._storage, str(list(self._layers.keys())))
+
+
+def index_map_dtype(num_labels: int):
+    """
+    Returns the smallest data type for an index map that can represent the number of labels.
+
+    :param num_labels: the number of labels
+    :type num_labels: int
+    :return: the data type, uint8 or uint16
+    """
+    if num_labels < 256:
+        return np.uint8
+    elif num_labels < 65536:
+        return np.uint16
+    else:
+        raise Exception("Too many labels for an index map: %d" % num_labels)
+
+
+def remap_index_map(index_map: np.ndarray, index_labels: List[str], labels: List[str], background: int = 0,
+                    dtype=None) -> np.ndarray:
+    """
+    Remaps the index map from one label table to another using a lookup table. Index 0 is the background,
+    index i the label at position i-1 in the label table. Indices of labels that are not present in the
+    target labels get mapped to the background.
+
+    :param index_map: the index map to remap
+    :type index_map: np.ndarray
+    :param index_labels: the label table of the index map
+    :type index_labels: list
+    :param labels: the label table to remap to
+    :type labels: list
+    :param background: the value to use for the background
+    :type background: int
+    :param dtype: the data type for the remapped index map, uses index_map_dtype if None
+    :return: the remapped index map
+    :rtype: np.ndarray
+    """
+    if dtype is None:
+        dtype = index_map_dtype(len(labels))
+    positions = dict()
+    for i, label in enumerate(labels, start=1):
+        if label not in positions:
+            positions[label] = i
+    lut = np.full(np.iinfo(index_map.dtype).max + 1, background, dtype=dtype)
+    for i, label in enumerate(index_labels, start=1):
+        if label in positions:
+            lut[i] = positions[label]
+    return lut[index_map]
+
+
+def split_index_map(index_map: np.ndarray, index_labels: List[str], storage: str = None) -> 'Layers':
+    """
+    Turns the index map into layers, only for the labels that are present.
+
+    :param index_map: the index map to split, 0 is background, i the label at position i-1
+    :type index_map: np.ndarray
+    :param index_labels: the label table of the index map
+    :type index_labels: list
+    :param storage: the storage to use for the layers, see LAYER_STORAGES
+    :type storage: str
+    :return: the layers
+    :rtype: Layers
+    """
+    counts = np.bincount(index_map.ravel(), minlength=len(index_labels) + 1)
+    values = dict()
+    for i, label in enumerate(index_labels, start=1):
+        if counts[i] > 0:
+            if label not in values:
+                values[label] = []
+            values[label].append(i)
+    return split_values(index_map, values, storage=storage)
+
+
+def split_values(arr: np.ndarray, values: Dict[str, List[int]], storage: str = None) -> 'Layers':
+    """
+    Generates a binary layer (0/255) per label from the pixels in the array that have one of its values.
+    Writes each layer in a single pass, without intermediate arrays.
+
+    :param arr: the array with the (non-negative) values to split
+    :type arr: np.ndarray
+    :param values: the label -> list of values association
+    :type values: dict
+    :param storage: the storage to use for the layers, see LAYER_STORAGES
+    :type storage: str
+    :return: the layers
+    :rtype: Layers
+    """
+    result = Layers(storage=storage)
+    for label in values:
+        layer = np.empty(arr.shape, dtype=np.uint8)
+        if len(values[label]) == 1:
+            np.equal(arr, values[label][0], out=layer.view(np.bool_))
+        elif arr.dtype in [np.uint8, np.uint16]:
+            lut = np.zeros(np.iinfo(arr.dtype).max + 1, dtype=np.bool_)
+            lut[values[label]] = True
+            np.take(lut, arr, out=layer.view(np.bool_))
+        else:
+            layer.view(np.bool_)[...] = np.isin(arr, values[label])
+        layer *= 255
+        result[label] = layer
+    return result
 
 
 class ImageSegmentationAnnotations:
@@ -14,23 +410,155 @@ class ImageSegmentationAnnotations:
     Container for image segmentation annotations.
     """
 
-    def __init__(self, labels: List[str] = None, layers: Dict[str, np.ndarray] = None):
+    def __init__(self, labels: List[str] = None, layers: Dict[str, np.ndarray] = None, storage: str = None,
+                 index_map: np.ndarray = None):
         """
-        Initializes the container.
+        Initializes the container. Mutually exclusive annotations can be supplied as a single index map
+        rather than layers, using the labels as label table.
 
         :param labels: the list of labels
         :param layers: the label -> numpy array association, binary (0/255), uint8
+        :param storage: how to store the layers (see LAYER_STORAGES), uses default_layer_storage() if None
+        :type storage: str
+        :param index_map: the index map (uint8/uint16), 0 is background, i the label at position i-1
+        :type index_map: np.ndarray
         """
         if (labels is not None) and (layers is not None):
             for label in layers:
                 if label not in labels:
                     raise Exception("Layer %s is not specified as label!" % label)
         self.labels = labels
-        if layers is not None:
-            for label in layers:
-                if layers[label].dtype != np.uint8:
-                    raise Exception("Layers must be %s, but got %s for label '%s'!" % (str(np.dtype(np.uint8)), str(layers[label].dtype), label))
+        if storage is None:
+            storage = layers.storage if isinstance(layers, Layers) else default_layer_storage()
+        self._storage = storage
+        self._layers = None
+        self._index_map = None
+        self._index_labels = None
+        self._index_present = None
         self.layers = layers
+        if index_map is not None:
+            self.set_index_map(index_map)
+
+    @property
+    def layers(self) -> Layers:
+        """
+        Returns the layers. An index map gets turned into layers first.
+
+        :return: the label -> layer association
+        :rtype: Layers
+        """
+        if self._index_map is not None:
+            self._layers = split_index_map(self._index_map, self._index_labels, storage=self._storage)
+            self._index_map = None
+            self._index_labels = None
+            self._index_present = None
+        return self._layers
+
+    @layers.setter
+    def layers(self, layers: Dict[str, np.ndarray]):
+        """
+        Sets the layers, encodes them with the current storage.
+
+        :param layers: the label -> numpy array association, binary (0/255), uint8
+        :type layers: dict
+        """
+        self._index_map = None
+        self._index_labels = None
+        self._index_present = None
+        if layers is None:
+            self._layers = None
+        else:
+            self._layers = Layers(layers=layers, storage=self._storage)
+
+    def has_index_map(self) -> bool:
+        """
+        Returns whether the annotations are represented by an index map rather than layers.
+
+        :return: True if index map
+        :rtype: bool
+        """
+        return self._index_map is not None
+
+    @property
+    def index_map(self) -> np.ndarray:
+        """
+        Returns the index map, if any. 0 is background, i the label at position i-1 in index_labels.
+        The index map must not get modified in-place.
+
+        :return: the index map, None if represented by layers
+        :rtype: np.ndarray
+        """
+        return self._index_map
+
+    @property
+    def index_labels(self) -> List[str]:
+        """
+        Returns the label table of the index map, if any.
+
+        :return: the labels, None if represented by layers
+        :rtype: list
+        """
+        return self._index_labels
+
+    def set_index_map(self, index_map: np.ndarray, index_labels: List[str] = None):
+        """
+        Sets the index map, replacing any layers.
+
+        :param index_map: the index map (uint8/uint16), 0 is background, i the label at position i-1
+        :type index_map: np.ndarray
+        :param index_labels: the label table of the index map, uses the labels if None
+        :type index_labels: list
+        """
+        if index_map.dtype not in [np.uint8, np.uint16]:
+            raise Exception("Index map must be %s or %s, but got: %s" % (str(np.dtype(np.uint8)), str(np.dtype(np.uint16)), str(index_map.dtype)))
+        if index_labels is None:
+            if self.labels is None:
+                raise Exception("No labels available for index map!")
+            index_labels = self.labels
+        self._layers = None
+        self._index_map = index_map
+        self._index_labels = index_labels[:]
+        self._index_present = None
+
+    def present_labels(self) -> List[str]:
+        """
+        Returns the labels that have a layer, without turning an index map into layers.
+
+        :return: the labels
+        :rtype: list
+        """
+        if self._index_map is not None:
+            if self._index_present is None:
+                counts = np.bincount(self._index_map.ravel(), minlength=len(self._index_labels) + 1)
+                self._index_present = [label for i, label in enumerate(self._index_labels, start=1) if counts[i] > 0]
+            return self._index_present[:]
+        if self._layers is None:
+            return []
+        return list(self._layers.keys())
+
+    @property
+    def storage(self) -> str:
+        """
+        Returns how the layers are stored.
+
+        :return: the storage, see LAYER_STORAGES
+        :rtype: str
+        """
+        return self._storage
+
+    @storage.setter
+    def storage(self, storage: str):
+        """
+        Sets how to store the layers, re-encodes any present layers.
+
+        :param storage: the storage, see LAYER_STORAGES
+        :type storage: str
+        """
+        if storage not in LAYER_STORAGES:
+            raise Exception("Unsupported layer storage: %s" % storage)
+        self._storage = storage
+        if self._layers is not None:
+            self._layers.storage = storage
 
     def subset(self, labels: List[str]) -> 'ImageSegmentationAnnotations':
         """
@@ -41,10 +569,13 @@ class ImageSegmentationAnnotations:
         :return: the new annotations
         :rtype: ImageSegmentationData
         """
-        layers = dict()
+        if self._index_map is not None:
+            return ImageSegmentationAnnotations(labels=labels, storage=self._storage,
+                                                index_map=remap_index_map(self._index_map, self._index_labels, labels))
+        layers = Layers(storage=self._storage)
         for label in labels:
             if label in self.layers:
-                layers[label] = self.layers[label]
+                layers._layers[label] = self.layers._layers[label]
         return ImageSegmentationAnnotations(labels=labels, layers=layers)
 
 
@@ -68,7 +599,10 @@ class ImageSegmentationData(ImageData):
         :return: True if annotations present
         :rtype: bool
         """
-        return (self.annotation is not None) and (self.annotation.layers is not None) and (len(self.annotation.layers) > 0)
+        ann = self._peek_annotation()
+        if (ann is not None) and ann.has_index_map():
+            return len(ann.present_labels()) > 0
+        return (ann is not None) and (ann.layers is not None) and (len(ann.layers) > 0)
 
     def _is_correct_annotation_type(self, ann: Any):
         """
@@ -87,11 +621,12 @@ class ImageSegmentationData(ImageData):
         :rtype: dict
         """
         result = dict()
-        if self.annotation.labels is not None:
-            result["labels"] = self.annotation.labels[:]
+        annotation = self._peek_annotation()
+        if annotation.labels is not None:
+            result["labels"] = annotation.labels[:]
         result["layers"] = dict()
-        for label in self.annotation.layers:
-            arr = self.annotation.layers[label]
+        for label in annotation.layers:
+            arr = annotation.layers[label]
             ann = Image.fromarray(arr, "L").convert("1")
             buffer = io.BytesIO()
             ann.save(buffer, format=self.image_format)
@@ -125,7 +660,8 @@ class ImageSegmentationData(ImageData):
             self.annotation.labels.append(label)
         if self.annotation.layers is None:
             self.annotation.layers = dict()
-        self.annotation.layers[label] = layer
+        # stored densely, as the layer is expected to get filled in
+        self.annotation.layers.store(label, layer, storage=LAYER_STORAGE_DENSE)
         return layer
 
     def has_layer(self, label: str) -> bool:
@@ -139,12 +675,64 @@ class ImageSegmentationData(ImageData):
         """
         if not self.has_annotation():
             return False
-        return label in self.annotation.layers
+        ann = self._peek_annotation()
+        if ann.has_index_map():
+            return label in ann.present_labels()
+        return label in ann.layers
+
+
+def composite_layers(ann: ImageSegmentationAnnotations, width: int, height: int, dtype=np.uint8,
+                     background: int = 0, any_value: bool = False) -> np.ndarray:
+    """
+    Combines the layers into a single array, with the first label getting value 1. Pixels annotated by several
+    layers get the value of the last label. Writes directly into an array of the requested type, reusing a single
+    mask buffer; cropped layers only update their bounding box and index maps get remapped with a lookup table.
+
+    :param ann: the annotations to combine
+    :type ann: ImageSegmentationAnnotations
+    :param width: the width of the image
+    :type width: int
+    :param height: the height of the image
+    :type height: int
+    :param dtype: the data type of the array to generate
+    :param background: the value to use for pixels without annotation
+    :type background: int
+    :param any_value: whether any value >0 in a layer counts as annotated rather than just 255
+    :type any_value: bool
+    :return: the generated array (height x width)
+    :rtype: np.ndarray
+    """
+    if ann.has_index_map():
+        return remap_index_map(ann.index_map, ann.index_labels, ann.labels, background=background, dtype=dtype)
+    result = np.zeros((height, width), dtype=dtype)
+    mask = None
+    for index, label in enumerate(ann.labels, start=1):
+        if label not in ann.layers:
+            continue
+        layer = ann.layers.encoded(label)
+        if isinstance(layer, CroppedLayer):
+            y, x = layer.offset
+            h, w = layer.mask.shape
+            np.copyto(result[y:y + h, x:x + w], index, where=(layer.mask > 0))
+            continue
+        if not isinstance(layer, np.ndarray):
+            layer = layer.to_array()
+        if mask is None:
+            mask = np.empty((height, width), dtype=np.bool_)
+        if any_value:
+            np.greater(layer, 0, out=mask)
+        else:
+            np.equal(layer, 255, out=mask)
+        np.copyto(result, index, where=mask)
+    if background != 0:
+        np.copyto(result, background, where=(result == 0))
+    return result
 
 
 def combine_layers(item: ImageSegmentationData, dtype=np.int32) -> np.ndarray:
     """
-    Combines the layers into a single numpy array. The first label gets value 1.
+    Combines the layers into a single numpy array. The first label gets value 1, overlapping pixels the value
+    of the last label.
 
     :param item: the segmentation data to combine
     :type item: ImageSegmentationData
@@ -152,14 +740,8 @@ def combine_layers(item: ImageSegmentationData, dtype=np.int32) -> np.ndarray:
     :return: the generated array
     :rtype: np.ndarray
     """
-    result = np.zeros((item.image_height, item.image_width, 1), dtype=dtype)
-    for i, label in enumerate(item.annotation.labels, start=1):
-        if label in item.annotation.layers:
-            layer = item.annotation.layers[label]
-            layer = np.where(layer > 0, i, layer)
-            layer = np.expand_dims(layer, axis=-1)
-            result += layer
-    return result
+    result = composite_layers(item.annotation, item.image_width, item.image_height, dtype=dtype, any_value=True)
+    return np.expand_dims(result, axis=-1)
 
 
 def split_layers(array: np.ndarray, labels: List[str]) -> ImageSegmentationAnnotations:
@@ -173,38 +755,46 @@ def split_layers(array: np.ndarray, labels: List[str]) -> ImageSegmentationAnnot
     :return: the generated annotations
     :rtype: ImageSegmentationAnnotations
     """
-    layers = dict()
+    array = np.squeeze(array)
     unique = set(np.unique(array))
+    values = dict()
     for i, label in enumerate(labels, start=1):
         if i in unique:
-            layer = np.where(array == i, 255, 0)
-            layer = np.squeeze(layer)
-            layers[label] = layer.astype(np.uint8)
-    return ImageSegmentationAnnotations(labels=labels, layers=layers)
+            values[label] = [i]
+    return ImageSegmentationAnnotations(labels=labels, layers=split_values(array, values))
 
 
-def imgseg_from_indexedpng(img: Image.Image, labels: List[str], label_mapping: Dict[int, str],
-                           logger: logging.Logger = None, background: int = 0) -> ImageSegmentationAnnotations:
+def _decode(arr: np.ndarray, labels: List[str], label_mapping: Dict[int, str], msg: str,
+            logger: logging.Logger = None, background: int = 0, index_map: bool = False) -> ImageSegmentationAnnotations:
     """
-    Loads the annotations from the indexed png.
+    Decodes the array with the label indices. Determines the values present with a single pass and
+    maps them to the labels with a background-aware lookup table.
 
-    :param img: the image to turn into annotations
-    :type img: Image.Image
+    :param arr: the array to decode, uint8
+    :type arr: np.ndarray
     :param labels: the list of labels
     :type labels: list
     :param label_mapping: the mapping of index to label
     :type label_mapping: dict
+    :param msg: the message template for values not covered by the labels
+    :type msg: str
     :param logger: the (optional) logger for logging messages
     :type logger: logging.Logger
     :param background: the index (0-255) of the background, default 0
     :type background: int
+    :param index_map: whether to generate an index map rather than layers
+    :type index_map: bool
     :return: the generated annotations
     :rtype: ImageSegmentationAnnotations
     """
-    arr = np.asarray(img).astype(np.uint8)
-    unique = np.unique(arr)
-    layers = dict()
-    for index in list(unique):
+    positions = dict()
+    for i, label in enumerate(labels, start=1):
+        if label not in positions:
+            positions[label] = i
+    counts = np.bincount(arr.ravel(), minlength=256)
+    lut = np.zeros(len(counts), dtype=index_map_dtype(len(labels)))
+    values = dict()
+    for index in np.flatnonzero(counts):
         # skip background
         if index == background:
             continue
@@ -214,15 +804,46 @@ def imgseg_from_indexedpng(img: Image.Image, labels: List[str], label_mapping: D
         else:
             label_index = index
         if label_index not in label_mapping:
-            msg = "Index not covered by labels, skipping: %d" % index
             if logger is not None:
-                logger.warning(msg)
+                logger.warning(msg % index)
             else:
-                print(msg)
+                print(msg % index)
             continue
-        sub_arr = np.where(arr == index, 255, 0).astype(np.uint8)
-        layers[label_mapping[label_index]] = sub_arr
-    return ImageSegmentationAnnotations(labels, layers)
+        label = label_mapping[label_index]
+        if label not in positions:
+            raise Exception("Layer %s is not specified as label!" % label)
+        lut[index] = positions[label]
+        if label not in values:
+            values[label] = []
+        values[label].append(index)
+    if index_map:
+        return ImageSegmentationAnnotations(labels, index_map=lut[arr])
+    else:
+        return ImageSegmentationAnnotations(labels, split_values(arr, values))
+
+
+def imgseg_from_indexedpng(img: Image.Image, labels: List[str], label_mapping: Dict[int, str],
+                           logger: logging.Logger = None, background: int = 0, index_map: bool = False) -> ImageSegmentationAnnotations:
+    """
+    Loads the annotations from the indexed png.
+
+    :param img: the image to turn into annotations
+    :type img: Image.Image
+    :param labels: the list of labels
+    :type labels: list
+    :param label_mapping: the mapping of index to label
+    :type label_mapping: dict
+    :param logger: the (optional) logger for logging messages
+    :type logger: logging.Logger
+    :param background: the index (0-255) of the background, default 0
+    :type background: int
+    :param index_map: whether to generate an index map rather than layers
+    :type index_map: bool
+    :return: the generated annotations
+    :rtype: ImageSegmentationAnnotations
+    """
+    arr = np.asarray(img).astype(np.uint8)
+    return _decode(arr, labels, label_mapping, "Index not covered by labels, skipping: %d", logger=logger, background=background, index_map=index_map)
 
 
 def imgseg_from_instancepng(img: Image.Image, label: str, logger: logging.Logger = None,
@@ -242,8 +863,10 @@ def imgseg_from_instancepng(img: Image.Image, label: str, logger: logging.Logger
     :rtype: ImageSegmentationAnnotations
     """
     arr = np.asarray(img).astype(np.uint8)
-    arr = np.where(arr == background, 0, arr)
-    arr = np.where(arr > 0, 255, 0).astype(np.uint8)
+    mask = np.not_equal(arr, background)
+    mask &= (arr > 0)
+    arr = mask.view(np.uint8)
+    arr *= 255
     layers = dict()
     layers[label] = arr
     return ImageSegmentationAnnotations([label], layers)
@@ -267,21 +890,14 @@ def imgseg_to_indexedpng(width: int, height: int, ann: ImageSegmentationAnnotati
     :rtype: Image.Image
     """
     # combine layers
-    arr = np.zeros((height, width)).astype(dtype=np.uint8)
-    for index, label in enumerate(ann.labels, start=1):
-        if label in ann.layers:
-            sub_arr = ann.layers[label]
-            sub_arr = np.where(sub_arr == 255, index, 0).astype(np.uint8)
-            np.copyto(arr, sub_arr, 'safe', sub_arr > 0)
-    if background > 0:
-        arr = np.where(arr == 0, background, arr)
+    arr = composite_layers(ann, width, height, dtype=np.uint8, background=background)
     result = Image.fromarray(arr, "P")
     result.putpalette(palette_list)
     return result
 
 
 def imgseg_from_bluechannel(img: Image.Image, labels: List[str], label_mapping: Dict[int, str],
-                            logger: logging.Logger, background: int = 0) -> ImageSegmentationAnnotations:
+                            logger: logging.Logger, background: int = 0, index_map: bool = False) -> ImageSegmentationAnnotations:
     """
     Loads the annotations from the blue channel.
 
@@ -295,32 +911,14 @@ def imgseg_from_bluechannel(img: Image.Image, labels: List[str], label_mapping:
     :type logger: logging.Logger
     :param background: the index (0-255) of the background, default 0
     :type background: int
+    :param index_map: whether to generate an index map rather than layers
+    :type index_map: bool
     :return: the generated annotations
     :rtype: ImageSegmentationAnnotations
     """
     arr = np.asarray(img).astype(np.uint8)
     arr = arr[:, :, 2]
-    unique = np.unique(arr)
-    layers = dict()
-    for index in list(unique):
-        # skip background
-        if index == background:
-            continue
-        index = int(index)
-        if background < index:
-            label_index = index - 1
-        else:
-            label_index = index
-        if label_index not in label_mapping:
-            msg = "Blue channel value not covered by labels, skipping: %d" % index
-            if logger is not None:
-                logger.warning(msg)
-            else:
-                print(msg)
-            continue
-        sub_arr = np.where(arr == index, 255, 0).astype(np.uint8)
-        layers[label_mapping[label_index]] = sub_arr
-    return ImageSegmentationAnnotations(labels, layers)
+    return _decode(arr, labels, label_mapping, "Blue channel value not covered by labels, skipping: %d", logger=logger, background=background, index_map=index_map)
 
 
 def imgseg_to_bluechannel(width: int, height: int, ann: ImageSegmentationAnnotations, background: int = 0) -> Image.Image:
@@ -338,14 +936,7 @@ def imgseg_to_bluechannel(width: int, height: int, ann: ImageSegmentationAnnotat
     :return: the generated RGB image with the layers in the blue channel
     :rtype: Image.Image
     """
-    arr = np.zeros((height, width)).astype(dtype=np.uint8)
-    for index, label in enumerate(ann.labels, start=1):
-        if label in ann.layers:
-            sub_arr = ann.layers[label]
-            sub_arr = np.where(sub_arr == 255, index, 0).astype(np.uint8)
-            np.copyto(arr, sub_arr, 'safe', sub_arr > 0)
-    if background > 0:
-        arr = np.where(arr == 0, background, arr)
+    arr = composite_layers(ann, width, height, dtype=np.uint8, background=background)
     blue = np.zeros((*arr.shape, 3), np.uint8)
     blue[:, :, 2] = arr
     result = Image.fromarray(blue, "RGB")
@@ -353,7 +944,7 @@ def imgseg_to_bluechannel(width: int, height: int, ann: ImageSegmentationAnnotat
 
 
 def imgseg_from_grayscale(img: Image.Image, labels: List[str], label_mapping: Dict[int, str],
-                          logger: logging.Logger, background: int = 0) -> ImageSegmentationAnnotations:
+                          logger: logging.Logger, background: int = 0, index_map: bool = False) -> ImageSegmentationAnnotations:
     """
     Loads the annotations from the grayscale image.
 
@@ -367,31 +958,13 @@ def imgseg_from_grayscale(img: Image.Image, labels: List[str], label_mapping: Di
     :type logger: logging.Logger
     :param background: the index (0-255) of the background, default 0
     :type background: int
+    :param index_map: whether to generate an index map rather than layers
+    :type index_map: bool
     :return: the generated annotations
     :rtype: ImageSegmentationAnnotations
     """
     arr = np.asarray(img).astype(np.uint8)
-    unique = np.unique(arr)
-    layers = dict()
-    for index in list(unique):
-        # skip background
-        if index == background:
-            continue
-        index = int(index)
-        if background < index:
-            label_index = index - 1
-        else:
-            label_index = index
-        if label_index not in label_mapping:
-            msg = "Grayscale value not covered by labels, skipping: %d" % index
-            if logger is not None:
-                logger.warning(msg)
-            else:
-                print(msg)
-            continue
-        sub_arr = np.where(arr == index, 255, 0).astype(np.uint8)
-        layers[label_mapping[label_index]] = sub_arr
-    return ImageSegmentationAnnotations(labels, layers)
+    return _decode(arr, labels, label_mapping, "Grayscale value not covered by labels, skipping: %d", logger=logger, background=background, index_map=index_map)
 
 
 def imgseg_to_grayscale(width: int, height: int, ann: ImageSegmentationAnnotations, background: int = 0) -> Image.Image:
@@ -409,14 +982,7 @@ def imgseg_to_grayscale(width: int, height: int, ann: ImageSegmentationAnnotatio
     :return: the generated grayscale image
     :rtype: Image.Image
     """
-    arr = np.zeros((height, width)).astype(dtype=np.uint8)
-    for index, label in enumerate(ann.labels, start=1):
-        if label in ann.layers:
-            sub_arr = ann.layers[label]
-            sub_arr = np.where(sub_arr == 255, index, 0).astype(np.uint8)
-            np.copyto(arr, sub_arr, 'safe', sub_arr > 0)
-    if background > 0:
-        arr = np.where(arr == 0, background, arr)
+    arr = composite_layers(ann, width, height, dtype=np.uint8, background=background)
     result = Image.fromarray(arr, "L")
     return result
 
@@ -1,12 +1,13 @@
 import copy
-from typing import Tuple, Dict, Union, Optional, Any
+from typing import Tuple, Dict, Union, Optional, Any, List, Sequence
 
+import numpy as np
 from PIL import Image
 from wai.common.adams.imaging.locateobjects import LocatedObject, LocatedObjects
 from wai.common.adams.imaging.locateobjects import NormalizedLocatedObjects, NormalizedLocatedObject
-from wai.common.adams.imaging.locateobjects import absolute_to_normalized, normalized_to_absolute
+from wai.common.adams.imaging.locateobjects.constants import KEY_POLY_X, KEY_POLY_Y
 
-from ._data import ImageData
+from ._data import ImageData, _peek
 
 DEFAULT_LABEL = "object"
 
@@ -42,6 +43,348 @@ def set_object_label(located_object: Union[LocatedObject, NormalizedLocatedObjec
     located_object.metadata[LABEL_KEY] = label
 
 
+def _is_int(value: Any) -> bool:
+    """
+    Checks whether the value is an integer (but not a boolean).
+
+    :param value: the value to check
+    :return: True if an integer
+    :rtype: bool
+    """
+    return isinstance(value, (int, np.integer)) and not isinstance(value, (bool, np.bool_))
+
+
+_INT_CHARS = str.maketrans("", "", "0123456789+-, ")
+""" for removing all characters that make up comma-separated integers. """
+
+
+def _parse_coords(coords: Any) -> Optional[Tuple[List[float], bool]]:
+    """
+    Parses the comma-separated polygon coordinates.
+
+    :param coords: the coordinates to parse
+    :return: the tuple of coordinates and whether they were all integers, None if failed to parse
+    :rtype: tuple
+    """
+    try:
+        coords = str(coords)
+        values = list(map(float, coords.split(",")))
+        # integers only consist of digits and signs
+        all_int = coords.translate(_INT_CHARS) == ""
+        return values, all_int
+    except:
+        return None
+
+
+def _format_coords(coords: np.ndarray, as_int: bool) -> str:
+    """
+    Turns the coordinates into a comma-separated string.
+
+    :param coords: the coordinates to format
+    :type coords: np.ndarray
+    :param as_int: whether to output the coordinates as integers
+    :type as_int: bool
+    :return: the generated string
+    :rtype: str
+    """
+    if as_int:
+        return ",".join(map(str, coords.astype(np.int64).tolist()))
+    else:
+        return ",".join(map(str, coords.tolist()))
+
+
+class ColumnarLocatedObjects:
+    """
+    Array-backed, immutable representation of (normalized) located objects: the bounding boxes are stored
+    in numpy arrays, the labels as indices into the list of unique labels, the polygons in a single
+    coordinate buffer with offsets per object and any other meta-data in sparse columns
+    (meta-data key -> object index -> value).
+    """
+
+    def __init__(self, x: np.ndarray, y: np.ndarray, width: np.ndarray, height: np.ndarray,
+                 labels: List[Any] = None, label_ids: np.ndarray = None,
+                 poly_coords: np.ndarray = None, poly_offsets: np.ndarray = None,
+                 metadata: Dict[str, Dict[int, Any]] = None, normalized: bool = False,
+                 box_int: np.ndarray = None, poly_int: np.ndarray = None):
+        """
+        Initializes the container.
+
+        :param x: the x coordinates of the bounding boxes
+        :type x: np.ndarray
+        :param y: the y coordinates of the bounding boxes
+        :type y: np.ndarray
+        :param width: the widths of the bounding boxes
+        :type width: np.ndarray
+        :param height: the heights of the bounding boxes
+        :type height: np.ndarray
+        :param labels: the unique labels
+        :type labels: list
+        :param label_ids: the index of the label per object, -1 if no label
+        :type label_ids: np.ndarray
+        :param poly_coords: the (N,2) buffer with the x/y coordinates of all the polygons
+        :type poly_coords: np.ndarray
+        :param poly_offsets: the offsets into the polygon buffer (number of objects + 1), objects without polygon have no points
+        :type poly_offsets: np.ndarray
+        :param metadata: the sparse meta-data columns (key -> object index -> value), excluding label and polygon
+        :type metadata: dict
+        :param normalized: whether the coordinates are normalized
+        :type normalized: bool
+        :param box_int: the (N,4) array indicating whether the x/y/width/height values are integers, infers it from the arrays if None
+        :type box_int: np.ndarray
+        :param poly_int: the (N,2) array indicating whether the x/y polygon coordinates are integers, assumes integers for absolute coordinates if None
+        :type poly_int: np.ndarray
+        """
+        n = len(x)
+        self.x = np.asarray(x)
+        self.y = np.asarray(y)
+        self.width = np.asarray(width)
+        self.height = np.asarray(height)
+        self.labels = [] if labels is None else list(labels)
+        self.label_ids = np.full(n, -1, dtype=np.int32) if label_ids is None else np.asarray(label_ids, dtype=np.int32)
+        self.poly_coords = np.zeros((0, 2), dtype=np.float64) if poly_coords is None else np.asarray(poly_coords, dtype=np.float64).reshape((-1, 2))
+        self.poly_offsets = np.zeros(n + 1, dtype=np.int64) if poly_offsets is None else np.asarray(poly_offsets, dtype=np.int64)
+        self.metadata = dict() if metadata is None else metadata
+        self.normalized = normalized
+        if box_int is None:
+            box_int = np.column_stack([np.full(n, np.issubdtype(a.dtype, np.integer), dtype=bool)
+                                       for a in [self.x, self.y, self.width, self.height]])
+        self.box_int = np.asarray(box_int, dtype=bool).reshape((n, 4))
+        if poly_int is None:
+            poly_int = np.full((n, 2), not normalized, dtype=bool)
+        self.poly_int = np.asarray(poly_int, dtype=bool).reshape((n, 2))
+        if (len(self.y) != n) or (len(self.width) != n) or (len(self.height) != n) \
+                or (len(self.label_ids) != n) or (len(self.poly_offsets) != n + 1):
+            raise Exception("Inconsistent number of objects in columns!")
+
+    @classmethod
+    def from_located_objects(cls, objects: Union[LocatedObjects, NormalizedLocatedObjects]) -> 'ColumnarLocatedObjects':
+        """
+        Turns the located objects into their columnar representation.
+
+        :param objects: the objects to convert
+        :type objects: LocatedObjects or NormalizedLocatedObjects
+        :return: the columnar representation
+        :rtype: ColumnarLocatedObjects
+        """
+        n = len(objects)
+        boxes = np.zeros((n, 4), dtype=np.float64)
+        box_int = np.zeros((n, 4), dtype=bool)
+        label_ids = np.full(n, -1, dtype=np.int32)
+        poly_lengths = np.zeros(n, dtype=np.int64)
+        poly_int = np.zeros((n, 2), dtype=bool)
+        poly_x = []
+        poly_y = []
+        labels = []
+        label_lookup = dict()
+        metadata = dict()
+        for i, obj in enumerate(objects):
+            box = (obj.x, obj.y, obj.width, obj.height)
+            boxes[i] = box
+            box_int[i] = list(map(_is_int, box))
+            # polygon
+            meta = obj.metadata
+            has_poly = obj.has_polygon()
+            if has_poly:
+                px = _parse_coords(meta[KEY_POLY_X])
+                py = _parse_coords(meta[KEY_POLY_Y])
+                has_poly = (px is not None) and (py is not None) and (len(px[0]) == len(py[0]))
+                if has_poly:
+                    poly_x.extend(px[0])
+                    poly_y.extend(py[0])
+                    poly_lengths[i] = len(px[0])
+                    poly_int[i] = [px[1], py[1]]
+            # label and other meta-data
+            for key, value in meta.items():
+                if has_poly and ((key == KEY_POLY_X) or (key == KEY_POLY_Y)):
+                    continue
+                if key == LABEL_KEY:
+                    if value not in label_lookup:
+                        label_lookup[value] = len(labels)
+                        labels.append(value)
+                    label_ids[i] = label_lookup[value]
+                else:
+                    if key not in metadata:
+                        metadata[key] = dict()
+                    metadata[key][i] = value
+
+        normalized = isinstance(objects, NormalizedLocatedObjects)
+        if (not normalized) and box_int.all():
+            boxes = boxes.astype(np.int64)
+        poly_offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(poly_lengths, out=poly_offsets[1:])
+        poly_coords = np.column_stack((np.array(poly_x, dtype=np.float64), np.array(poly_y, dtype=np.float64)))
+        return cls(boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3],
+                   labels=labels, label_ids=label_ids, poly_coords=poly_coords, poly_offsets=poly_offsets,
+                   metadata=metadata, normalized=normalized, box_int=box_int, poly_int=poly_int)
+
+    def to_located_objects(self) -> Union[LocatedObjects, NormalizedLocatedObjects]:
+        """
+        Turns the columnar representation back into located objects.
+
+        :return: the located objects
+        :rtype: LocatedObjects or NormalizedLocatedObjects
+        """
+        if self.normalized:
+            result = NormalizedLocatedObjects()
+            obj_cls = NormalizedLocatedObject
+        else:
+            result = LocatedObjects()
+            obj_cls = LocatedObject
+        xs = self.x.tolist()
+        ys = self.y.tolist()
+        ws = self.width.tolist()
+        hs = self.height.tolist()
+        box_int = self.box_int.tolist()
+        label_ids = self.label_ids.tolist()
+        offsets = self.poly_offsets.tolist()
+        poly_int = self.poly_int.tolist()
+        for i in range(len(xs)):
+            meta = dict()
+            if label_ids[i] > -1:
+                meta[LABEL_KEY] = self.labels[label_ids[i]]
+            for key in self.metadata:
+                if i in self.metadata[key]:
+                    meta[key] = self.metadata[key][i]
+            if offsets[i + 1] > offsets[i]:
+                coords = self.poly_coords[offsets[i]:offsets[i + 1]]
+                meta[KEY_POLY_X] = _format_coords(coords[:, 0], poly_int[i][0])
+                meta[KEY_POLY_Y] = _format_coords(coords[:, 1], poly_int[i][1])
+            box = [int(v) if as_int else v for v, as_int in zip((xs[i], ys[i], ws[i], hs[i]), box_int[i])]
+            obj = obj_cls(*box, **meta)
+            result.append(obj)
+        return result
+
+    def __len__(self) -> int:
+        """
+        Returns the number of objects.
+
+        :return: the number of objects
+        :rtype: int
+        """
+        return len(self.x)
+
+    def get_labels(self, default_label: Optional[str] = DEFAULT_LABEL) -> List[Optional[str]]:
+        """
+        Returns the labels of the objects.
+
+        :param default_label: the label to use for objects without one
+        :type default_label: str
+        :return: the labels
+        :rtype: list
+        """
+        labels = [str(label) for label in self.labels]
+        return [labels[i] if i > -1 else default_label for i in self.label_ids.tolist()]
+
+    def has_polygon(self) -> np.ndarray:
+        """
+        Returns per object whether it has a polygon.
+
+        :return: the boolean array
+        :rtype: np.ndarray
+        """
+        return np.diff(self.poly_offsets) > 0
+
+    def get_polygon(self, index: int) -> Optional[np.ndarray]:
+        """
+        Returns the polygon of the specified object.
+
+        :param index: the index of the object
+        :type index: int
+        :return: the (N,2) array with the x/y coordinates, None if no polygon
+        :rtype: np.ndarray
+        """
+        start = self.poly_offsets[index]
+        end = self.poly_offsets[index + 1]
+        if end == start:
+            return None
+        return self.poly_coords[start:end]
+
+    def subset(self, indices: Union[np.ndarray, Sequence[int]]) -> 'ColumnarLocatedObjects':
+        """
+        Returns the subset of objects.
+
+        :param indices: the indices of the objects or a boolean mask
+        :type indices: np.ndarray or list
+        :return: the subset
+        :rtype: ColumnarLocatedObjects
+        """
+        indices = np.asarray(indices)
+        if indices.dtype == bool:
+            indices = np.flatnonzero(indices)
+        indices = indices.astype(np.int64)
+        starts = self.poly_offsets[indices]
+        lengths = self.poly_offsets[indices + 1] - starts
+        offsets = np.zeros(len(indices) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        # position of every point of the subset in the original buffer
+        points = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1])
+        lookup = {old: new for new, old in enumerate(indices.tolist())}
+        metadata = dict()
+        for key, column in self.metadata.items():
+            subset = {lookup[i]: value for i, value in column.items() if i in lookup}
+            if len(subset) > 0:
+                metadata[key] = subset
+        return ColumnarLocatedObjects(self.x[indices], self.y[indices], self.width[indices], self.height[indices],
+                                      labels=self.labels, label_ids=self.label_ids[indices],
+                                      poly_coords=self.poly_coords[points], poly_offsets=offsets,
+                                      metadata=metadata, normalized=self.normalized,
+                                      box_int=self.box_int[indices], poly_int=self.poly_int[indices])
+
+    def to_normalized(self, width: int, height: int) -> 'ColumnarLocatedObjects':
+        """
+        Returns the normalized version of the objects (itself if already normalized).
+        Like LocatedObject.get_polygon_x/y, the absolute polygon coordinates get rounded first.
+
+        :param width: the width of the image to use for normalization
+        :type width: int
+        :param height: the height of the image to use for normalization
+        :type height: int
+        :return: the normalized objects
+        :rtype: ColumnarLocatedObjects
+        """
+        if self.normalized:
+            return self
+        n = len(self)
+        return ColumnarLocatedObjects(self.x / width, self.y / height, self.width / width, self.height / height,
+                                      labels=self.labels, label_ids=self.label_ids,
+                                      poly_coords=np.round(self.poly_coords) / [width, height],
+                                      poly_offsets=self.poly_offsets, metadata=self.metadata, normalized=True,
+                                      box_int=np.zeros((n, 4), dtype=bool), poly_int=np.zeros((n, 2), dtype=bool))
+
+    def to_absolute(self, width: int, height: int) -> 'ColumnarLocatedObjects':
+        """
+        Returns the absolute version of the objects (itself if already absolute).
+        All coordinates get rounded to integers.
+
+        :param width: the width of the image to use for denormalization
+        :type width: int
+        :param height: the height of the image to use for denormalization
+        :type height: int
+        :return: the absolute objects
+        :rtype: ColumnarLocatedObjects
+        """
+        if not self.normalized:
+            return self
+        n = len(self)
+        return ColumnarLocatedObjects(np.round(self.x * width).astype(np.int64),
+                                      np.round(self.y * height).astype(np.int64),
+                                      np.round(self.width * width).astype(np.int64),
+                                      np.round(self.height * height).astype(np.int64),
+                                      labels=self.labels, label_ids=self.label_ids,
+                                      poly_coords=np.round(self.poly_coords * [width, height]),
+                                      poly_offsets=self.poly_offsets, metadata=self.metadata, normalized=False,
+                                      box_int=np.ones((n, 4), dtype=bool), poly_int=np.ones((n, 2), dtype=bool))
+
+    def copy(self) -> 'ColumnarLocatedObjects':
+        """
+        Returns a deep copy of the container.
+
+        :return: the copy
+        :rtype: ColumnarLocatedObjects
+        """
+        return copy.deepcopy(self)
+
+
 class ObjectDetectionData(ImageData):
     """
     The annotations are LocatedObjects or NormalizedLocatedObjects.
@@ -51,10 +394,77 @@ class ObjectDetectionData(ImageData):
                  image: Image.Image = None, image_format: str = None, image_size: Tuple[int, int] = None,
                  metadata: Dict = None, annotation: Union[LocatedObjects, NormalizedLocatedObjects] = None):
 
+        self._columnar = None
+        """ the columnar annotations, only get turned into located objects when accessed. """
+        self._converted = None
+        """ the cached (key, columnar annotations) tuple of the last normalized/absolute conversion of the columnar annotations. """
         super().__init__(source=source, image_name=image_name, data=data,
                          image=image, image_format=image_format, image_size=image_size,
                          metadata=metadata, annotation=annotation)
 
+    @property
+    def annotation(self) -> Optional[Any]:
+        """
+        Returns the current annotation, if any. Turns columnar annotations into located objects.
+        As the annotation may get modified after this call, any cached conversions get discarded.
+
+        :return: the annotation
+        """
+        self._converted = None
+        if self._columnar is not None:
+            ann = self._columnar.to_located_objects()
+            self._columnar = None
+            ImageData.annotation.fset(self, ann)
+        return ImageData.annotation.fget(self)
+
+    @annotation.setter
+    def annotation(self, ann: Optional[Any]):
+        """
+        Sets the annotation to use.
+
+        :param ann: the annotation, can be None
+        """
+        self._columnar = None
+        self._converted = None
+        ImageData.annotation.fset(self, ann)
+
+    def has_columnar(self) -> bool:
+        """
+        Returns whether the annotations are currently stored in columnar form,
+        i.e., can be obtained via get_columnar without conversion.
+
+        :return: True if columnar
+        :rtype: bool
+        """
+        return self._columnar is not None
+
+    def get_columnar(self) -> Optional[ColumnarLocatedObjects]:
+        """
+        Returns the annotations in columnar form, converts the located objects if necessary.
+        The returned object must not be modified, use set_columnar to update the annotations.
+
+        :return: the columnar annotations, None if no annotations
+        :rtype: ColumnarLocatedObjects
+        """
+        if self._columnar is not None:
+            return self._columnar
+        ann = _peek(self._annotation)
+        if ann is None:
+            return None
+        return ColumnarLocatedObjects.from_located_objects(ann)
+
+    def set_columnar(self, ann: Optional[ColumnarLocatedObjects]):
+        """
+        Sets the annotations in columnar form, which only get turned into
+        located objects when accessing the annotation property.
+
+        :param ann: the columnar annotations, can be None
+        :type ann: ColumnarLocatedObjects
+        """
+        ImageData.annotation.fset(self, None)
+        self._columnar = ann
+        self._converted = None
+
     def has_annotation(self) -> bool:
         """
         Checks whether annotations are present.
@@ -62,7 +472,21 @@ class ObjectDetectionData(ImageData):
         :return: True if annotations present
         :rtype: bool
         """
-        return (self.annotation is not None) and (len(self.annotation) > 0)
+        if self._columnar is not None:
+            return len(self._columnar) > 0
+        ann = _peek(self._annotation)
+        return (ann is not None) and (len(ann) > 0)
+
+    def _peek_annotation(self) -> Optional[Any]:
+        """
+        Returns the annotation for read-only access, without copying an annotation that is
+        still shared with other containers. Columnar annotations get turned into new located objects.
+
+        :return: the annotation, if any
+        """
+        if self._columnar is not None:
+            return self._columnar.to_located_objects()
+        return _peek(self._annotation)
 
     def _is_correct_annotation_type(self, ann: Any):
         """
@@ -80,22 +504,48 @@ class ObjectDetectionData(ImageData):
         :return: True if normalized
         :rtype: bool
         """
-        return isinstance(self.annotation, NormalizedLocatedObjects)
+        if self._columnar is not None:
+            return self._columnar.normalized
+        return isinstance(_peek(self._annotation), NormalizedLocatedObjects)
+
+    def _convert(self, normalized: bool) -> Optional[Union[LocatedObjects, NormalizedLocatedObjects]]:
+        """
+        Converts the absolute annotations into normalized ones or vice versa, using vectorized operations.
+        Conversions of columnar annotations get cached for the current image size until the annotations
+        get accessed or replaced. Located objects can be modified in-place and get converted every time.
+        Every call returns new located objects.
+
+        :param normalized: whether to generate normalized or absolute annotations
+        :type normalized: bool
+        :return: the converted annotations, None if no annotations or no image size available
+        """
+        if self.image_size is None:
+            return None
+        key = (normalized, self.image_size)
+        if (self._columnar is not None) and (self._converted is not None) and (self._converted[0] == key):
+            return self._converted[1].to_located_objects()
+        cols = self.get_columnar()
+        width, height = self.image_size
+        if normalized:
+            converted = cols.to_normalized(width, height)
+        else:
+            converted = cols.to_absolute(width, height)
+        if self._columnar is not None:
+            self._converted = (key, converted)
+        return converted.to_located_objects()
 
     def get_normalized(self) -> Optional[NormalizedLocatedObjects]:
         """
         Returns normalized annotations.
+
+        :return: the normalized annotations, None if not available
+        :rtype: NormalizedLocatedObjects
         """
-        if self.annotation is None:
+        if (self._columnar is None) and (_peek(self._annotation) is None):
             return None
-        if isinstance(self.annotation, NormalizedLocatedObjects):
+        if self.is_normalized():
             return self.annotation
-        if self.image_size is None:
-            return None
-        if isinstance(self.annotation, LocatedObjects):
-            width, height = self.image_size
-            return absolute_to_normalized(self.annotation, width, height)
-        raise Exception("Unhandled type of annotations: %s" % str(type(self.annotation)))
+        return self._convert(True)
 
     def to_normalized(self):
         """
@@ -112,16 +562,11 @@ class ObjectDetectionData(ImageData):
         :return: the absolute annotations, None if not available
         :rtype: LocatedObjects
         """
-        if self.annotation is None:
+        if (self._columnar is None) and (_peek(self._annotation) is None):
             return None
-        if isinstance(self.annotation, LocatedObjects):
+        if not self.is_normalized():
             return self.annotation
-        if self.image_size is None:
-            return None
-        if isinstance(self.annotation, NormalizedLocatedObjects):
-            width, height = self.image_size
-            return normalized_to_absolute(self.annotation, width, height)
-        raise Exception("Unhandled type of annotations: %s" % str(type(self.annotation)))
+        return self._convert(False)
 
     def to_absolute(self):
         """
@@ -131,6 +576,41 @@ class ObjectDetectionData(ImageData):
             return
         self.annotation = self.get_absolute()
 
+    def duplicate(self, source: str = None, force_no_source: bool = None,
+                  name: str = None, data: bytes = None,
+                  image: Image.Image = None, image_format: str = None,
+                  size: Tuple[int, int] = None,
+                  metadata: Dict = None, annotation=None):
+        """
+        Duplicates the container overwriting existing data with any provided data.
+        Columnar annotations get carried over as is.
+
+        :param source: the source to use
+        :type source: str
+        :param force_no_source: if True, then source is set to None
+        :type force_no_source: bool
+        :param name: the name to use
+        :type name: str
+        :param data: the data to use
+        :type data: bytes
+        :param image: the Pillow image to use
+        :type image: Image.Image
+        :param image_format: the image format
+        :type image_format: str
+        :param size: the size tuple
+        :type size: tuple
+        :param metadata: the metadata
+        :type metadata: dict
+        :param annotation: the annotations
+        :return: the duplicated container
+        """
+        result = super().duplicate(source=source, force_no_source=force_no_source, name=name, data=data,
+                                   image=image, image_format=image_format, size=size,
+                                   metadata=metadata, annotation=annotation)
+        if (annotation is None) and (self._columnar is not None):
+            result.set_columnar(self._columnar)
+        return result
+
     def _annotation_to_dict(self):
         """
         Turns the annotations into a dictionary.
@@ -139,7 +619,7 @@ class ObjectDetectionData(ImageData):
         :rtype: dict
         """
         objs = []
-        for lobj in self.annotation:
+        for lobj in self._peek_annotation():
             obj = dict()
             obj["x"] = lobj.x
             obj["y"] = lobj.y
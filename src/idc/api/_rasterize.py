@@ -0,0 +1,160 @@
+from typing import Dict, List
+
+import numpy as np
+from PIL import Image, ImageDraw
+from wai.common.adams.imaging.locateobjects import LocatedObject
+
+from ._imgseg import Layers, LAYER_STORAGE_DENSE, index_map_dtype
+
+RASTERIZER_PIL = "pil"
+RASTERIZER_CV2 = "cv2"
+RASTERIZERS = [
+    RASTERIZER_PIL,
+    RASTERIZER_CV2,
+]
+DEFAULT_RASTERIZER = RASTERIZER_PIL
+
+
+def locatedobject_to_points(lobj: LocatedObject) -> np.ndarray:
+    """
+    Returns the points of the polygon of the located object or, if it has no polygon, its bbox.
+
+    :param lobj: the object to get the points for
+    :type lobj: LocatedObject
+    :return: the points (N x 2: x, y)
+    :rtype: np.ndarray
+    """
+    if lobj.has_polygon():
+        return np.column_stack((lobj.get_polygon_x(), lobj.get_polygon_y())).astype(np.int32)
+    else:
+        return np.array([
+            (lobj.x, lobj.y),
+            (lobj.x + lobj.width + 1, lobj.y),
+            (lobj.x + lobj.width + 1, lobj.y + lobj.height + 1),
+            (lobj.x, lobj.y + lobj.height + 1)], dtype=np.int32)
+
+
+class Rasterizer:
+    """
+    Turns polygons into binary layers or an index map. Reuses its scratch buffer across images
+    of the same size when the layers are not stored densely.
+    """
+
+    def __init__(self, rasterizer: str = None):
+        """
+        Initializes the rasterizer.
+
+        :param rasterizer: the rasterizer to use, see RASTERIZERS
+        :type rasterizer: str
+        """
+        if rasterizer is None:
+            rasterizer = DEFAULT_RASTERIZER
+        if rasterizer not in RASTERIZERS:
+            raise Exception("Unsupported rasterizer: %s" % rasterizer)
+        self.rasterizer = rasterizer
+        self._scratch = None
+
+    def fill(self, mask: np.ndarray, polygons: List[np.ndarray], value: int):
+        """
+        Fills the polygons (incl. their outline) in the mask with the specified value.
+
+        :param mask: the mask to fill (height x width)
+        :type mask: np.ndarray
+        :param polygons: the polygons to fill (N x 2: x, y)
+        :type polygons: list
+        :param value: the value to use
+        :type value: int
+        """
+        if self.rasterizer == RASTERIZER_CV2:
+            import cv2
+            # one polygon at a time, as overlapping polygons of a single call cancel each other out (even-odd)
+            for polygon in polygons:
+                cv2.fillPoly(mask, [polygon], value)
+        elif self.rasterizer == RASTERIZER_PIL:
+            img = Image.new("1", (mask.shape[1], mask.shape[0]))
+            draw = ImageDraw.Draw(img)
+            for polygon in polygons:
+                draw.polygon([tuple(point) for point in polygon.tolist()], fill=255, outline=255, width=1)
+            mask[np.asarray(img)] = value
+        else:
+            raise Exception("Unsupported rasterizer: %s" % self.rasterizer)
+
+    def _scratch_buffer(self, width: int, height: int) -> np.ndarray:
+        """
+        Returns the (empty) scratch buffer for the image size.
+
+        :param width: the width of the image
+        :type width: int
+        :param height: the height of the image
+        :type height: int
+        :return: the buffer
+        :rtype: np.ndarray
+        """
+        if (self._scratch is None) or (self._scratch.shape != (height, width)):
+            self._scratch = np.zeros((height, width), dtype=np.uint8)
+        return self._scratch
+
+    def _clear_scratch_buffer(self, polygons: List[np.ndarray]):
+        """
+        Resets the region of the scratch buffer that the polygons were drawn into.
+
+        :param polygons: the polygons that were drawn (N x 2: x, y)
+        :type polygons: list
+        """
+        points = np.concatenate(polygons)
+        height, width = self._scratch.shape
+        x0, y0 = np.clip(points.min(axis=0), 0, None).tolist()
+        x1, y1 = np.clip(points.max(axis=0), -1, [width - 1, height - 1]).tolist()
+        self._scratch[y0:y1 + 1, x0:x1 + 1] = 0
+
+    def to_layers(self, polygons: Dict[str, List[np.ndarray]], width: int, height: int, storage: str = None) -> Layers:
+        """
+        Turns the polygons into binary layers (0/255), one per label.
+
+        :param polygons: the label -> polygons (N x 2: x, y) association
+        :type polygons: dict
+        :param width: the width of the image
+        :type width: int
+        :param height: the height of the image
+        :type height: int
+        :param storage: the storage to use for the layers, see LAYER_STORAGES; uses default_layer_storage() if None
+        :type storage: str
+        :return: the layers
+        :rtype: Layers
+        """
+        result = Layers(storage=storage)
+        for label in polygons:
+            if len(polygons[label]) == 0:
+                continue
+            if result.storage == LAYER_STORAGE_DENSE:
+                layer = np.zeros((height, width), dtype=np.uint8)
+                self.fill(layer, polygons[label], 255)
+                result.store(label, layer)
+            else:
+                # encoding copies the layer, so the buffer can be reused
+                scratch = self._scratch_buffer(width, height)
+                self.fill(scratch, polygons[label], 255)
+                result.store(label, scratch)
+                self._clear_scratch_buffer(polygons[label])
+        return result
+
+    def to_index_map(self, polygons: Dict[str, List[np.ndarray]], index_labels: List[str], width: int, height: int) -> np.ndarray:
+        """
+        Turns the polygons into an index map, with labels later in the label table overwriting earlier ones.
+
+        :param polygons: the label -> polygons (N x 2: x, y) association
+        :type polygons: dict
+        :param index_labels: the label table for the index map, label at position i-1 gets index i
+        :type index_labels: list
+        :param width: the width of the image
+        :type width: int
+        :param height: the height of the image
+        :type height: int
+        :return: the index map
+        :rtype: np.ndarray
+        """
+        result = np.zeros((height, width), dtype=index_map_dtype(len(index_labels)))
+        for i, label in enumerate(index_labels, start=1):
+            if (label in polygons) and (len(polygons[label]) > 0):
+                self.fill(result, polygons[label], i)
+        return result
@@ -0,0 +1,282 @@
+from typing import Dict, List, Union, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+RLE_MAX_CHUNKS = 13
+""" the maximum number of characters a single (64bit) value requires in compressed RLE. """
+
+KEY_RLE = "rle"
+""" the meta-data key for storing the compressed RLE mask of an object. """
+
+KEY_RLE_SIZE = "rle_size"
+""" the meta-data key for storing the size (height,width) of the RLE mask of an object. """
+
+KEY_RLE_CROWD = "iscrowd"
+""" the meta-data key for storing whether the RLE mask of an object represents a crowd (1) or not (0). """
+
+
+def rle_encode(mask: np.ndarray) -> np.ndarray:
+    """
+    Turns the binary mask into run-lengths, using column-major order like COCO does.
+    The first run-length is always for the background, i.e., can be 0.
+
+    :param mask: the mask to encode, anything >0 is considered foreground
+    :type mask: np.ndarray
+    :return: the run-lengths
+    :rtype: np.ndarray
+    """
+    flat = np.asarray(mask).ravel(order="F") > 0
+    if flat.size == 0:
+        return np.zeros(1, dtype=np.uint32)
+    changes = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+    bounds = np.concatenate(([0], changes, [flat.size]))
+    result = np.diff(bounds)
+    if flat[0]:
+        result = np.concatenate(([0], result))
+    return result.astype(np.uint32)
+
+
+def rle_encode_region(mask: np.ndarray, x: int, y: int, height: int, width: int) -> np.ndarray:
+    """
+    Turns the binary mask located at x/y within a larger image into run-lengths for the complete image,
+    without having to generate a mask of the size of the image.
+
+    :param mask: the mask to encode, anything >0 is considered foreground, must lie within the image
+    :type mask: np.ndarray
+    :param x: the horizontal position of the mask
+    :type x: int
+    :param y: the vertical position of the mask
+    :type y: int
+    :param height: the height of the image
+    :type height: int
+    :param width: the width of the image
+    :type width: int
+    :return: the run-lengths
+    :rtype: np.ndarray
+    """
+    h, w = mask.shape
+    if (x < 0) or (y < 0) or (x + w > width) or (y + h > height):
+        raise Exception("Mask of %dx%d at %d,%d does not fit into image of %dx%d!" % (w, h, x, y, width, height))
+    columns = np.zeros((height, w), dtype=bool)
+    columns[y:y + h] = mask > 0
+    result = rle_encode(columns).astype(np.int64)
+    # the columns before and after the mask are background
+    result[0] += x * height
+    trailing = (width - x - w) * height
+    if trailing > 0:
+        if len(result) % 2 == 1:
+            result[-1] += trailing
+        else:
+            result = np.append(result, trailing)
+    return result.astype(np.uint32)
+
+
+def polygon_to_rle(xs: List[float], ys: List[float], height: int, width: int) -> np.ndarray:
+    """
+    Rasterizes the polygon and turns it into run-lengths for an image of the given size.
+    Only the bounding box of the polygon (clipped to the image) gets rasterized.
+
+    :param xs: the x coordinates of the polygon
+    :type xs: list
+    :param ys: the y coordinates of the polygon
+    :type ys: list
+    :param height: the height of the image
+    :type height: int
+    :param width: the width of the image
+    :type width: int
+    :return: the run-lengths
+    :rtype: np.ndarray
+    """
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = np.asarray(ys, dtype=np.float64)
+    x0 = max(0, int(np.floor(xs.min())))
+    x1 = min(width - 1, int(np.ceil(xs.max())))
+    y0 = max(0, int(np.floor(ys.min())))
+    y1 = min(height - 1, int(np.ceil(ys.max())))
+    if (x1 < x0) or (y1 < y0):
+        return np.array([height * width], dtype=np.uint32)
+    img = Image.new("1", (x1 - x0 + 1, y1 - y0 + 1))
+    ImageDraw.Draw(img).polygon(list(zip((xs - x0).tolist(), (ys - y0).tolist())), fill=1, outline=1)
+    return rle_encode_region(np.asarray(img), x0, y0, height, width)
+
+
+def rle_decode(counts: Union[np.ndarray, List[int]], height: int, width: int) -> np.ndarray:
+    """
+    Turns the run-lengths (column-major order) back into a binary mask.
+
+    :param counts: the run-lengths to decode
+    :param height: the height of the mask
+    :type height: int
+    :param width: the width of the mask
+    :type width: int
+    :return: the binary mask (0/255)
+    :rtype: np.ndarray
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    if counts.sum() != height * width:
+        raise Exception("Run-lengths cover %d pixels, but mask has %d (%dx%d)!" % (counts.sum(), height * width, width, height))
+    values = np.zeros(len(counts), dtype=np.uint8)
+    values[1::2] = 255
+    flat = np.repeat(values, counts)
+    return np.ascontiguousarray(flat.reshape((height, width), order="F"))
+
+
+def rle_compress(counts: Union[np.ndarray, List[int]]) -> str:
+    """
+    Turns the run-lengths into the compressed string representation used by COCO (LEB128-like encoding
+    of the differences). Processes all values at once, one 5bit chunk at a time.
+
+    :param counts: the run-lengths to compress
+    :return: the compressed run-lengths
+    :rtype: str
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    x = counts.copy()
+    if len(x) > 3:
+        x[3:] -= counts[1:-2]
+    chunks = np.zeros((len(x), RLE_MAX_CHUNKS), dtype=np.uint8)
+    lengths = np.zeros(len(x), dtype=np.int64)
+    active = np.ones(len(x), dtype=bool)
+    for k in range(RLE_MAX_CHUNKS):
+        if not active.any():
+            break
+        c = x & 0x1f
+        x >>= 5
+        more = np.where((c & 0x10) > 0, x != -1, x != 0)
+        c = np.where(more, c | 0x20, c) + 48
+        chunks[active, k] = c[active]
+        lengths[active] += 1
+        active &= more
+    valid = np.arange(RLE_MAX_CHUNKS) < lengths[:, None]
+    return chunks[valid].tobytes().decode("ascii")
+
+
+def rle_decompress(compressed: Union[str, bytes]) -> np.ndarray:
+    """
+    Turns the compressed string representation used by COCO back into run-lengths.
+
+    :param compressed: the compressed run-lengths
+    :return: the run-lengths
+    :rtype: np.ndarray
+    """
+    if isinstance(compressed, str):
+        compressed = compressed.encode("ascii")
+    c = np.frombuffer(compressed, dtype=np.uint8).astype(np.int64) - 48
+    if len(c) == 0:
+        return np.zeros(0, dtype=np.uint32)
+    ends = (c & 0x20) == 0
+    if not ends[-1]:
+        raise Exception("Incomplete compressed RLE!")
+    starts = np.flatnonzero(np.concatenate(([True], ends[:-1])))
+    lengths = np.diff(np.append(starts, len(c)))
+    k = np.arange(len(c)) - np.repeat(starts, lengths)
+    x = np.add.reduceat((c & 0x1f) << (5 * k), starts)
+    neg = (c[ends] & 0x10) > 0
+    x[neg] |= np.left_shift(np.int64(-1), 5 * lengths[neg])
+    # undo the differences: x[m] += counts[m-2] for m > 2
+    result = x.copy()
+    result[1::2] = np.cumsum(x[1::2])
+    result[2::2] = np.cumsum(x[2::2])
+    return result.astype(np.uint32)
+
+
+def rle_area(counts: Union[np.ndarray, List[int]]) -> int:
+    """
+    Returns the number of foreground pixels.
+
+    :param counts: the run-lengths
+    :return: the area
+    :rtype: int
+    """
+    return int(np.asarray(counts, dtype=np.int64)[1::2].sum())
+
+
+def rle_bbox(counts: Union[np.ndarray, List[int]], height: int, width: int) -> Tuple[int, int, int, int]:
+    """
+    Determines the bounding box of the foreground pixels without decoding the mask.
+
+    :param counts: the run-lengths (column-major order)
+    :param height: the height of the mask
+    :type height: int
+    :param width: the width of the mask
+    :type width: int
+    :return: the bounding box (x, y, width, height), all 0 if no foreground pixels
+    :rtype: tuple
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    ends = np.cumsum(counts)
+    starts = ends - counts
+    fg = (np.arange(len(counts)) % 2 == 1) & (counts > 0)
+    if not fg.any():
+        return 0, 0, 0, 0
+    starts = starts[fg]
+    last = ends[fg] - 1
+    x0 = starts // height
+    x1 = last // height
+    same = x0 == x1
+    y0 = np.where(same, starts % height, 0)
+    y1 = np.where(same, last % height, height - 1)
+    xmin = int(x0.min())
+    ymin = int(y0.min())
+    return xmin, ymin, int(x1.max()) - xmin + 1, int(y1.max()) - ymin + 1
+
+
+def mask_to_coco_rle(mask: np.ndarray, compressed: bool = True) -> Dict:
+    """
+    Turns the binary mask into a COCO RLE segmentation.
+
+    :param mask: the mask to encode, anything >0 is considered foreground
+    :type mask: np.ndarray
+    :param compressed: whether to generate compressed or uncompressed RLE
+    :type compressed: bool
+    :return: the segmentation dictionary (size and counts)
+    :rtype: dict
+    """
+    counts = rle_encode(mask)
+    result = dict()
+    result["size"] = [int(mask.shape[0]), int(mask.shape[1])]
+    if compressed:
+        result["counts"] = rle_compress(counts)
+    else:
+        result["counts"] = counts.tolist()
+    return result
+
+
+def coco_rle_counts(rle: Dict) -> np.ndarray:
+    """
+    Returns the run-lengths of the COCO RLE segmentation, which can be either compressed or uncompressed.
+
+    :param rle: the segmentation dictionary (size and counts)
+    :type rle: dict
+    :return: the run-lengths
+    :rtype: np.ndarray
+    """
+    counts = rle["counts"]
+    if isinstance(counts, (str, bytes)):
+        return rle_decompress(counts)
+    return np.asarray(counts, dtype=np.uint32)
+
+
+def coco_rle_to_mask(rle: Dict) -> np.ndarray:
+    """
+    Turns the COCO RLE segmentation (compressed or uncompressed) into a binary mask.
+
+    :param rle: the segmentation dictionary (size and counts)
+    :type rle: dict
+    :return: the binary mask (0/255)
+    :rtype: np.ndarray
+    """
+    height, width = rle["size"]
+    return rle_decode(coco_rle_counts(rle), height, width)
+
+
+def is_coco_rle(segmentation) -> bool:
+    """
+    Checks whether the COCO segmentation is in RLE format.
+
+    :param segmentation: the segmentation to check
+    :return: True if RLE
+    :rtype: bool
+    """
+    return isinstance(segmentation, dict) and ("counts" in segmentation) and ("size" in segmentation)
@@ -1,17 +1,128 @@
 import csv
 import io
 import logging
+import os
+import threading
 from typing import Optional, Union, List, Dict, Tuple
 
+import imagesize
 import numpy as np
 from PIL import Image
 
-from kasperl.api import locate_file
+from kasperl.api import strip_suffix
 
 JPEG_EXTENSIONS = [".jpg", ".jpeg", ".JPG", ".JPEG"]
 
 PNG_EXTENSIONS = [".png", ".PNG"]
 
+IMAGE_EXTENSIONS = [".png", ".PNG", ".jpg", ".JPG", ".jpeg", ".JPEG"]
+
+IDC_LOCATE_CACHE = "IDC_LOCATE_CACHE"
+""" the environment variable for turning off the directory listing cache (false|0|no). """
+
+_LOCATE_CACHE = dict()
+""" the cached directory listings: dir -> (stem -> set of extensions). """
+
+_LOCATE_CACHE_LOCK = threading.Lock()
+""" for synchronizing access to the directory listings. """
+
+
+def _locate_cache_enabled() -> bool:
+    """
+    Returns whether the directory listing cache is enabled.
+
+    :return: True if enabled
+    :rtype: bool
+    """
+    return os.getenv(IDC_LOCATE_CACHE, "true").lower() not in ["false", "0", "no"]
+
+
+def _list_dir(path: str) -> Dict[str, set]:
+    """
+    Returns the cached listing of the directory, creates it if necessary.
+
+    :param path: the directory to get the listing for
+    :type path: str
+    :return: the listing (stem -> set of extensions)
+    :rtype: dict
+    """
+    key = os.path.abspath(path)
+    with _LOCATE_CACHE_LOCK:
+        if key in _LOCATE_CACHE:
+            return _LOCATE_CACHE[key]
+    result = dict()
+    try:
+        with os.scandir(key) as it:
+            for entry in it:
+                stem, ext = os.path.splitext(entry.name)
+                if stem not in result:
+                    result[stem] = set()
+                result[stem].add(ext)
+    except OSError:
+        pass
+    with _LOCATE_CACHE_LOCK:
+        _LOCATE_CACHE[key] = result
+    return result
+
+
+def clear_locate_cache(path: str = None):
+    """
+    Removes the cached directory listing(s) used by locate_file_cached/locate_image,
+    e.g., when new files have appeared.
+
+    :param path: the directory to remove the listing for, removes all listings if None
+    :type path: str
+    """
+    with _LOCATE_CACHE_LOCK:
+        if path is None:
+            _LOCATE_CACHE.clear()
+        else:
+            _LOCATE_CACHE.pop(os.path.abspath(path), None)
+
+
+def locate_file_cached(path: str, ext: Union[str, List[str]], rel_path: str = None, suffix: str = None,
+                       image_prefix: str = None, annotation_prefix: str = None) -> List[str]:
+    """
+    Tries to locate the associate files for the given path by replacing its extension by the provided ones.
+    Same as kasperl.api.locate_file, but uses a cached listing of the directory rather than probing
+    the file system for each extension. Use clear_locate_cache to remove outdated listings.
+    The environment variable IDC_LOCATE_CACHE can be used to turn off the cache.
+
+    :param path: the base path to use
+    :type path: str
+    :param ext: the extension(s) to look for (incl dot)
+    :type ext: str or list
+    :param rel_path: the relative path to the annotation to use for looking for associated files, ignored if None
+    :type rel_path: str
+    :param suffix: the suffix to strip from the files, ignored if None or ""
+    :type suffix: str
+    :param image_prefix: the name prefix for the images, eg, image_
+    :type image_prefix: str
+    :param annotation_prefix: the name prefix for the annotations, e.g., gt_
+    :type annotation_prefix: str
+    :return: the located files
+    :rtype: list
+    """
+    if isinstance(ext, str):
+        ext = [ext]
+    if rel_path is not None:
+        path = os.path.join(os.path.dirname(path), rel_path, os.path.basename(path))
+    if (image_prefix is not None) and (annotation_prefix is not None):
+        name = os.path.basename(path)
+        if name.startswith(annotation_prefix):
+            name = image_prefix + name[len(annotation_prefix):]
+        path = os.path.join(os.path.dirname(path), name)
+    path = strip_suffix(path, suffix)
+    no_ext = os.path.splitext(path)[0]
+
+    if not _locate_cache_enabled():
+        return [no_ext + current for current in ext if os.path.exists(no_ext + current)]
+
+    available = _list_dir(os.path.dirname(no_ext) or ".").get(os.path.basename(no_ext))
+    if available is None:
+        return []
+    return [no_ext + current for current in ext if current in available]
+
 
 def locate_image(path: str, rel_path: str = None, suffix: str = None) -> Optional[str]:
     """
@@ -26,14 +137,50 @@ def locate_image(path: str, rel_path: str = None, suffix: str = None) -> Optiona
     :return: the located image, None if not found
     :rtype: str
     """
-    ext = [".png", ".PNG", ".jpg", ".JPG", ".jpeg", ".JPEG"]
-    images = locate_file(path, ext, rel_path=rel_path, suffix=suffix)
+    images = locate_file_cached(path, IMAGE_EXTENSIONS, rel_path=rel_path, suffix=suffix)
     if len(images) == 0:
         return None
     else:
         return images[0]
 
 
+def image_size_from_annotation(path: str, width: Optional[Union[int, float, str]], height: Optional[Union[int, float, str]],
+                               verify: bool = False, logger: logging.Logger = None) -> Optional[Tuple[int, int]]:
+    """
+    Turns the image dimensions stored in an annotation file into a size tuple, avoiding having
+    to read the image header later on. Optionally verifies the dimensions against the actual image.
+
+    :param path: the path of the associated image
+    :type path: str
+    :param width: the width from the annotation file, can be None
+    :param height: the height from the annotation file, can be None
+    :param verify: whether to compare the dimensions with the ones from the image file
+    :type verify: bool
+    :param logger: the optional logger to use for outputting mismatches
+    :type logger: logging.Logger
+    :return: the (width, height) tuple, None if not available or invalid
+    :rtype: tuple
+    """
+    try:
+        result = (int(width), int(height))
+        if (result[0] <= 0) or (result[1] <= 0):
+            result = None
+    except:
+        result = None
+
+    if verify:
+        try:
+            actual = imagesize.get(path)
+        except:
+            actual = (-1, -1)
+        if actual != (-1, -1):
+            if (result is not None) and (result != tuple(actual)) and (logger is not None):
+                logger.warning("Image dimensions from annotations %s differ from actual ones %s: %s" % (str(result), str(tuple(actual)), path))
+            result = tuple(actual)
+
+    return result
+
+
 def load_image_from_bytes(data) -> Image:
     """
     Loads a Pillow image from the bytes.
@@ -22,6 +22,7 @@ from ._map_labels import MapLabels
 from ._metadata_objdet import MetaDataObjectDetection
 from ._od_to_is import ObjectDetectionToImageSegmentation
 from ._od_to_ic import ObjectDetectionToImageClassification, MULTIPLICITY, MULTIPLICITY_ERROR, MULTIPLICITY_SKIP, MULTIPLICITY_SINGLE, MULTIPLICITY_MAJORITY
+from ._parallel import Parallel
 from ._pyfunc_filter import PythonFunctionFilter
 from ._remove_alpha import RemoveAlpha
 from ._remove_classes import RemoveClasses
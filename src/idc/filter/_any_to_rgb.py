@@ -1,7 +1,7 @@
 from typing import List
 
 from kasperl.api import make_list, flatten_list, safe_deepcopy
-from idc.api import ImageData, array_to_image
+from idc.api import ImageData
 from seppl import AnyData
 from seppl.io import BatchFilter
 
@@ -58,7 +58,6 @@ class AnyToRGB(BatchFilter):
         for any_item in make_list(data):
             rgb_image = any_item.image.convert("RGB")
             rgb_item = type(any_item)(source=None, image_name=any_item.image_name,
-                                      data=array_to_image(rgb_image, any_item.image_format)[1].getvalue(),
                                       image=rgb_image, image_format=any_item.image_format,
                                       metadata=safe_deepcopy(any_item.get_metadata()),
                                       annotation=safe_deepcopy(any_item.annotation))
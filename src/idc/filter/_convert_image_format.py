@@ -6,7 +6,7 @@ from wai.logging import LOGGING_WARNING
 from seppl import AnyData
 from seppl.io import BatchFilter
 from kasperl.api import make_list, flatten_list
-from idc.api import FORMAT_EXTENSIONS, FORMATS, image_to_bytesio
+from idc.api import FORMAT_EXTENSIONS, FORMATS
 
 
 class ConvertImageFormat(BatchFilter):
@@ -112,10 +112,9 @@ class ConvertImageFormat(BatchFilter):
                 img = item.image
                 if img.mode in ['RGBA', 'ARGB']:
                     img = img.convert('RGB')
-                output_io = image_to_bytesio(img, self.image_format)
-                # new container
+                # new container, the image only gets encoded in the new format when required
                 item = type(item)(image_name=os.path.splitext(item.image_name)[0] + FORMAT_EXTENSIONS[self.image_format],
-                                  data=output_io.getvalue(),
+                                  image=img, image_format=self.image_format,
                                   metadata=item.get_metadata(), annotation=item.annotation)
 
             result.append(item)
@@ -1,5 +1,4 @@
 import argparse
-import cv2
 from typing import List
 
 import numpy as np
@@ -156,6 +155,8 @@ class CountSpecks(ImageAndAnnotationFilter):
         :return: the filtered image
         :rtype: np.ndarray
         """
+        import cv2
+
         current = array
         if self.invert:
             current ^= 255  # take from here: https://stackoverflow.com/a/15901351/4698227
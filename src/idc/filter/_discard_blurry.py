@@ -2,7 +2,6 @@ import argparse
 import statistics
 from typing import List
 
-import cv2
 import numpy as np
 from wai.logging import LOGGING_WARNING
 
@@ -105,6 +104,8 @@ class DiscardBlurry(DiscardFilter):
         :param data: the record(s) to process
         :return: the potentially updated record(s)
         """
+        import cv2
+
         result = []
 
         for item in make_list(data):
@@ -2,7 +2,6 @@ import argparse
 import copy
 import numpy as np
 import re
-from shapely.geometry import Polygon
 from typing import List, Dict
 
 from wai.logging import LOGGING_WARNING
@@ -10,8 +9,7 @@ from wai.common.adams.imaging.locateobjects import LocatedObjects, LocatedObject
     NormalizedLocatedObjects
 from seppl.io import BatchFilter
 from kasperl.api import make_list, flatten_list
-from idc.api import ObjectDetectionData, ImageClassificationData, ImageSegmentationData, locatedobject_polygon_to_shapely, \
-    intersect_over_union, get_object_label
+from idc.api import ObjectDetectionData, ImageClassificationData, ImageSegmentationData, get_object_label
 
 
 class FilterLabels(BatchFilter):
@@ -204,6 +202,9 @@ class FilterLabels(BatchFilter):
         :type height: int
         :return: True if the objects overlaps the region or no region defined at all
         """
+        from shapely.geometry import Polygon
+        from idc.api import locatedobject_polygon_to_shapely, intersect_over_union
+
         if self._region is None:
             return True
 
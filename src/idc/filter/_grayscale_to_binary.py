@@ -7,7 +7,7 @@ import numpy as np
 from seppl import AnyData, AliasSupporter
 from wai.logging import LOGGING_WARNING
 
-from idc.api import ImageData, array_to_image, grayscale_required_info, binarize_image, REQUIRED_FORMAT_GRAYSCALE
+from idc.api import ImageData, grayscale_required_info, binarize_image, REQUIRED_FORMAT_GRAYSCALE
 from kasperl.api import make_list, flatten_list, safe_deepcopy
 from idc.filter import RequiredFormatFilter
 
@@ -131,7 +131,6 @@ class GrayscaleToBinary(RequiredFormatFilter, AliasSupporter):
             if self.logger().isEnabledFor(logging.DEBUG):
                 self.logger().debug(np.unique(binary_img, return_counts=True))
             binary_item = type(gray_item)(source=None, image_name=gray_item.image_name,
-                                          data=array_to_image(binary_img, gray_item.image_format)[1].getvalue(),
                                           image=binary_img, image_format=gray_item.image_format,
                                           metadata=safe_deepcopy(gray_item.get_metadata()),
                                           annotation=safe_deepcopy(gray_item.annotation))
@@ -7,7 +7,7 @@ from PIL import Image
 from wai.logging import LOGGING_WARNING
 
 from idc.api import ImageSegmentationData, \
-    APPLY_TO_IMAGE, APPLY_TO_ANNOTATIONS, APPLY_TO_BOTH, add_apply_to_param, image_to_bytesio, binarize_image
+    APPLY_TO_IMAGE, APPLY_TO_ANNOTATIONS, APPLY_TO_BOTH, add_apply_to_param, binarize_image
 from idc.filter import RequiredFormatFilter
 from kasperl.api import make_list, flatten_list, safe_deepcopy
 
@@ -171,35 +171,56 @@ class ImageAndAnnotationFilter(RequiredFormatFilter, abc.ABC):
         for item in make_list(data):
             self._pre_apply_filter(item)
 
+            # the image only gets modified when applying the filter to it or changing its format
+            modify_image = (self.apply_to in [APPLY_TO_IMAGE, APPLY_TO_BOTH]) or (self.output_format != OUTPUT_FORMAT_ASIS)
+
             # apply to image
+            array_new = None
             if self.apply_to in [APPLY_TO_IMAGE, APPLY_TO_BOTH]:
                 # incorrect format?
                 if not self._can_process(item.image):
                     result.append(item)
                     continue
-                # process
+                # process (the filter may modify the array in-place, hence a writable copy)
                 image = self._ensure_correct_format(item.image)
-                array = np.asarray(image).astype(np.uint8)
+                array = np.array(image, dtype=np.uint8)
                 array_new = self._apply_filter("image", array)
-            # apply to annotations, nothing to do for image
-            else:
-                array_new = np.asarray(item.image).astype(np.uint8)
-
-            # generate image/bytes
-            img_new = array_to_output_format(array_new, self.output_format, self.logger())
-            bytes_new = image_to_bytesio(img_new, item.image_format).getvalue()
+            # apply to annotations, only convert the image if a different output format is required
+            elif modify_image:
+                array_new = np.asarray(item.image, dtype=np.uint8)
 
             # apply to annotations?
             annotation_new = safe_deepcopy(item.annotation)
             if isinstance(item, ImageSegmentationData) and item.has_annotation():
                 if self.apply_to in [APPLY_TO_ANNOTATIONS, APPLY_TO_BOTH]:
                     for layer in annotation_new.layers:
-                        annotation_new.layers[layer] = self._apply_filter(layer, annotation_new.layers[layer])
-
-            item_new = type(item)(image_name=item.image_name,
-                                  data=bytes_new,
-                                  metadata=safe_deepcopy(item.get_metadata()),
-                                  annotation=annotation_new)
+                        # layers that are not stored densely get materialized read-only
+                        array = annotation_new.layers[layer]
+                        if not array.flags.writeable:
+                            array = np.array(array)
+                        annotation_new.layers[layer] = self._apply_filter(layer, array)
+
+            if modify_image:
+                # generate image, only gets encoded when required
+                img_new = array_to_output_format(array_new, self.output_format, self.logger())
+                item_new = type(item)(image_name=item.image_name,
+                                      image=img_new,
+                                      image_format=item.image_format,
+                                      metadata=safe_deepcopy(item.get_metadata()),
+                                      annotation=annotation_new)
+            else:
+                # pass through the original bytes/source, avoids decoding and re-encoding the image
+                image_new = None
+                if item.image_dirty:
+                    image_new = item.image
+                item_new = type(item)(source=item.source,
+                                      image_name=item.image_name,
+                                      data=item.data,
+                                      image=image_new,
+                                      image_format=item.image_format,
+                                      image_size=item.image_size,
+                                      metadata=safe_deepcopy(item.get_metadata()),
+                                      annotation=annotation_new)
 
             self._post_apply_filter(item_new)
 
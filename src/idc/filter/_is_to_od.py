@@ -1,14 +1,12 @@
 import argparse
 import re
-from typing import List
+from typing import List, Dict, Tuple
 
-import cv2
 import numpy as np
-from shapely import Polygon
 from wai.common.adams.imaging.locateobjects import LocatedObjects
 from wai.logging import LOGGING_WARNING
 
-from idc.api import ObjectDetectionData, ImageSegmentationData, shapely_to_locatedobject
+from idc.api import ObjectDetectionData, ImageSegmentationData, ImageSegmentationAnnotations, CroppedLayer
 from kasperl.api import make_list, flatten_list, safe_deepcopy
 from seppl.io import BatchFilter
 
@@ -120,22 +118,6 @@ class ImageSegmentationToObjectDetection(BatchFilter):
         if self.labels is None:
             self.labels = []
 
-    def _check_dimension(self, dim) -> bool:
-        """
-        Checks whether the dimension fits the min/max size.
-
-        :param dim: the width/height to check
-        :return: True if within specified min/max
-        :rtype: bool
-        """
-        if self.min_size is not None:
-            if dim < self.min_size:
-                return False
-        if self.max_size is not None:
-            if dim > self.max_size:
-                return False
-        return True
-
     def _label_matches(self, label: str) -> bool:
         """
         Checks whether the label matches.
@@ -162,22 +144,37 @@ class ImageSegmentationToObjectDetection(BatchFilter):
         :param label: the label to use
         :type label: str
         """
-        for i in range(len(contours)):
-            if len(contours[i]) > 2:
-                polygon = Polygon(np.squeeze(contours[i]))
-                # Convert invalid polygon to valid
-                if not polygon.is_valid:
-                    polygon = polygon.buffer(0)
-                if polygon.area == 0.0:
-                    continue
-                lobj = shapely_to_locatedobject(polygon, label=label)
-                if self.min_size is not None:
-                    if not self._check_dimension(lobj.width) or not self._check_dimension(lobj.height):
-                        continue
-                if self.max_size is not None:
-                    if not self._check_dimension(lobj.width) or not self._check_dimension(lobj.height):
-                        continue
-                ann.append(lobj)
+        from idc.api import contours_to_objdet
+
+        contours_to_objdet(contours, ann, label, min_size=self.min_size, max_size=self.max_size)
+
+    def _index_map_contours(self, annotation: ImageSegmentationAnnotations, bboxes: Dict[int, Tuple[int, int, int, int]], label: str):
+        """
+        Determines the contours of the label in the index map, only analyzing the bounding box of its indices.
+
+        :param annotation: the annotations with the index map
+        :type annotation: ImageSegmentationAnnotations
+        :param bboxes: the bounding boxes of the indices (x0, y0, x1, y1)
+        :type bboxes: dict
+        :param label: the label to get the contours for
+        :type label: str
+        :return: the contours, None if the label is not present
+        """
+        from idc.api import mask_contours
+
+        indices = [i for i, index_label in enumerate(annotation.index_labels, start=1) if (index_label == label) and (i in bboxes)]
+        if len(indices) == 0:
+            return None
+        x0 = min(bboxes[i][0] for i in indices)
+        y0 = min(bboxes[i][1] for i in indices)
+        x1 = max(bboxes[i][2] for i in indices)
+        y1 = max(bboxes[i][3] for i in indices)
+        roi = annotation.index_map[y0:y1 + 1, x0:x1 + 1]
+        if len(indices) == 1:
+            mask = roi == indices[0]
+        else:
+            mask = np.isin(roi, indices)
+        return mask_contours(mask, x=x0, y=y0)
 
     def _do_process(self, data):
         """
@@ -186,25 +183,37 @@ class ImageSegmentationToObjectDetection(BatchFilter):
         :param data: the record(s) to process
         :return: the potentially updated record(s)
         """
+        from idc.api import label_map_bboxes, layer_contours, mask_contours
+
         result = []
 
         for item in make_list(data):
             ann = LocatedObjects()
 
             if isinstance(item, ImageSegmentationData):
+                if item.annotation.has_index_map():
+                    bboxes = label_map_bboxes(item.annotation.index_map)
                 for i, label in enumerate(item.annotation.labels):
-                    if label not in item.annotation.layers:
-                        continue
                     if not self._label_matches(label):
                         continue
-                    layer = item.annotation.layers[label]
-                    layer = np.where(layer > 0, 1, 0)
-                    contours, _ = cv2.findContours(np.array(layer).astype(np.uint8), cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+                    if item.annotation.has_index_map():
+                        contours = self._index_map_contours(item.annotation, bboxes, label)
+                        if contours is None:
+                            continue
+                    else:
+                        if label not in item.annotation.layers:
+                            continue
+                        layer = item.annotation.layers.encoded(label)
+                        if isinstance(layer, CroppedLayer):
+                            contours = mask_contours(layer.mask, x=layer.offset[1], y=layer.offset[0])
+                        else:
+                            contours = layer_contours(item.annotation.layers[label])
                     self.logger().info("%s - # of contours: %s" % (label, str(len(contours))))
                     self._add_contours(contours, ann, label)
                     self.logger().info("# of polygons added: %s" % str(len(ann)))
                     item_new = ObjectDetectionData(source=item.source, image_name=item.image_name,
                                                    image=safe_deepcopy(item.image), data=safe_deepcopy(item.data),
+                                                   image_format=item.image_format,
                                                    annotation=ann, metadata=item.get_metadata())
                     result.append(item_new)
             else:
@@ -241,7 +241,9 @@ class MapLabels(BatchFilter):
                 del annotation.layers[label]
                 # if layer already present, merge
                 if new_label in annotation.layers:
-                    np.copyto(annotation.layers[new_label], data, 'safe', data > 0)
+                    merged = np.array(annotation.layers[new_label])
+                    np.copyto(merged, data, 'safe', data > 0)
+                    annotation.layers[new_label] = merged
                 else:
                     annotation.layers[new_label] = data
                 result = True
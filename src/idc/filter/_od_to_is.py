@@ -1,13 +1,12 @@
 import argparse
-import numpy as np
 import re
 from typing import List
 
-from PIL import Image, ImageDraw
 from seppl.io import BatchFilter
 from wai.logging import LOGGING_WARNING
 from kasperl.api import make_list, flatten_list
-from idc.api import ObjectDetectionData, ImageSegmentationData, ImageSegmentationAnnotations, get_object_label
+from idc.api import ObjectDetectionData, ImageSegmentationData, ImageSegmentationAnnotations, get_object_label, \
+    Rasterizer, locatedobject_to_points, RASTERIZERS, RASTERIZER_PIL, RASTERIZER_CV2, DEFAULT_RASTERIZER
 
 
 class ObjectDetectionToImageSegmentation(BatchFilter):
@@ -15,7 +14,7 @@ class ObjectDetectionToImageSegmentation(BatchFilter):
     Converts object detection annotations into image segmentation ones.
     """
 
-    def __init__(self, labels: List[str] = None, regexp: str = None,
+    def __init__(self, labels: List[str] = None, regexp: str = None, rasterizer: str = None, index_map: bool = None,
                  logger_name: str = None, logging_level: str = LOGGING_WARNING):
         """
         Initializes the filter.
@@ -24,6 +23,10 @@ class ObjectDetectionToImageSegmentation(BatchFilter):
         :type labels: list
         :param regexp: the regular expression for using only a subset
         :type regexp: str
+        :param rasterizer: the rasterizer to use for turning the polygons into layers, see RASTERIZERS
+        :type rasterizer: str
+        :param index_map: whether to generate an index map rather than layers (requires the labels, as they form the label table)
+        :type index_map: bool
         :param logger_name: the name to use for the logger
         :type logger_name: str
         :param logging_level: the logging level to use
@@ -32,7 +35,10 @@ class ObjectDetectionToImageSegmentation(BatchFilter):
         super().__init__(logger_name=logger_name, logging_level=logging_level)
         self.labels = labels
         self.regexp = regexp
+        self.rasterizer = rasterizer
+        self.index_map = index_map
         self._pattern = None
+        self._rasterizer = None
 
     def name(self) -> str:
         """
@@ -80,6 +86,8 @@ class ObjectDetectionToImageSegmentation(BatchFilter):
         parser = super()._create_argparser()
         parser.add_argument("--labels", type=str, default=None, help="The labels to use", required=False, nargs="*")
         parser.add_argument("--regexp", type=str, default=None, help="Regular expression for using only a subset of labels", required=False)
+        parser.add_argument("--rasterizer", choices=RASTERIZERS, default=DEFAULT_RASTERIZER, help="The rasterizer to use for turning the polygons into layers; " + RASTERIZER_CV2 + " is faster, but differs slightly from " + RASTERIZER_PIL + " along the edges of non-rectangular polygons.", required=False)
+        parser.add_argument("--index_map", action="store_true", help="Whether to generate an index map rather than layers, with later labels overwriting earlier ones in case of overlaps; requires the labels to be specified, as they form the label table.", required=False)
         return parser
 
     def _apply_args(self, ns: argparse.Namespace):
@@ -92,6 +100,8 @@ class ObjectDetectionToImageSegmentation(BatchFilter):
         super()._apply_args(ns)
         self.labels = ns.labels
         self.regexp = ns.regexp
+        self.rasterizer = ns.rasterizer
+        self.index_map = ns.index_map
 
     def initialize(self):
         """
@@ -101,6 +111,13 @@ class ObjectDetectionToImageSegmentation(BatchFilter):
         self._pattern = re.compile(self.regexp) if (self.regexp is not None) else None
         if ((self.labels is None) or (len(self.labels) == 0)) and (self._pattern is None):
             raise Exception("No labels/layers or regexp defined!")
+        if self.rasterizer is None:
+            self.rasterizer = DEFAULT_RASTERIZER
+        if self.index_map is None:
+            self.index_map = False
+        if self.index_map and ((self.labels is None) or (len(self.labels) == 0)):
+            raise Exception("Index maps require the labels to be defined, as they form the label table!")
+        self._rasterizer = Rasterizer(self.rasterizer)
 
     def _label_matches(self, label: str) -> bool:
         """
@@ -128,40 +145,33 @@ class ObjectDetectionToImageSegmentation(BatchFilter):
         result = []
 
         for item in make_list(data):
-            # draw bboxes/polygons
-            imgs = dict()
-            draws = dict()
+            # collect bboxes/polygons
+            polygons = dict()
             absolute = item.get_absolute()
             for obj in absolute:
                 label = get_object_label(obj)
                 if not self._label_matches(label):
                     continue
-                if label not in imgs:
-                    img = Image.new("1", item.image_size)
-                    imgs[label] = img
-                    draw = ImageDraw.Draw(img)
-                    draws[label] = draw
-                if obj.has_polygon():
-                    points = [(x, y) for x, y in zip(obj.get_polygon_x(), obj.get_polygon_y())]
-                else:
-                    points = [
-                        (obj.x, obj.y),
-                        (obj.x + obj.width + 1, obj.y),
-                        (obj.x + obj.width + 1, obj.y + obj.height + 1),
-                        (obj.x, obj.y + obj.height + 1)]
-                draws[label].polygon(points, fill=255, outline=255, width=1)
-
-            # generate layers
-            layers = dict()
-            for label in imgs:
-                layers[label] = np.asarray(imgs[label]).astype(np.uint8)
-                layers[label] = np.where(layers[label] == 1, 255, 0).astype(np.uint8)
-
-            self.logger().info("Layers generated: %s" % ",".join(sorted(layers.keys())))
+                if label not in polygons:
+                    polygons[label] = []
+                polygons[label].append(locatedobject_to_points(obj))
+
+            self.logger().info("Layers generated: %s" % ",".join(sorted(polygons.keys())))
 
             # generate imgseg container
-            ann = ImageSegmentationAnnotations(labels=self.labels[:], layers=layers)
-            imgseg = ImageSegmentationData(source=item.source, image_name=item.image_name, data=item.data, annotation=ann, metadata=item.get_metadata())
+            width, height = item.image_size
+            if self.index_map:
+                for label in polygons:
+                    if label not in self.labels:
+                        raise Exception("Layer %s is not specified as label!" % label)
+                index_map = self._rasterizer.to_index_map(polygons, self.labels, width, height)
+                ann = ImageSegmentationAnnotations(labels=self.labels[:], index_map=index_map)
+            else:
+                layers = self._rasterizer.to_layers(polygons, width, height)
+                ann = ImageSegmentationAnnotations(labels=self.labels[:], layers=layers)
+            image = item.image if item.image_dirty else None
+            imgseg = ImageSegmentationData(source=item.source, image_name=item.image_name, data=item.data, image=image,
+                                           image_format=item.image_format, annotation=ann, metadata=item.get_metadata())
             result.append(imgseg)
 
         return flatten_list(result)
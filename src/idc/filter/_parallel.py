@@ -0,0 +1,318 @@
+import argparse
+import copy
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Dict, Optional, Any, Tuple
+
+from wai.logging import LOGGING_WARNING, set_logging_level
+from seppl import split_args, Plugin, AnyData, init_initializable, Initializable
+from seppl.io import BatchFilter, MultiFilter
+from kasperl.api import make_list, flatten_list, PIPELINE_FORMATS, PIPELINE_FORMAT_CMDLINE, load_pipeline, Session
+
+_worker_filter = None
+""" the filter (chain) used within a worker process. """
+
+_worker_session = None
+""" the session used within a worker process. """
+
+
+def _parse_sub_flow(sub_flow: str, sub_flow_format: str, available_filters: Dict[str, Plugin], logger=None) -> Optional[BatchFilter]:
+    """
+    Parses the sub-flow and returns the filter (chain) it represents.
+
+    :param sub_flow: the command-line/pipeline file with the filter(s)
+    :type sub_flow: str
+    :param sub_flow_format: the format the sub-flow is in
+    :type sub_flow_format: str
+    :param available_filters: the filters to use for parsing
+    :type available_filters: dict
+    :param logger: the optional logger to use
+    :return: the filter, None if no filters defined
+    :rtype: BatchFilter
+    """
+    from seppl import args_to_objects
+
+    pipeline = load_pipeline(sub_flow, sub_flow_format, logger=logger)
+    args = split_args(pipeline, list(available_filters.keys()))
+    filters = []
+    for plugin in args_to_objects(args, available_filters, allow_global_options=False):
+        if isinstance(plugin, BatchFilter):
+            filters.append(plugin)
+    if len(filters) == 0:
+        return None
+    elif len(filters) == 1:
+        return filters[0]
+    else:
+        return MultiFilter(filters=filters)
+
+
+def _init_worker(sub_flow: str, sub_flow_format: str, options: Optional[argparse.Namespace], logger_name: Optional[str]):
+    """
+    Initializes the filter (chain) of the worker process.
+
+    :param sub_flow: the command-line/pipeline file with the filter(s)
+    :type sub_flow: str
+    :param sub_flow_format: the format the sub-flow is in
+    :type sub_flow_format: str
+    :param options: the global options of the main session, can be None
+    :type options: argparse.Namespace
+    :param logger_name: the name of the logger of the main session, can be None
+    :type logger_name: str
+    """
+    global _worker_filter
+    global _worker_session
+    from idc.registry import available_filters
+    _worker_session = Session(options=options)
+    if logger_name is not None:
+        _worker_session.logger = logging.getLogger(logger_name)
+    if (options is not None) and (getattr(options, "logging_level", None) is not None):
+        set_logging_level(_worker_session.logger, options.logging_level)
+    _worker_filter = _parse_sub_flow(sub_flow, sub_flow_format, available_filters())
+    if _worker_filter is not None:
+        _worker_filter.session = _worker_session
+        if isinstance(_worker_filter, Initializable):
+            init_initializable(_worker_filter, "filter", raise_again=True)
+
+
+def _process_in_worker(task: Tuple[Any, Any]) -> List:
+    """
+    Processes the item with the filter (chain) of the worker process.
+
+    :param task: the tuple of current input and data item
+    :type task: tuple
+    :return: the generated data
+    :rtype: list
+    """
+    current_input, item = task
+    if _worker_filter is None:
+        return [item]
+    _worker_session.current_input = current_input
+    result = _worker_filter.process(item)
+    if result is None:
+        return []
+    return make_list(result)
+
+
+class Parallel(BatchFilter):
+    """
+    Processes the data with the sub-flow of filters using a pool of worker processes.
+    """
+
+    def __init__(self, sub_flow: str = None, sub_flow_format: str = None, num_processes: int = None,
+                 chunk_size: int = None, unordered: bool = None,
+                 logger_name: str = None, logging_level: str = LOGGING_WARNING):
+        """
+        Initializes the filter.
+
+        :param sub_flow: the command-line/pipeline file with the filter(s) to execute
+        :type sub_flow: str
+        :param sub_flow_format: the format the sub-flow is in
+        :type sub_flow_format: str
+        :param num_processes: the number of worker processes to use, uses number of CPUs if None
+        :type num_processes: int
+        :param chunk_size: the number of items to send to a worker process at a time
+        :type chunk_size: int
+        :param unordered: whether to forward the data in the order of completion rather than input order
+        :type unordered: bool
+        :param logger_name: the name to use for the logger
+        :type logger_name: str
+        :param logging_level: the logging level to use
+        :type logging_level: str
+        """
+        super().__init__(logger_name=logger_name, logging_level=logging_level)
+        self.sub_flow = sub_flow
+        self.sub_flow_format = sub_flow_format
+        self.num_processes = num_processes
+        self.chunk_size = chunk_size
+        self.unordered = unordered
+        self._filter = None
+        self._executor = None
+        self._num_single = None
+
+    def name(self) -> str:
+        """
+        Returns the name of the handler, used as sub-command.
+
+        :return: the name
+        :rtype: str
+        """
+        return "parallel"
+
+    def description(self) -> str:
+        """
+        Returns a description of the handler.
+
+        :return: the description
+        :rtype: str
+        """
+        return "BATCH MODE ONLY: requires a batch writer or forcing batch mode (-b/--force_batch), as there is " \
+               "nothing to distribute when receiving the items one by one; a stream of single items results in an " \
+               "error. Pushes the data through the filter(s) defined as its sub-flow using a pool of worker processes. " \
+               "As batch mode keeps all the records in memory, limit the number of records per run with " \
+               "record-window before this filter when processing large datasets. " \
+               "Filters in the sub-flow must not rely on state across items."
+
+    def accepts(self) -> List:
+        """
+        Returns the list of classes that are accepted.
+
+        :return: the list of classes
+        :rtype: list
+        """
+        return [AnyData]
+
+    def generates(self) -> List:
+        """
+        Returns the list of classes that get produced.
+
+        :return: the list of classes
+        :rtype: list
+        """
+        return [AnyData]
+
+    def _create_argparser(self) -> argparse.ArgumentParser:
+        """
+        Creates an argument parser. Derived classes need to fill in the options.
+
+        :return: the parser
+        :rtype: argparse.ArgumentParser
+        """
+        parser = super()._create_argparser()
+        parser.add_argument("-f", "--sub_flow", type=str, default=None, help="The subflow with filter(s) to execute.")
+        parser.add_argument("-F", "--sub_flow_format", choices=PIPELINE_FORMATS, default=PIPELINE_FORMAT_CMDLINE, help="The format of the pipeline.")
+        parser.add_argument("-n", "--num_processes", type=int, default=None, help="The number of worker processes to use; uses the number of CPUs if not specified.", required=False)
+        parser.add_argument("-c", "--chunk_size", type=int, default=1, help="The number of items to send to a worker process at a time.", required=False)
+        parser.add_argument("--unordered", action="store_true", help="Whether to forward the data in the order of completion rather than in the input order.", required=False)
+        return parser
+
+    def _apply_args(self, ns: argparse.Namespace):
+        """
+        Initializes the object with the arguments of the parsed namespace.
+
+        :param ns: the parsed arguments
+        :type ns: argparse.Namespace
+        """
+        super()._apply_args(ns)
+        self.sub_flow = ns.sub_flow
+        self.sub_flow_format = ns.sub_flow_format
+        self.num_processes = ns.num_processes
+        self.chunk_size = ns.chunk_size
+        self.unordered = ns.unordered
+
+    def _requires_list_input(self) -> bool:
+        """
+        Returns whether lists are expected as input for the _process method.
+
+        :return: True if list inputs are expected by the filter
+        :rtype: bool
+        """
+        return True
+
+    def initialize(self):
+        """
+        Initializes the processing, e.g., for opening files or databases.
+        """
+        from idc.registry import available_filters
+
+        super().initialize()
+
+        if self.sub_flow_format is None:
+            self.sub_flow_format = PIPELINE_FORMAT_CMDLINE
+        if self.num_processes is None:
+            self.num_processes = os.cpu_count()
+        if self.num_processes < 1:
+            raise Exception("At least one process is required: %d" % self.num_processes)
+        if self.chunk_size is None:
+            self.chunk_size = 1
+        if self.chunk_size < 1:
+            raise Exception("Chunk size must be at least 1: %d" % self.chunk_size)
+        if self.unordered is None:
+            self.unordered = False
+
+        # the local sub-flow is used for single items and validating the sub-flow
+        self._filter = None
+        if self.sub_flow is not None:
+            self._filter = _parse_sub_flow(self.sub_flow, self.sub_flow_format, available_filters(), logger=self.logger())
+        if self._filter is not None:
+            self._filter.session = self.session
+            if isinstance(self._filter, Initializable):
+                init_initializable(self._filter, "filter")
+        self._executor = None
+        self._num_single = 0
+
+    def process(self, data):
+        """
+        Processes the data record.
+
+        :param data: the record(s) to process
+        :return: the potentially updated record or None if to drop
+        """
+        # in batch mode, the data arrives as a single list; repeated single items means streaming mode
+        if not self.skip and not isinstance(data, list):
+            self._num_single += 1
+            if self._num_single > 1:
+                raise Exception("The %s filter only works in batch mode, use a batch writer or force batch mode "
+                                "(-b/--force_batch); to limit memory usage, process the records in chunks by placing "
+                                "record-window (-f/-t) before the filter and running the pipeline per chunk!" % self.name())
+        return super().process(data)
+
+    def _process_locally(self, data: List) -> List:
+        """
+        Processes the data with the sub-flow in the main process.
+
+        :param data: the data to process
+        :type data: list
+        :return: the generated data
+        :rtype: list
+        """
+        result = []
+        for item in data:
+            item = self._filter.process(item)
+            if item is not None:
+                result.append(item)
+        return result
+
+    def _do_process(self, data):
+        """
+        Processes the data record(s).
+
+        :param data: the record(s) to process
+        :return: the potentially updated record(s)
+        """
+        data = make_list(data)
+        if self._filter is None:
+            return flatten_list(data)
+        if (len(data) < 2) or (self.num_processes == 1):
+            return flatten_list(self._process_locally(data))
+
+        if self._executor is None:
+            self.logger().info("Starting %d worker processes" % self.num_processes)
+            self._executor = ProcessPoolExecutor(max_workers=self.num_processes,
+                                                 initializer=_init_worker,
+                                                 initargs=(self.sub_flow, self.sub_flow_format,
+                                                           copy.copy(self.session.options),
+                                                           self.session.logger.name if (self.session.logger is not None) else None))
+
+        tasks = [(self.session.current_input, item) for item in data]
+        result = []
+        if self.unordered:
+            futures = [self._executor.submit(_process_in_worker, task) for task in tasks]
+            for future in as_completed(futures):
+                result.extend(future.result())
+        else:
+            for generated in self._executor.map(_process_in_worker, tasks, chunksize=self.chunk_size):
+                result.extend(generated)
+
+        return flatten_list(result)
+
+    def finalize(self):
+        """
+        Finishes the processing, e.g., for closing files or databases.
+        """
+        super().finalize()
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        if (self._filter is not None) and isinstance(self._filter, Initializable):
+            self._filter.finalize()
@@ -8,7 +8,7 @@ from seppl import AnyData, AliasSupporter
 from wai.logging import LOGGING_WARNING
 
 from kasperl.api import make_list, flatten_list, safe_deepcopy
-from idc.api import ImageData, array_to_image, REQUIRED_FORMAT_RGB
+from idc.api import ImageData, REQUIRED_FORMAT_RGB
 from idc.filter import RequiredFormatFilter
 
 CONVERSION_BT601 = "BT.601"
@@ -155,7 +155,6 @@ class RGBToGrayscale(RequiredFormatFilter, AliasSupporter):
             if self.logger().isEnabledFor(logging.DEBUG):
                 self.logger().debug(np.unique(gray_img, return_counts=True))
             gray_item = type(rgb_item)(source=None, image_name=rgb_item.image_name,
-                                       data=array_to_image(gray_array, rgb_item.image_format)[1].getvalue(),
                                        image=gray_img, image_format=rgb_item.image_format,
                                        metadata=safe_deepcopy(rgb_item.get_metadata()),
                                        annotation=safe_deepcopy(rgb_item.annotation))
@@ -8,7 +8,7 @@ from seppl.io import BatchFilter
 from wai.logging import LOGGING_WARNING
 
 from kasperl.api import make_list, flatten_list, safe_deepcopy
-from idc.api import ImageData, array_to_image
+from idc.api import ImageData
 
 
 SORTING_COLS = "cols"
@@ -138,7 +138,6 @@ class SortPixels(BatchFilter):
                     raise Exception("Unhandled sorting type: %s" % self.sorting)
                 sorted_img = Image.fromarray(np.uint8(sorted_array), mode='L')
                 sorted_item = type(item)(source=None, image_name=item.image_name,
-                                         data=array_to_image(sorted_array, item.image_format)[1].getvalue(),
                                          image=sorted_img, image_format=item.image_format,
                                          metadata=safe_deepcopy(item.get_metadata()),
                                          annotation=safe_deepcopy(item.annotation))
@@ -1,11 +1,12 @@
 import argparse
 from typing import List
 
+import numpy as np
 from wai.logging import LOGGING_WARNING
 from wai.common.adams.imaging.locateobjects import LocatedObjects, LocatedObject
 from seppl.io import BatchFilter
 from kasperl.api import make_list, flatten_list
-from idc.api import ObjectDetectionData
+from idc.api import ObjectDetectionData, ColumnarLocatedObjects
 
 
 class DimensionDiscarder(BatchFilter):
@@ -163,6 +164,26 @@ class DimensionDiscarder(BatchFilter):
 
         return False
 
+    def _keep_columnar(self, cols: ColumnarLocatedObjects) -> np.ndarray:
+        """
+        Determines which of the columnar objects to keep, based on width and height.
+
+        :param cols: the columnar annotations to check
+        :type cols: ColumnarLocatedObjects
+        :return: the boolean array indicating which objects to keep
+        :rtype: np.ndarray
+        """
+        result = np.ones(len(cols), dtype=bool)
+        if self.min_width is not None:
+            result &= cols.width >= self.min_width
+        if self.max_width is not None:
+            result &= cols.width <= self.max_width
+        if self.min_height is not None:
+            result &= cols.height >= self.min_height
+        if self.max_height is not None:
+            result &= cols.height <= self.max_height
+        return result
+
     def _do_process(self, data):
         """
         Processes the data record(s).
@@ -173,6 +194,15 @@ class DimensionDiscarder(BatchFilter):
         result = []
 
         for item in make_list(data):
+            # columnar annotations and no area checks? avoid creating objects
+            if item.has_columnar() and (self.min_area is None) and (self.max_area is None):
+                cols = item.get_columnar()
+                keep = self._keep_columnar(cols)
+                if not keep.all():
+                    item = item.duplicate()
+                    item.set_columnar(cols.subset(keep))
+                result.append(item)
+                continue
             ann = LocatedObjects((located_object
                                   for located_object in item.annotation
                                   if not self._should_discard_located_object(located_object)))
@@ -1,14 +1,14 @@
 import argparse
 import re
-from typing import List
+from typing import List, Optional, Tuple
 
+import numpy as np
 from seppl import AliasSupporter
 from seppl.io import BatchFilter
-from shapely.geometry import Polygon
 from wai.common.adams.imaging.locateobjects import LocatedObjects, LocatedObject
 from wai.logging import LOGGING_WARNING
 
-from idc.api import ObjectDetectionData, locatedobject_polygon_to_shapely, intersect_over_union, get_object_label
+from idc.api import ObjectDetectionData, get_object_label
 from kasperl.api import make_list, flatten_list
 
 
@@ -180,25 +180,26 @@ class LabelPresent(BatchFilter, AliasSupporter):
         else:
             return bool(self._pattern.match(label)) or label in self.labels
 
-    def check_regions(self, located_object: LocatedObject, width: int, height: int) -> bool:
+    def _region_data(self, width: int, height: int) -> Tuple[np.ndarray, Optional[np.ndarray]]:
         """
-        Checks whether the object falls within at least one of the regions or, when inverting,
-        whether it does not fall within any.
+        Returns the (prepared) region polygons for the image dimensions and, if all regions are
+        axis-aligned rectangles, their bounding boxes.
 
-        :param located_object: the object to check
         :param width: the width of the image
+        :type width: int
         :param height: the height of the image
-        :return: True if no regions defined or if object matches at least one region (invert_regions=False) or none at all (invert_regions=True)
+        :type height: int
+        :return: the tuple of region polygons and bboxes (None if not all regions are rectangles)
+        :rtype: tuple
         """
-        if len(self._regions) == 0:
-            return True
+        import shapely
+        from shapely.geometry import Polygon
 
         key = "%d-%d" % (width, height)
 
         # already created polygons for image dimensions?
         if key not in self._polygons:
             region_polys = []
-            self._polygons[key] = region_polys
             for region in self._regions:
                 if self._normalized:
                     points = []
@@ -207,22 +208,71 @@ class LabelPresent(BatchFilter, AliasSupporter):
                 else:
                     points = region
                 region_polys.append(Polygon(points))
-        else:
-            region_polys = self._polygons[key]
+            region_polys = np.array(region_polys, dtype=object)
+            shapely.prepare(region_polys)
+            region_bboxes = shapely.bounds(region_polys)
+            if not np.all(shapely.area(region_polys) == shapely.area(shapely.envelope(region_polys))):
+                region_bboxes = None
+            self._polygons[key] = (region_polys, region_bboxes)
+
+        return self._polygons[key]
+
+    def match_regions(self, located_objects: LocatedObjects, width: int, height: int) -> np.ndarray:
+        """
+        Checks for all objects whether they fall within at least one of the regions or, when inverting,
+        whether they do not fall within any.
+
+        :param located_objects: the objects to check
+        :type located_objects: LocatedObjects
+        :param width: the width of the image
+        :type width: int
+        :param height: the height of the image
+        :type height: int
+        :return: the boolean array, True if no regions defined or if object matches at least one region (invert_regions=False) or none at all (invert_regions=True)
+        :rtype: np.ndarray
+        """
+        import shapely
+        from idc.api import locatedobject_polygon_to_shapely, locatedobjects_to_bboxes, bbox_iou_matrix, polygon_iou_matrix
+
+        if len(self._regions) == 0:
+            return np.ones(len(located_objects), dtype=bool)
+
+        region_polys, region_bboxes = self._region_data(width, height)
+
+        # objects with polygons vs bbox-only objects
+        has_polygon = np.array([obj.has_polygon() for obj in located_objects], dtype=bool)
+        iou = np.zeros((len(located_objects), len(region_polys)), dtype=np.float64)
+        bbox_indices = np.flatnonzero(~has_polygon)
+        poly_indices = np.flatnonzero(has_polygon)
+        if len(bbox_indices) > 0:
+            bboxes = locatedobjects_to_bboxes([located_objects[i] for i in bbox_indices])
+            if region_bboxes is not None:
+                iou[bbox_indices] = bbox_iou_matrix(bboxes, region_bboxes)
+            else:
+                iou[bbox_indices] = polygon_iou_matrix(shapely.box(bboxes[:, 0], bboxes[:, 1], bboxes[:, 2], bboxes[:, 3]), region_polys, prepared=True)
+        if len(poly_indices) > 0:
+            object_polys = np.array([locatedobject_polygon_to_shapely(located_objects[i]) for i in poly_indices], dtype=object)
+            iou[poly_indices] = polygon_iou_matrix(object_polys, region_polys, prepared=True)
+        self.logger().debug("iou:\n%s" % str(iou))
 
         # overlap with any region?
-        object_poly = locatedobject_polygon_to_shapely(located_object)
-        match = False
-        for region_poly in region_polys:
-            iou = intersect_over_union(object_poly, region_poly)
-            self.logger().debug("object_poly: %s" % str(object_poly))
-            self.logger().debug("region_poly: %s" % str(region_poly))
-            self.logger().debug("iou: %f > %f = %s" % (iou, self.min_iou, str(iou > self.min_iou)))
-            if iou > self.min_iou:
-                match = True
-                break
-
-        result = (not self.invert_regions and match) or (self.invert_regions and not match)
+        match = np.any(iou > self.min_iou, axis=1)
+        if self.invert_regions:
+            return ~match
+        else:
+            return match
+
+    def check_regions(self, located_object: LocatedObject, width: int, height: int) -> bool:
+        """
+        Checks whether the object falls within at least one of the regions or, when inverting,
+        whether it does not fall within any.
+
+        :param located_object: the object to check
+        :param width: the width of the image
+        :param height: the height of the image
+        :return: True if no regions defined or if object matches at least one region (invert_regions=False) or none at all (invert_regions=True)
+        """
+        result = bool(self.match_regions(LocatedObjects([located_object]), width, height)[0])
         self.logger().debug("check_regions = %s" % str(result))
         return result
 
@@ -235,18 +285,21 @@ class LabelPresent(BatchFilter, AliasSupporter):
         :param height: the height of the image
         :return: the list of indices of objects matching the criteria
         """
-        result = []
-
         # Search the located objects
+        candidates = []
         for index, located_object in enumerate(located_objects):
             label = get_object_label(located_object)
             label_ok = self.check_label(label)
             self.logger().debug("check_label: %s = %s" % (label, str(label_ok)))
             if label_ok:
-                if self.check_regions(located_object, width, height):
-                    result.append(index)
+                candidates.append(index)
 
-        return result
+        if len(candidates) == 0:
+            return []
+
+        # check regions of all candidates at once
+        match = self.match_regions(LocatedObjects([located_objects[i] for i in candidates]), width, height)
+        return [index for index, ok in zip(candidates, match.tolist()) if ok]
 
     def _do_process(self, data):
         """
@@ -2,14 +2,13 @@ import argparse
 import copy
 from typing import List, Tuple
 
-from shapely import simplify, Polygon
 from wai.logging import LOGGING_WARNING
 from wai.common.adams.imaging.locateobjects import LocatedObjects, LocatedObject
 from wai.common.geometry import Point as WaiPoint, Polygon as WaiPolygon
 
 from seppl.io import BatchFilter
 from kasperl.api import make_list, flatten_list
-from idc.api import ObjectDetectionData, locatedobject_polygon_to_shapely
+from idc.api import ObjectDetectionData
 
 
 class PolygonSimplifier(BatchFilter):
@@ -98,6 +97,9 @@ class PolygonSimplifier(BatchFilter):
         :return: the potentially updated object
         :rtype: tuple
         """
+        from shapely import simplify, Polygon
+        from idc.api import locatedobject_polygon_to_shapely
+
         result = False
 
         if obj.has_polygon():
@@ -3,5 +3,6 @@ from kasperl.reader import EVENTS, EVENT_MODIFIED, EVENT_CREATED, WATCH_ACTIONS,
 from ._data import DataReader
 from ._multi import MultiReader
 from ._poll_dir import PollDir
+from ._prefetch import PrefetchReader, IDC_PREFETCH_THREADS, DEFAULT_NUM_THREADS, default_num_threads
 from ._pyfunc import PythonFunctionReader
 from ._watch_dir import WatchDir
@@ -0,0 +1,245 @@
+import argparse
+import copy
+import os
+import queue
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Iterable, Union, Dict
+
+from seppl import Plugin, init_initializable, Initializable
+from seppl.io import locate_files
+from seppl.variables import VariableSupporter, variable_list
+from wai.logging import LOGGING_WARNING
+
+from kasperl.api import MetaFileReader, parse_reader
+from idc.api import ImageData
+
+IDC_PREFETCH_THREADS = "IDC_PREFETCH_THREADS"
+""" the environment variable for overriding the default number of threads. """
+
+DEFAULT_NUM_THREADS = 4
+""" the default number of threads to use. """
+
+
+def default_num_threads() -> int:
+    """
+    Returns the default number of threads to use for prefetching.
+    Uses the IDC_PREFETCH_THREADS environment variable if set.
+
+    :return: the number of threads
+    :rtype: int
+    """
+    try:
+        result = int(os.getenv(IDC_PREFETCH_THREADS, str(DEFAULT_NUM_THREADS)))
+    except:
+        result = DEFAULT_NUM_THREADS
+    return max(1, result)
+
+
+class PrefetchReader(MetaFileReader, VariableSupporter):
+
+    def __init__(self, source: Union[str, List[str]] = None, source_list: Union[str, List[str]] = None,
+                 resume_from: str = None, base_reader: str = None, num_threads: int = None, prefetch: int = None,
+                 decode_images: bool = None, logger_name: str = None, logging_level: str = LOGGING_WARNING):
+        """
+        Initializes the reader.
+
+        :param source: the filename(s)
+        :param source_list: the file(s) with filename(s)
+        :param resume_from: the file to resume from (glob)
+        :type resume_from: str
+        :param base_reader: the base reader to use (command-line)
+        :type base_reader: str
+        :param num_threads: the number of threads to use for reading
+        :type num_threads: int
+        :param prefetch: the maximum number of inputs to read ahead
+        :type prefetch: int
+        :param decode_images: whether to decode the images in the background as well
+        :type decode_images: bool
+        :param logger_name: the name to use for the logger
+        :type logger_name: str
+        :param logging_level: the logging level to use
+        :type logging_level: str
+        """
+        super().__init__(base_reader=base_reader, logger_name=logger_name, logging_level=logging_level)
+        self.source = source
+        self.source_list = source_list
+        self.resume_from = resume_from
+        self.num_threads = num_threads
+        self.prefetch = prefetch
+        self.decode_images = decode_images
+        self._inputs = None
+        self._readers = None
+        self._finished = False
+
+    def name(self) -> str:
+        """
+        Returns the name of the handler, used as sub-command.
+
+        :return: the name
+        :rtype: str
+        """
+        return "prefetch"
+
+    def description(self) -> str:
+        """
+        Returns a description of the reader.
+
+        :return: the description
+        :rtype: str
+        """
+        return "Reads the files with the base reader using a pool of threads, reading the next inputs in the " \
+               "background while the current ones are being processed. The output order is preserved. " \
+               "The default number of threads can be set via the " + IDC_PREFETCH_THREADS + " environment variable."
+
+    def _base_reader_help(self) -> str:
+        """
+        Returns the help string on the base reader for the argument parser.
+
+        :return: the help string
+        :rtype: str
+        """
+        return "The command-line of the reader for reading the files, its input options get overridden"
+
+    def _create_argparser(self) -> argparse.ArgumentParser:
+        """
+        Creates an argument parser. Derived classes need to fill in the options.
+
+        :return: the parser
+        :rtype: argparse.ArgumentParser
+        """
+        parser = super()._create_argparser()
+        parser.add_argument("-i", "--input", type=str, help="Path to the file(s) to read; glob syntax is supported; " + variable_list(obj=self), required=False, nargs="*")
+        parser.add_argument("-I", "--input_list", type=str, help="Path to the text file(s) listing the files to use; " + variable_list(obj=self), required=False, nargs="*")
+        parser.add_argument("--resume_from", type=str, help="Glob expression matching the file to resume from, e.g., '*/012345.txt'", required=False)
+        parser.add_argument("-t", "--num_threads", type=int, help="The number of threads to use for reading; uses " + IDC_PREFETCH_THREADS + " or " + str(DEFAULT_NUM_THREADS) + " if not specified.", required=False, default=None)
+        parser.add_argument("-p", "--prefetch", type=int, help="The maximum number of inputs to read ahead; uses twice the number of threads if not specified.", required=False, default=None)
+        parser.add_argument("--decode_images", action="store_true", help="Whether to decode the images in the background as well.", required=False)
+        return parser
+
+    def _apply_args(self, ns: argparse.Namespace):
+        """
+        Initializes the object with the arguments of the parsed namespace.
+
+        :param ns: the parsed arguments
+        :type ns: argparse.Namespace
+        """
+        super()._apply_args(ns)
+        self.source = ns.input
+        self.source_list = ns.input_list
+        self.resume_from = ns.resume_from
+        self.num_threads = ns.num_threads
+        self.prefetch = ns.prefetch
+        self.decode_images = ns.decode_images
+
+    def _available_readers(self) -> Dict[str, Plugin]:
+        """
+        Return the available readers.
+
+        :return: the reader plugins
+        :rtype: dict
+        """
+        from idc.registry import available_readers
+        return available_readers()
+
+    def initialize(self):
+        """
+        Initializes the processing, e.g., for opening files or databases.
+        """
+        super().initialize()
+        if self.num_threads is None:
+            self.num_threads = default_num_threads()
+        if self.num_threads < 1:
+            raise Exception("At least one thread is required: %d" % self.num_threads)
+        if self.prefetch is None:
+            self.prefetch = 2 * self.num_threads
+        if self.prefetch < 1:
+            raise Exception("Need to prefetch at least one input: %d" % self.prefetch)
+        if self.decode_images is None:
+            self.decode_images = False
+        # every thread uses its own reader and session to avoid sharing state
+        self._readers = queue.Queue()
+        for i in range(self.num_threads):
+            reader = parse_reader(self.base_reader, self._available_readers())
+            reader.session = copy.copy(self.session)
+            self._readers.put(reader)
+        self._inputs = None
+        self._finished = False
+
+    def _read_file(self, path: str) -> List:
+        """
+        Reads the file using one of the available base readers.
+
+        :param path: the file to read
+        :type path: str
+        :return: the data that was generated
+        :rtype: list
+        """
+        result = []
+        reader = self._readers.get()
+        try:
+            # only the file from the prefetch reader, ignoring any inputs of the base reader itself
+            reader.source = [path]
+            if hasattr(reader, "source_list"):
+                reader.source_list = None
+            if hasattr(reader, "resume_from"):
+                reader.resume_from = None
+            if isinstance(reader, Initializable):
+                init_initializable(reader, "reader", raise_again=True)
+            while not reader.has_finished():
+                for item in reader.read():
+                    if self.decode_images and isinstance(item, ImageData) and (item.image is not None):
+                        item.image.load()
+                    result.append(item)
+            reader.finalize()
+        finally:
+            self._readers.put(reader)
+        return result
+
+    def read(self) -> Iterable:
+        """
+        Loads the data and returns the items one by one.
+
+        :return: the data
+        :rtype: Iterable
+        """
+        if self._inputs is None:
+            self._inputs = locate_files(self.source, input_lists=self.source_list, fail_if_empty=True, resume_from=self.resume_from)
+        self.logger().info("# inputs: %d, # threads: %d" % (len(self._inputs), self.num_threads))
+
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.num_threads) as executor:
+            try:
+                while (len(self._inputs) > 0) or (len(pending) > 0):
+                    while (len(self._inputs) > 0) and (len(pending) < self.prefetch):
+                        path = self._inputs.pop(0)
+                        pending.append((path, executor.submit(self._read_file, path)))
+                    path, future = pending.popleft()
+                    self.session.current_input = path
+                    for item in future.result():
+                        yield item
+                    if self.session.stopped:
+                        break
+            finally:
+                for _, future in pending:
+                    future.cancel()
+        self._finished = True
+
+    def has_finished(self) -> bool:
+        """
+        Returns whether reading has finished.
+
+        :return: True if finished
+        :rtype: bool
+        """
+        return self._finished
+
+    def finalize(self):
+        """
+        Finishes the reading, e.g., for closing files or databases.
+        """
+        super().finalize()
+        if self._readers is not None:
+            while not self._readers.empty():
+                self._readers.get().finalize()
+            self._readers = None
@@ -1,8 +1,9 @@
-from typing import Dict, List
+from typing import Dict, List, Iterable
 
 from wai.logging import LOGGING_WARNING
 from seppl import Plugin
 from kasperl.reader import WatchDir as KWatchDir
+from idc.api import clear_locate_cache
 
 
 class WatchDir(KWatchDir):
@@ -51,3 +52,15 @@ class WatchDir(KWatchDir):
         """
         from idc.registry import available_readers
         return available_readers()
+
+    def _read_files(self, files: List[str]) -> Iterable:
+        """
+        Reads the files with the base reader and returns the results.
+        Clears any cached directory listings first, as new files have appeared.
+
+        :param files: the files to read
+        :type files: list
+        :return: the data that was generated
+        """
+        clear_locate_cache()
+        return super()._read_files(files)
@@ -4,8 +4,8 @@ from typing import List, Iterable, Union
 from wai.logging import LOGGING_WARNING
 
 from idc.api import load_image_from_file, DepthData, depth_from_grayscale, empty_image, FORMAT_JPEG, \
-    FORMAT_EXTENSIONS, locate_image, JPEG_EXTENSIONS
-from kasperl.api import Reader, AnnotationsOnlyReader, add_annotations_only_reader_param, annotation_to_name, locate_file
+    FORMAT_EXTENSIONS, locate_image, locate_file_cached, JPEG_EXTENSIONS
+from kasperl.api import Reader, AnnotationsOnlyReader, add_annotations_only_reader_param, annotation_to_name
 from seppl.io import locate_files
 from seppl.variables import VariableSupporter, variable_list
 
@@ -136,7 +136,7 @@ class GrayscaleDepthInfoReader(Reader, VariableSupporter, AnnotationsOnlyReader)
         imgs = []
         if not self.annotations_only:
             if self.image_path_rel is None:
-                imgs = locate_file(self.session.current_input, JPEG_EXTENSIONS)
+                imgs = locate_file_cached(self.session.current_input, JPEG_EXTENSIONS)
             else:
                 img = locate_image(self.session.current_input, rel_path=self.image_path_rel)
                 imgs = [] if (img is None) else [img]
@@ -5,8 +5,8 @@ from typing import List, Iterable, Union
 from PIL import Image
 from wai.logging import LOGGING_WARNING
 
-from idc.api import DepthInformation, DepthData, JPEG_EXTENSIONS
-from kasperl.api import Reader, locate_file
+from idc.api import DepthInformation, DepthData, JPEG_EXTENSIONS, locate_file_cached
+from kasperl.api import Reader
 from seppl.io import locate_files
 from seppl.variables import VariableSupporter, variable_list
 
@@ -112,7 +112,7 @@ class PFMDepthInfoReader(Reader, VariableSupporter):
         self.session.current_input = self._current_input
 
         # associated images?
-        imgs = locate_file(self.session.current_input, JPEG_EXTENSIONS, rel_path=self.image_path_rel)
+        imgs = locate_file_cached(self.session.current_input, JPEG_EXTENSIONS, rel_path=self.image_path_rel)
         if len(imgs) == 0:
             self.logger().warning("Failed to locate associated image for: %s" % self.session.current_input)
             return None
@@ -4,8 +4,8 @@ from typing import List, Iterable, Union
 from wai.logging import LOGGING_WARNING
 
 from idc.api import ImageSegmentationData, load_image_from_file, imgseg_from_bluechannel, empty_image, \
-    FORMAT_JPEG, FORMAT_EXTENSIONS, locate_image, JPEG_EXTENSIONS
-from kasperl.api import Reader, AnnotationsOnlyReader, add_annotations_only_reader_param, annotation_to_name, locate_file
+    FORMAT_JPEG, FORMAT_EXTENSIONS, locate_image, locate_file_cached, JPEG_EXTENSIONS
+from kasperl.api import Reader, AnnotationsOnlyReader, add_annotations_only_reader_param, annotation_to_name
 from seppl.io import locate_files
 from seppl.variables import VariableSupporter, variable_list
 
@@ -14,7 +14,8 @@ class BlueChannelImageSegmentationReader(Reader, VariableSupporter, AnnotationsO
 
     def __init__(self, source: Union[str, List[str]] = None, source_list: Union[str, List[str]] = None,
                  image_path_rel: str = None, labels: List[str] = None, background: int = None, resume_from: str = None,
-                 annotations_only: bool = None, logger_name: str = None, logging_level: str = LOGGING_WARNING):
+                 annotations_only: bool = None, index_map: bool = None, logger_name: str = None,
+                 logging_level: str = LOGGING_WARNING):
         """
         Initializes the reader.
 
@@ -30,6 +31,8 @@ class BlueChannelImageSegmentationReader(Reader, VariableSupporter, AnnotationsO
         :type resume_from: str
         :param annotations_only: whether to only load the annotations
         :type annotations_only: bool
+        :param index_map: whether to keep the annotations as index map rather than splitting them into layers
+        :type index_map: bool
         :param logger_name: the name to use for the logger
         :type logger_name: str
         :param logging_level: the logging level to use
@@ -43,6 +46,7 @@ class BlueChannelImageSegmentationReader(Reader, VariableSupporter, AnnotationsO
         self.background = background
         self.resume_from = resume_from
         self.annotations_only = annotations_only
+        self.index_map = index_map
         self._label_mapping = None
         self._inputs = None
         self._current_input = None
@@ -79,6 +83,7 @@ class BlueChannelImageSegmentationReader(Reader, VariableSupporter, AnnotationsO
         parser.add_argument("--image_path_rel", metavar="PATH", type=str, default=None, help="The relative path from the annotations to the images directory", required=False)
         parser.add_argument("--labels", metavar="LABEL", type=str, default=None, help="The labels that the indices represent.", nargs="+")
         parser.add_argument("--background", type=int, help="The index (0-255) that is used for the background", required=False, default=0)
+        parser.add_argument("--index_map", action="store_true", help="Whether to keep the annotations as a single index map rather than splitting them into layers; speeds up conversions between formats that use indices.", required=False)
         add_annotations_only_reader_param(parser)
         return parser
 
@@ -97,6 +102,7 @@ class BlueChannelImageSegmentationReader(Reader, VariableSupporter, AnnotationsO
         self.background = ns.background
         self.resume_from = ns.resume_from
         self.annotations_only = ns.annotations_only
+        self.index_map = ns.index_map
 
     def generates(self) -> List:
         """
@@ -121,6 +127,8 @@ class BlueChannelImageSegmentationReader(Reader, VariableSupporter, AnnotationsO
         self.logger().debug("label mapping: %s" % str(self._label_mapping))
         if self.annotations_only is None:
             self.annotations_only = False
+        if self.index_map is None:
+            self.index_map = False
 
     def read(self) -> Iterable:
         """
@@ -138,7 +146,7 @@ class BlueChannelImageSegmentationReader(Reader, VariableSupporter, AnnotationsO
         imgs = []
         if not self.annotations_only:
             if self.image_path_rel is None:
-                imgs = locate_file(self.session.current_input, JPEG_EXTENSIONS)
+                imgs = locate_file_cached(self.session.current_input, JPEG_EXTENSIONS)
             else:
                 img = locate_image(self.session.current_input, rel_path=self.image_path_rel)
                 imgs = [] if (img is None) else [img]
@@ -149,7 +157,7 @@ class BlueChannelImageSegmentationReader(Reader, VariableSupporter, AnnotationsO
         # read annotations
         self.logger().info("Reading from: " + str(self.session.current_input))
         ann = load_image_from_file(self.session.current_input)
-        annotations = imgseg_from_bluechannel(ann, self.labels, self._label_mapping, self.logger(), background=self.background)
+        annotations = imgseg_from_bluechannel(ann, self.labels, self._label_mapping, self.logger(), background=self.background, index_map=self.index_map)
 
         # associated image
         if not self.annotations_only:
@@ -5,9 +5,9 @@ from seppl.variables import VariableSupporter, variable_list
 from seppl.io import locate_files
 from wai.logging import LOGGING_WARNING
 
-from kasperl.api import locate_file, Reader, AnnotationsOnlyReader, add_annotations_only_reader_param, annotation_to_name
+from kasperl.api import Reader, AnnotationsOnlyReader, add_annotations_only_reader_param, annotation_to_name
 from idc.api import ImageSegmentationData, load_image_from_file, imgseg_from_instancepng, JPEG_EXTENSIONS, \
-    PNG_EXTENSIONS, empty_image, FORMAT_JPEG, FORMAT_EXTENSIONS, remove_alpha, ensure_indexed_palette
+    PNG_EXTENSIONS, empty_image, FORMAT_JPEG, FORMAT_EXTENSIONS, remove_alpha, ensure_indexed_palette, locate_file_cached
 
 
 class InstancePngImageSegmentationReader(Reader, VariableSupporter, AnnotationsOnlyReader):
@@ -150,8 +150,8 @@ class InstancePngImageSegmentationReader(Reader, VariableSupporter, AnnotationsO
         # associated images?
         imgs = []
         if not self.annotations_only:
-            imgs = locate_file(self.session.current_input, JPEG_EXTENSIONS + PNG_EXTENSIONS, rel_path=self.image_path_rel,
-                               image_prefix=self.image_prefix, annotation_prefix=self.annotation_prefix)
+            imgs = locate_file_cached(self.session.current_input, JPEG_EXTENSIONS + PNG_EXTENSIONS, rel_path=self.image_path_rel,
+                                      image_prefix=self.image_prefix, annotation_prefix=self.annotation_prefix)
             if len(imgs) == 0:
                 self.logger().warning("Failed to locate associated image for: %s" % self.session.current_input)
                 return None
@@ -1,22 +1,122 @@
 import argparse
 import json
 import os.path
-from typing import List, Iterable, Union, Dict
+import tempfile
+from array import array
+from typing import List, Iterable, Union, Dict, Optional, Tuple, IO, Iterator, Any
 
+import numpy as np
 from seppl.variables import VariableSupporter, variable_list
 from seppl.io import locate_files
 from wai.common.adams.imaging.locateobjects import LocatedObjects, LocatedObject
+from wai.common.adams.imaging.locateobjects.constants import KEY_POLY_X, KEY_POLY_Y
 from wai.common.geometry import Point, Polygon
 from wai.logging import LOGGING_WARNING
 
 from kasperl.api import Reader
-from idc.api import ObjectDetectionData
+from idc.api import ObjectDetectionData, ColumnarLocatedObjects, image_size_from_annotation, is_coco_rle, \
+    coco_rle_counts, rle_compress, KEY_RLE, KEY_RLE_SIZE, KEY_RLE_CROWD
+
+STREAMING_CHUNK_SIZE = 1024 * 1024
+""" the number of characters to read at a time when parsing incrementally. """
+
+NUMBER_CHARS = "0123456789.eE+-"
+""" the characters that can continue a JSON number. """
+
+
+def _iterate_json_object(fp: IO[str], chunk_size: int = STREAMING_CHUNK_SIZE) -> Iterator[Tuple[str, Any]]:
+    """
+    Parses the top-level JSON object from the file incrementally. For keys with list values,
+    the elements get returned one by one, for all other keys the value is returned as is.
+    Only the element currently being parsed is kept in memory.
+
+    :param fp: the file to read from
+    :param chunk_size: the number of characters to read at a time
+    :type chunk_size: int
+    :return: the iterator over (key, element/value) tuples
+    """
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    eof = False
+
+    def _more() -> bool:
+        nonlocal buf, pos, eof
+        if eof:
+            return False
+        chunk = fp.read(chunk_size)
+        if len(chunk) == 0:
+            eof = True
+            return False
+        buf = buf[pos:] + chunk
+        pos = 0
+        return True
+
+    def _peek() -> str:
+        nonlocal pos
+        while True:
+            while (pos < len(buf)) and buf[pos].isspace():
+                pos += 1
+            if pos < len(buf):
+                return buf[pos]
+            if not _more():
+                raise Exception("Unexpected end of JSON data!")
+
+    def _expect(chars: str) -> str:
+        nonlocal pos
+        c = _peek()
+        if c not in chars:
+            raise Exception("Expected one of '%s' but found '%s'!" % (chars, c))
+        pos += 1
+        return c
+
+    def _value() -> Any:
+        nonlocal pos
+        _peek()
+        while True:
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+                # numbers could be truncated at the end of the buffer (e.g., "1" or "1." of "1.5"), so a number
+                # only gets accepted once a character is available that cannot continue it (or at EOF)
+                truncated = False
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    following = end
+                    while (following < len(buf)) and (buf[following] in NUMBER_CHARS):
+                        following += 1
+                    truncated = (following == len(buf))
+                if not truncated or not _more():
+                    pos = end
+                    return value
+            except json.JSONDecodeError:
+                if not _more():
+                    raise
+
+    _expect("{")
+    if _peek() == "}":
+        return
+    while True:
+        key = _value()
+        _expect(":")
+        if _peek() == "[":
+            pos += 1
+            if _peek() == "]":
+                pos += 1
+            else:
+                while True:
+                    yield key, _value()
+                    if _expect(",]") == "]":
+                        break
+        else:
+            yield key, _value()
+        if _expect(",}") == "}":
+            break
 
 
 class COCOObjectDetectionReader(Reader, VariableSupporter):
 
     def __init__(self, source: Union[str, List[str]] = None, source_list: Union[str, List[str]] = None,
-                 resume_from: str = None, logger_name: str = None, logging_level: str = LOGGING_WARNING):
+                 resume_from: str = None, streaming: bool = None, verify_image_size: bool = None,
+                 columnar: bool = None, keep_rle: bool = None, logger_name: str = None, logging_level: str = LOGGING_WARNING):
         """
         Initializes the reader.
 
@@ -24,6 +124,14 @@ class COCOObjectDetectionReader(Reader, VariableSupporter):
         :param source_list: the file(s) with filename(s)
         :param resume_from: the file to resume from (glob)
         :type resume_from: str
+        :param streaming: whether to parse the JSON incrementally rather than loading it completely
+        :type streaming: bool
+        :param verify_image_size: whether to verify the image dimensions from the JSON against the actual images
+        :type verify_image_size: bool
+        :param columnar: whether to store the annotations in columnar form
+        :type columnar: bool
+        :param keep_rle: whether to keep RLE segmentations as meta-data of the objects
+        :type keep_rle: bool
         :param logger_name: the name to use for the logger
         :type logger_name: str
         :param logging_level: the logging level to use
@@ -33,8 +141,16 @@ class COCOObjectDetectionReader(Reader, VariableSupporter):
         self.source = source
         self.source_list = source_list
         self.resume_from = resume_from
+        self.streaming = streaming
+        self.verify_image_size = verify_image_size
+        self.columnar = columnar
+        self.keep_rle = keep_rle
         self._inputs = None
         self._current_input = None
+        self._categories = None
+        self._licenses = None
+        self._license_names = None
+        self._license_urls = None
 
     def name(self) -> str:
         """
@@ -65,6 +181,10 @@ class COCOObjectDetectionReader(Reader, VariableSupporter):
         parser.add_argument("-i", "--input", type=str, help="Path to the JSON file(s) to read; glob syntax is supported; " + variable_list(obj=self), required=False, nargs="*")
         parser.add_argument("-I", "--input_list", type=str, help="Path to the text file(s) listing the JSON files to use; " + variable_list(obj=self), required=False, nargs="*")
         parser.add_argument("--resume_from", type=str, help="Glob expression matching the file to resume from, e.g., '*/012345.json'", required=False)
+        parser.add_argument("--streaming", action="store_true", help="Whether to parse the JSON file incrementally rather than loading it completely into memory; the annotations get spilled into a temporary file while parsing.", required=False)
+        parser.add_argument("--verify_image_size", action="store_true", help="Whether to verify the image dimensions stored in the JSON file against the actual images rather than trusting them.", required=False)
+        parser.add_argument("--columnar", action="store_true", help="Whether to store the annotations in columnar (array-backed) form, which only get turned into objects when required.", required=False)
+        parser.add_argument("--keep_rle", action="store_true", help="Whether to keep RLE segmentations (e.g., crowd annotations) in compressed form as meta-data of the objects ('" + KEY_RLE + "', '" + KEY_RLE_SIZE + "', '" + KEY_RLE_CROWD + "'), which the to-coco-od writer outputs again; otherwise only the bounding box is used.", required=False)
         return parser
 
     def _apply_args(self, ns: argparse.Namespace):
@@ -78,6 +198,10 @@ class COCOObjectDetectionReader(Reader, VariableSupporter):
         self.source = ns.input
         self.source_list = ns.input_list
         self.resume_from = ns.resume_from
+        self.streaming = ns.streaming
+        self.verify_image_size = ns.verify_image_size
+        self.columnar = ns.columnar
+        self.keep_rle = ns.keep_rle
 
     def generates(self) -> List:
         """
@@ -93,6 +217,14 @@ class COCOObjectDetectionReader(Reader, VariableSupporter):
         Initializes the processing, e.g., for opening files or databases.
         """
         super().initialize()
+        if self.streaming is None:
+            self.streaming = False
+        if self.verify_image_size is None:
+            self.verify_image_size = False
+        if self.columnar is None:
+            self.columnar = False
+        if self.keep_rle is None:
+            self.keep_rle = False
         self._inputs = None
 
     def _create_lookup(self, data: Dict, key: str, key_name: str) -> Dict:
@@ -115,6 +247,237 @@ class COCOObjectDetectionReader(Reader, VariableSupporter):
 
         return result
 
+    def _group_annotations(self, data: Dict) -> Dict[int, List[Dict]]:
+        """
+        Groups the annotations by their image ID in a single pass.
+
+        :param data: the COCO data to use
+        :type data: dict
+        :return: the lookup (image_id -> list of annotations)
+        :rtype: dict
+        """
+        result = dict()
+        for annotation in data.get("annotations", []):
+            image_id = annotation["image_id"]
+            if image_id not in result:
+                result[image_id] = list()
+            result[image_id].append(annotation)
+        return result
+
+    def _license(self, license_id: int) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Returns name and URL of the specified license. Creates the license lookups on first call.
+
+        :param license_id: the ID of the license to look up
+        :type license_id: int
+        :return: the tuple of license name and URL, None if not available or empty
+        :rtype: tuple
+        """
+        if self._license_names is None:
+            licenses = {"licenses": self._licenses}
+            self._license_names = self._create_lookup(licenses, "licenses", "name")
+            self._license_urls = self._create_lookup(licenses, "licenses", "url")
+        license_name = self._license_names.get(license_id)
+        if (license_name is not None) and (len(license_name) == 0):
+            license_name = None
+        license_url = self._license_urls.get(license_id)
+        if (license_url is not None) and (len(license_url) == 0):
+            license_url = None
+        return license_name, license_url
+
+    def _polygon(self, annotation: Dict) -> Optional[List[int]]:
+        """
+        Returns the flat list of x/y coordinates of the (first) polygon of the annotation.
+
+        :param annotation: the annotation to get the polygon from
+        :type annotation: dict
+        :return: the coordinates, None if no polygon available
+        :rtype: list
+        """
+        if annotation["iscrowd"] == 0:
+            segmentation = annotation["segmentation"]
+            if isinstance(segmentation, list) and (len(segmentation) > 0):
+                if len(segmentation) > 1:
+                    self.logger().warning("More than one polygon defined for annotation id #%d, only using first!" % annotation["id"])
+                # we only process one, ignoring any incomplete point at the end
+                subsegmentation = segmentation[0]
+                return [int(v) for v in subsegmentation[:len(subsegmentation) - (len(subsegmentation) % 2)]]
+        return None
+
+    def _rle(self, annotation: Dict) -> Optional[Dict]:
+        """
+        Returns the RLE segmentation of the annotation as meta-data, if any and RLE is to be kept.
+
+        :param annotation: the annotation to get the RLE segmentation from
+        :type annotation: dict
+        :return: the meta-data (compressed RLE, size, crowd flag), None if not available or not kept
+        :rtype: dict
+        """
+        if not self.keep_rle:
+            return None
+        segmentation = annotation.get("segmentation")
+        if not is_coco_rle(segmentation):
+            return None
+        counts = segmentation["counts"]
+        if not isinstance(counts, str):
+            counts = rle_compress(coco_rle_counts(segmentation))
+        result = dict()
+        result[KEY_RLE] = counts
+        result[KEY_RLE_SIZE] = "%d,%d" % (segmentation["size"][0], segmentation["size"][1])
+        result[KEY_RLE_CROWD] = int(annotation.get("iscrowd", 0))
+        return result
+
+    def _to_located_object(self, annotation: Dict) -> LocatedObject:
+        """
+        Turns the COCO annotation into a located object.
+
+        :param annotation: the annotation to convert
+        :type annotation: dict
+        :return: the located object
+        :rtype: LocatedObject
+        """
+        meta = dict()
+        meta["type"] = self._categories[annotation["category_id"]]
+        rle = self._rle(annotation)
+        if rle is not None:
+            meta.update(rle)
+        x, y, w, h = annotation["bbox"]
+        lobj = LocatedObject(x, y, w, h, **meta)
+        coords = self._polygon(annotation)
+        if coords is not None:
+            points = [Point(coords[i], coords[i + 1]) for i in range(0, len(coords), 2)]
+            lobj.set_polygon(Polygon(*points))
+        return lobj
+
+    def _to_columnar(self, annotations: List[Dict]) -> ColumnarLocatedObjects:
+        """
+        Turns the COCO annotations into columnar form, without creating located objects.
+
+        :param annotations: the annotations to convert
+        :type annotations: list
+        :return: the columnar annotations
+        :rtype: ColumnarLocatedObjects
+        """
+        n = len(annotations)
+        boxes = np.zeros((n, 4), dtype=np.float64)
+        box_int = np.zeros((n, 4), dtype=bool)
+        label_ids = np.zeros(n, dtype=np.int32)
+        labels = []
+        label_lookup = dict()
+        poly_lengths = np.zeros(n, dtype=np.int64)
+        poly_parts = []
+        metadata = dict()
+        for i, annotation in enumerate(annotations):
+            box = annotation["bbox"]
+            boxes[i] = box
+            box_int[i] = [isinstance(v, int) for v in box]
+            label = self._categories[annotation["category_id"]]
+            if label not in label_lookup:
+                label_lookup[label] = len(labels)
+                labels.append(label)
+            label_ids[i] = label_lookup[label]
+            rle = self._rle(annotation)
+            if rle is not None:
+                for key in rle:
+                    if key not in metadata:
+                        metadata[key] = dict()
+                    metadata[key][i] = rle[key]
+            coords = self._polygon(annotation)
+            if coords is None:
+                continue
+            if len(coords) > 2:
+                poly_parts.append(coords)
+                poly_lengths[i] = len(coords) // 2
+            else:
+                # not a valid polygon, retain as meta-data like located objects do
+                for key, values in [(KEY_POLY_X, coords[0::2]), (KEY_POLY_Y, coords[1::2])]:
+                    if key not in metadata:
+                        metadata[key] = dict()
+                    metadata[key][i] = ",".join(str(v) for v in values)
+
+        # located objects turn negative width/height into positive ones
+        for dim in [2, 3]:
+            neg = boxes[:, dim] < 0
+            if neg.any():
+                boxes[neg, dim - 2] += boxes[neg, dim]
+                boxes[neg, dim] = -boxes[neg, dim]
+                box_int[neg, dim - 2] = box_int[neg, dim - 2] & box_int[neg, dim]
+        if box_int.all():
+            boxes = boxes.astype(np.int64)
+
+        poly_offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(poly_lengths, out=poly_offsets[1:])
+        if len(poly_parts) > 0:
+            poly_coords = np.array([v for part in poly_parts for v in part], dtype=np.float64).reshape((-1, 2))
+        else:
+            poly_coords = None
+        return ColumnarLocatedObjects(boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3],
+                                      labels=labels, label_ids=label_ids,
+                                      poly_coords=poly_coords, poly_offsets=poly_offsets,
+                                      metadata=metadata, box_int=box_int)
+
+    def _iterate_in_memory(self) -> Iterator[Tuple[Dict, List[Dict]]]:
+        """
+        Loads the complete JSON file and returns the images with their associated annotations.
+
+        :return: the iterator over (image, annotations) tuples
+        """
+        with open(self.session.current_input, "r") as fp:
+            data = json.load(fp)
+
+        if "images" not in data:
+            raise Exception("No 'images' available!")
+        self._categories = self._create_lookup(data, "categories", "name")
+        self._licenses = data.get("licenses", [])
+        annotations = self._group_annotations(data)
+
+        for image in data["images"]:
+            yield image, annotations.get(image["id"], [])
+
+    def _iterate_streaming(self) -> Iterator[Tuple[Dict, List[Dict]]]:
+        """
+        Parses the JSON file incrementally and returns the images with their associated annotations.
+        The annotations get spilled into a temporary file, only their image IDs and file
+        offsets are kept in memory.
+
+        :return: the iterator over (image, annotations) tuples
+        """
+        images = []
+        categories = []
+        self._licenses = []
+        image_ids = array("q")
+        offsets = array("q")
+        lengths = array("q")
+        with tempfile.TemporaryFile() as spill:
+            with open(self.session.current_input, "r") as fp:
+                for key, item in _iterate_json_object(fp):
+                    if key == "images":
+                        images.append(item)
+                    elif key == "categories":
+                        categories.append(item)
+                    elif key == "licenses":
+                        self._licenses.append(item)
+                    elif key == "annotations":
+                        record = json.dumps(item).encode("utf-8")
+                        image_ids.append(item["image_id"])
+                        offsets.append(spill.tell())
+                        lengths.append(len(record))
+                        spill.write(record)
+            self._categories = self._create_lookup({"categories": categories}, "categories", "name")
+            self.logger().info("Parsed %d images and %d annotations" % (len(images), len(image_ids)))
+
+            ids = np.frombuffer(image_ids, dtype=np.int64)
+            order = np.argsort(ids, kind="stable")
+            sorted_ids = ids[order]
+            for image in images:
+                annotations = []
+                start = np.searchsorted(sorted_ids, image["id"], side="left")
+                end = np.searchsorted(sorted_ids, image["id"], side="right")
+                for index in order[start:end]:
+                    spill.seek(offsets[index])
+                    annotations.append(json.loads(spill.read(lengths[index]).decode("utf-8")))
+                yield image, annotations
+
     def read(self) -> Iterable:
         """
         Loads the data and returns the items one by one.
@@ -128,69 +491,46 @@ class COCOObjectDetectionReader(Reader, VariableSupporter):
         self.session.current_input = self._current_input
         self.logger().info("Reading from: " + str(self.session.current_input))
 
-        # load annotations
-        with open(self.session.current_input, "r") as fp:
-            data = json.load(fp)
-
-        categories = self._create_lookup(data, "categories", "name")
-        license_names = self._create_lookup(data, "licenses", "name")
-        license_urls = self._create_lookup(data, "licenses", "url")
-        images = self._create_lookup(data, "images", "file_name")
-        image_licenses = self._create_lookup(data, "images", "license")
+        self._license_names = None
+        self._license_urls = None
+        if self.streaming:
+            items = self._iterate_streaming()
+        else:
+            items = self._iterate_in_memory()
 
-        for image_id in images:
-            filename = images[image_id]
-            license_name = None
-            license_url = None
-            if image_id in image_licenses:
-                license_id = image_licenses[image_id]
-                if license_id in license_names:
-                    license_name = license_names[license_id]
-                if len(license_name) == 0:
-                    license_name = None
-                if license_id in license_urls:
-                    license_url = license_urls[license_id]
-                    if len(license_url) == 0:
-                        license_url = None
-            img = os.path.join(os.path.dirname(self.session.current_input), filename)
+        for image, annotations in items:
+            image_id = image["id"]
+            img = os.path.join(os.path.dirname(self.session.current_input), image["file_name"])
             if not os.path.exists(img):
                 self.logger().error("Image file not found for ID #%d: %s" % (image_id, img))
                 continue
 
-            lobjs = LocatedObjects()
             file_meta = dict()
             file_meta["image_id"] = image_id
             file_meta["file"] = self.session.current_input
-            if license_name is not None:
-                file_meta["license_name"] = license_name
-            if license_url is not None:
-                file_meta["license_url"] = license_url
-            for annotation in data["annotations"]:
-                if image_id != annotation["image_id"]:
-                    continue
-                category_id = annotation["category_id"]
-                meta = dict()
-                meta["type"] = categories[category_id]
-                x, y, w, h = annotation["bbox"]
-                lobj = LocatedObject(x, y, w, h, **meta)
-                lobjs.append(lobj)
-                if annotation["iscrowd"] == 0:
-                    segmentation = annotation["segmentation"]
-                    if isinstance(segmentation, list) and (len(segmentation) > 0):
-                        if len(segmentation) > 1:
-                            self.logger().warning("More than one polygon defined for annotation id #%d, only using first!" % annotation["id"])
-                        for subsegmentation in segmentation:
-                            points = []
-                            i = 0
-                            while i < len(subsegmentation) - 1:
-                                points.append(Point(int(subsegmentation[i]), int(subsegmentation[i+1])))
-                                i += 2
-                            polygon = Polygon(*points)
-                            lobj.set_polygon(polygon)
-                            # we only process one
-                            break
-
-            yield ObjectDetectionData(source=str(img), annotation=lobjs, metadata=file_meta)
+            if image.get("license") is not None:
+                license_name, license_url = self._license(image["license"])
+                if license_name is not None:
+                    file_meta["license_name"] = license_name
+                if license_url is not None:
+                    file_meta["license_url"] = license_url
+
+            image_size = image_size_from_annotation(img, image.get("width"), image.get("height"),
+                                                    verify=self.verify_image_size, logger=self.logger())
+            if self.columnar:
+                item = ObjectDetectionData(source=str(img), image_size=image_size, metadata=file_meta)
+                item.set_columnar(self._to_columnar(annotations))
+            else:
+                lobjs = LocatedObjects()
+                for annotation in annotations:
+                    lobjs.append(self._to_located_object(annotation))
+                item = ObjectDetectionData(source=str(img), image_size=image_size, annotation=lobjs, metadata=file_meta)
+            yield item
+
+        self._categories = None
+        self._licenses = None
+        self._license_names = None
+        self._license_urls = None
 
     def has_finished(self) -> bool:
         """
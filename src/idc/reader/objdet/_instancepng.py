@@ -5,9 +5,9 @@ from seppl.variables import VariableSupporter, variable_list
 from seppl.io import locate_files
 from wai.logging import LOGGING_WARNING
 
-from kasperl.api import locate_file, Reader, AnnotationsOnlyReader, add_annotations_only_reader_param, annotation_to_name
-from idc.api import load_image_from_file, objdet_from_instancepng, JPEG_EXTENSIONS, \
-    PNG_EXTENSIONS, empty_image, FORMAT_JPEG, FORMAT_EXTENSIONS, ObjectDetectionData
+from kasperl.api import Reader, AnnotationsOnlyReader, add_annotations_only_reader_param, annotation_to_name
+from idc.api import load_image_from_file, JPEG_EXTENSIONS, \
+    PNG_EXTENSIONS, empty_image, FORMAT_JPEG, FORMAT_EXTENSIONS, ObjectDetectionData, locate_file_cached
 
 
 class InstancePngObjectDetectionReader(Reader, VariableSupporter, AnnotationsOnlyReader):
@@ -151,6 +151,8 @@ class InstancePngObjectDetectionReader(Reader, VariableSupporter, AnnotationsOnl
         :return: the data
         :rtype: Iterable
         """
+        from idc.api import objdet_from_instancepng
+
         if self._inputs is None:
             self._inputs = locate_files(self.source, input_lists=self.source_list, fail_if_empty=True, default_glob="*.png", resume_from=self.resume_from)
         self._current_input = self._inputs.pop(0)
@@ -159,8 +161,8 @@ class InstancePngObjectDetectionReader(Reader, VariableSupporter, AnnotationsOnl
         # associated images?
         imgs = []
         if not self.annotations_only:
-            imgs = locate_file(self.session.current_input, JPEG_EXTENSIONS + PNG_EXTENSIONS, rel_path=self.image_path_rel,
-                               image_prefix=self.image_prefix, annotation_prefix=self.annotation_prefix)
+            imgs = locate_file_cached(self.session.current_input, JPEG_EXTENSIONS + PNG_EXTENSIONS, rel_path=self.image_path_rel,
+                                      image_prefix=self.image_prefix, annotation_prefix=self.annotation_prefix)
             if len(imgs) == 0:
                 self.logger().warning("Failed to locate associated image for: %s" % self.session.current_input)
                 return None
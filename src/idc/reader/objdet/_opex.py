@@ -8,13 +8,20 @@ from opex import ObjectPredictions
 from seppl.variables import VariableSupporter, variable_list
 from seppl.io import locate_files
 from kasperl.api import Reader
-from idc.api import ObjectDetectionData, locate_image
+from idc.api import ObjectDetectionData, locate_image, image_size_from_annotation
+
+WIDTH_KEY = "width"
+""" the meta-data key for the image width. """
+
+HEIGHT_KEY = "height"
+""" the meta-data key for the image height. """
 
 
 class OPEXObjectDetectionReader(Reader, VariableSupporter):
 
     def __init__(self, source: Union[str, List[str]] = None, source_list: Union[str, List[str]] = None,
-                 resume_from: str = None, logger_name: str = None, logging_level: str = LOGGING_WARNING):
+                 resume_from: str = None, verify_image_size: bool = None,
+                 logger_name: str = None, logging_level: str = LOGGING_WARNING):
         """
         Initializes the reader.
 
@@ -22,6 +29,8 @@ class OPEXObjectDetectionReader(Reader, VariableSupporter):
         :param source_list: the file(s) with filename(s)
         :param resume_from: the file to resume from (glob)
         :type resume_from: str
+        :param verify_image_size: whether to verify the image dimensions from the meta-data against the actual image
+        :type verify_image_size: bool
         :param logger_name: the name to use for the logger
         :type logger_name: str
         :param logging_level: the logging level to use
@@ -31,6 +40,7 @@ class OPEXObjectDetectionReader(Reader, VariableSupporter):
         self.source = source
         self.source_list = source_list
         self.resume_from = resume_from
+        self.verify_image_size = verify_image_size
         self._inputs = None
         self._current_input = None
 
@@ -63,6 +73,7 @@ class OPEXObjectDetectionReader(Reader, VariableSupporter):
         parser.add_argument("-i", "--input", type=str, help="Path to the JSON file(s) to read; glob syntax is supported; " + variable_list(obj=self), required=False, nargs="*")
         parser.add_argument("-I", "--input_list", type=str, help="Path to the text file(s) listing the JSON files to use; " + variable_list(obj=self), required=False, nargs="*")
         parser.add_argument("--resume_from", type=str, help="Glob expression matching the file to resume from, e.g., '*/012345.json'", required=False)
+        parser.add_argument("--verify_image_size", action="store_true", help="Whether to verify the image dimensions stored in the meta-data ('" + WIDTH_KEY + "', '" + HEIGHT_KEY + "') against the actual image rather than trusting them.", required=False)
         return parser
 
     def _apply_args(self, ns: argparse.Namespace):
@@ -76,6 +87,7 @@ class OPEXObjectDetectionReader(Reader, VariableSupporter):
         self.source = ns.input
         self.source_list = ns.input_list
         self.resume_from = ns.resume_from
+        self.verify_image_size = ns.verify_image_size
 
     def generates(self) -> List:
         """
@@ -91,6 +103,8 @@ class OPEXObjectDetectionReader(Reader, VariableSupporter):
         Initializes the processing, e.g., for opening files or databases.
         """
         super().initialize()
+        if self.verify_image_size is None:
+            self.verify_image_size = False
         self._inputs = None
 
     def read(self) -> Iterable:
@@ -140,7 +154,12 @@ class OPEXObjectDetectionReader(Reader, VariableSupporter):
             for k, v in preds.meta.items():
                 meta[k] = v
 
-        yield ObjectDetectionData(source=img, annotation=lobjs, metadata=meta)
+        # image dimensions, e.g., from dims-to-metadata
+        dims = preds.meta if isinstance(preds.meta, dict) else dict()
+        image_size = image_size_from_annotation(img, dims.get(WIDTH_KEY), dims.get(HEIGHT_KEY),
+                                                verify=self.verify_image_size, logger=self.logger())
+
+        yield ObjectDetectionData(source=img, image_size=image_size, annotation=lobjs, metadata=meta)
         return None
 
     def has_finished(self) -> bool:
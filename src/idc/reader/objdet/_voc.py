@@ -8,13 +8,13 @@ from wai.common.adams.imaging.locateobjects import LocatedObjects, LocatedObject
 from seppl.variables import VariableSupporter, variable_list
 from seppl.io import locate_files
 from kasperl.api import Reader
-from idc.api import ObjectDetectionData, locate_image
+from idc.api import ObjectDetectionData, locate_image, image_size_from_annotation
 
 
 class VOCObjectDetectionReader(Reader, VariableSupporter):
 
     def __init__(self, source: Union[str, List[str]] = None, source_list: Union[str, List[str]] = None,
-                 image_rel_path: str = None, ignore_folder: bool = None, resume_from: str = None,
+                 image_rel_path: str = None, ignore_folder: bool = None, verify_image_size: bool = None, resume_from: str = None,
                  logger_name: str = None, logging_level: str = LOGGING_WARNING):
         """
         Initializes the reader.
@@ -25,6 +25,8 @@ class VOCObjectDetectionReader(Reader, VariableSupporter):
         :type image_rel_path: str
         :param ignore_folder: whether to ignore the folder value from the XML
         :type ignore_folder: bool
+        :param verify_image_size: whether to verify the image dimensions from the XML against the actual image
+        :type verify_image_size: bool
         :param resume_from: the file to resume from (glob)
         :type resume_from: str
         :param logger_name: the name to use for the logger
@@ -37,6 +39,7 @@ class VOCObjectDetectionReader(Reader, VariableSupporter):
         self.source_list = source_list
         self.image_rel_path = image_rel_path
         self.ignore_folder = ignore_folder
+        self.verify_image_size = verify_image_size
         self.resume_from = resume_from
         self._inputs = None
         self._current_input = None
@@ -72,6 +75,7 @@ class VOCObjectDetectionReader(Reader, VariableSupporter):
         parser.add_argument("--resume_from", type=str, help="Glob expression matching the file to resume from, e.g., '*/012345.xml'", required=False)
         parser.add_argument("-r", "--image_rel_path", type=str, help="The relative path to use for the 'folder' property to locate the images.", required=False)
         parser.add_argument("--ignore_folder", action="store_true", help="Whether to ignore the 'folder' information from the XML when looking for the image.", required=False)
+        parser.add_argument("--verify_image_size", action="store_true", help="Whether to verify the image dimensions stored in the XML file against the actual image rather than trusting them.", required=False)
         return parser
 
     def _apply_args(self, ns: argparse.Namespace):
@@ -87,6 +91,7 @@ class VOCObjectDetectionReader(Reader, VariableSupporter):
         self.image_rel_path = ns.image_rel_path
         self.resume_from = ns.resume_from
         self.ignore_folder = ns.ignore_folder
+        self.verify_image_size = ns.verify_image_size
 
     def generates(self) -> List:
         """
@@ -106,6 +111,8 @@ class VOCObjectDetectionReader(Reader, VariableSupporter):
             self.image_rel_path = ""
         if self.ignore_folder is None:
             self.ignore_folder = False
+        if self.verify_image_size is None:
+            self.verify_image_size = False
         self._inputs = None
 
     def read(self) -> Iterable:
@@ -155,7 +162,9 @@ class VOCObjectDetectionReader(Reader, VariableSupporter):
             lobj = LocatedObject(x_min, y_min, x_max - x_min + 1, y_max - y_min + 1, **meta)
             lobjs.append(lobj)
 
-        yield ObjectDetectionData(source=str(img), annotation=lobjs)
+        image_size = image_size_from_annotation(img, xml.findtext("size/width"), xml.findtext("size/height"),
+                                                verify=self.verify_image_size, logger=self.logger())
+        yield ObjectDetectionData(source=str(img), image_size=image_size, annotation=lobjs)
         return None
 
     def has_finished(self) -> bool:
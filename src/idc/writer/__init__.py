@@ -1,5 +1,6 @@
 from ._required_format_writer import RequiredFormatWriter
 from ._image_and_annotation_writer import ImageAndAnnotationWriter
+from ._async import AsyncWriter, DEFAULT_QUEUE_SIZE
 from ._console import ConsoleWriter
 from ._data import DataWriter
 from ._metadata import MetaDataWriter
@@ -0,0 +1,199 @@
+import argparse
+import copy
+import queue
+import threading
+from typing import List
+
+from wai.logging import LOGGING_WARNING
+
+from seppl import Plugin
+from kasperl.api import make_list, StreamWriter, BatchWriter
+from idc.api import ImageData, DATATYPES, data_type_to_class, DataTypeSupporter
+
+DEFAULT_QUEUE_SIZE = 10
+""" the default maximum number of items waiting to be written. """
+
+
+class AsyncWriter(StreamWriter, DataTypeSupporter):
+
+    def __init__(self, writer: str = None, data_type: str = None, queue_size: int = None,
+                 logger_name: str = None, logging_level: str = LOGGING_WARNING):
+        """
+        Initializes the writer.
+
+        :param writer: the base writer to use (command-line)
+        :type writer: str
+        :param data_type: the type of output to accept
+        :type data_type: str
+        :param queue_size: the maximum number of items waiting to be written
+        :type queue_size: int
+        :param logger_name: the name to use for the logger
+        :type logger_name: str
+        :param logging_level: the logging level to use
+        :type logging_level: str
+        """
+        super().__init__(logger_name=logger_name, logging_level=logging_level)
+        self.writer = writer
+        self.data_type = data_type
+        self.queue_size = queue_size
+        self._writer = None
+        self._queue = None
+        self._thread = None
+        self._error = None
+
+    def name(self) -> str:
+        """
+        Returns the name of the handler, used as sub-command.
+
+        :return: the name
+        :rtype: str
+        """
+        return "to-async"
+
+    def description(self) -> str:
+        """
+        Returns a description of the writer.
+
+        :return: the description
+        :rtype: str
+        """
+        return "Forwards the incoming data to the base writer, which writes it in a background thread. " \
+               "Blocks the pipeline when the queue of pending items is full. " \
+               "Any error that occurs in the background gets raised with the next item or when finishing."
+
+    def _create_argparser(self) -> argparse.ArgumentParser:
+        """
+        Creates an argument parser. Derived classes need to fill in the options.
+
+        :return: the parser
+        :rtype: argparse.ArgumentParser
+        """
+        parser = super()._create_argparser()
+        parser.add_argument("-w", "--writer", type=str, default=None, help="The command-line defining the base writer.", required=True)
+        parser.add_argument("-t", "--data_type", choices=DATATYPES, type=str, default=None, help="The type of data to accept", required=True)
+        parser.add_argument("-q", "--queue_size", type=int, default=DEFAULT_QUEUE_SIZE, help="The maximum number of items waiting to be written.", required=False)
+        return parser
+
+    def _apply_args(self, ns: argparse.Namespace):
+        """
+        Initializes the object with the arguments of the parsed namespace.
+
+        :param ns: the parsed arguments
+        :type ns: argparse.Namespace
+        """
+        super()._apply_args(ns)
+        self.writer = ns.writer
+        self.data_type = ns.data_type
+        self.queue_size = ns.queue_size
+
+    def accepts(self) -> List:
+        """
+        Returns the list of classes that are accepted.
+
+        :return: the list of classes
+        :rtype: list
+        """
+        if self.data_type is None:
+            return [ImageData]
+        else:
+            return [data_type_to_class(self.data_type)]
+
+    def _parse_commandline(self, cmdline: str) -> List[Plugin]:
+        """
+        Parses the command-line and returns the list of plugins it represents.
+        Raises an exception in case of an invalid sub-flow.
+
+        :param cmdline: the command-line to parse
+        :type cmdline: str
+        :return:
+        """
+        from idc.registry import available_writers
+        from seppl import args_to_objects, split_args, split_cmdline
+
+        # split command-line into valid plugin subsets
+        valid = available_writers()
+        args = split_args(split_cmdline(cmdline), list(valid.keys()))
+        return args_to_objects(args, valid, allow_global_options=False)
+
+    def initialize(self):
+        """
+        Initializes the processing, e.g., for opening files or databases.
+        """
+        super().initialize()
+        if self.data_type is None:
+            raise Exception("No data type defined!")
+        if self.writer is None:
+            raise Exception("No writer defined!")
+        if self.queue_size is None:
+            self.queue_size = DEFAULT_QUEUE_SIZE
+        if self.queue_size < 1:
+            raise Exception("Queue size must be at least 1: %d" % self.queue_size)
+        objs = self._parse_commandline(self.writer)
+        if len(objs) != 1:
+            raise Exception("Failed to obtain a single writer from command-line: %s" % self.writer)
+        self._writer = objs[0]
+        if self.accepts()[0] not in self._writer.accepts():
+            raise Exception("Writer '%s' accepts '%s' but '%s' is required!" % (self.writer, str(self._writer.accepts()), str(self.accepts())))
+        # the base writer uses its own session, as the current input changes while it is writing
+        self._writer.session = copy.copy(self.session)
+        self._writer.initialize()
+        self._error = None
+        self._queue = queue.Queue(maxsize=self.queue_size)
+        self._thread = threading.Thread(target=self._write_queued, daemon=True)
+        self._thread.start()
+
+    def _write_queued(self):
+        """
+        Writes the queued data with the base writer until receiving None.
+        """
+        while True:
+            task = self._queue.get()
+            try:
+                if task is None:
+                    break
+                # skip any remaining data after an error
+                if self._error is not None:
+                    continue
+                current_input, data = task
+                self._writer.session.current_input = current_input
+                if isinstance(self._writer, StreamWriter):
+                    self._writer.write_stream(data)
+                elif isinstance(self._writer, BatchWriter):
+                    self._writer.write_batch(make_list(data))
+                else:
+                    raise Exception("Unknown type of writer: %s" % str(type(self._writer)))
+            except Exception as e:
+                self.logger().exception("Failed to write data!")
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+    def _check_error(self):
+        """
+        Raises an exception if writing in the background failed.
+        """
+        if self._error is not None:
+            raise Exception("Failed to write data in background!") from self._error
+
+    def write_stream(self, data):
+        """
+        Saves the data one by one.
+
+        :param data: the data to write (single record or iterable of records)
+        """
+        self._check_error()
+        self._queue.put((self.session.current_input, data))
+
+    def finalize(self):
+        """
+        Finishes the processing, e.g., for closing files or databases.
+        """
+        super().finalize()
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        if self._writer is not None:
+            self._writer.finalize()
+            self._writer = None
+        self._check_error()
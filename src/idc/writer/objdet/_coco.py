@@ -2,22 +2,34 @@ import argparse
 import json
 import os
 from datetime import datetime
-from typing import List, Iterable, Dict
+from typing import List, Iterable, Dict, Optional, Tuple
+
+import numpy as np
 
 from wai.logging import LOGGING_WARNING
 
-from kasperl.api import SplittableBatchWriter, AnnotationsOnlyWriter, add_annotations_only_writer_param
-from idc.api import ObjectDetectionData, get_object_label
+from kasperl.api import make_list, SplittableBatchWriter, SplittableStreamWriter, AnnotationsOnlyWriter, \
+    add_annotations_only_writer_param
+from idc.api import ObjectDetectionData, get_object_label, polygon_to_rle, rle_compress, rle_decompress, rle_area, \
+    KEY_RLE, KEY_RLE_SIZE, KEY_RLE_CROWD
 from seppl.variables import InputBasedVariableSupporter, variable_list
 
+FRAGMENT_FILE = "annotations-%s.jsonl"
+""" the file name template for the fragment files used by the stream writer. """
+
 
-class COCOObjectDetectionWriter(SplittableBatchWriter, AnnotationsOnlyWriter, InputBasedVariableSupporter):
+class COCOObjectDetectionWriterMixin(AnnotationsOnlyWriter, InputBasedVariableSupporter):
+    """
+    Mixin with the functionality shared by the COCO batch and stream writers.
+    Needs to come before the splittable writer superclass.
+    """
 
     def __init__(self, output_dir: str = None,
                  license_name: str = "default", license_url: str = "",
                  categories: List[str] = None, error_on_new_category: bool = False,
                  default_supercategory: str = "Object", sort_categories: bool = False,
                  category_output_file: str = None, annotations_only: bool = None,
+                 use_rle: bool = None,
                  split_names: List[str] = None, split_ratios: List[int] = None,
                  logger_name: str = None, logging_level: str = LOGGING_WARNING):
         """
@@ -41,6 +53,8 @@ class COCOObjectDetectionWriter(SplittableBatchWriter, AnnotationsOnlyWriter, In
         :type category_output_file: str
         :param annotations_only: whether to output only the annotations and not the images
         :type annotations_only: bool
+        :param use_rle: whether to output the segmentations as compressed RLE rather than polygons
+        :type use_rle: bool
         :param split_names: the names of the splits, no splitting if None
         :type split_names: list
         :param split_ratios: the integer ratios of the splits (must sum up to 100)
@@ -60,28 +74,11 @@ class COCOObjectDetectionWriter(SplittableBatchWriter, AnnotationsOnlyWriter, In
         self.sort_categories = sort_categories
         self.category_output_file = category_output_file
         self.annotations_only = annotations_only
+        self.use_rle = use_rle
         self._category_lookup = None
         self._image_lookup = None
         self._splits = None
 
-    def name(self) -> str:
-        """
-        Returns the name of the handler, used as sub-command.
-
-        :return: the name
-        :rtype: str
-        """
-        return "to-coco-od"
-
-    def description(self) -> str:
-        """
-        Returns a description of the writer.
-
-        :return: the description
-        :rtype: str
-        """
-        return "Saves the bounding box/polygon definitions in MS COCO .json format."
-
     def _create_argparser(self) -> argparse.ArgumentParser:
         """
         Creates an argument parser. Derived classes need to fill in the options.
@@ -99,6 +96,7 @@ class COCOObjectDetectionWriter(SplittableBatchWriter, AnnotationsOnlyWriter, In
         parser.add_argument("--sort_categories", action="store_true", help="Whether to sort the categories.", required=False)
         parser.add_argument("--category_output_file", type=str, help="The name of the file (no path) to store the categories in as comma-separated list.", required=False, default=None)
         add_annotations_only_writer_param(parser)
+        parser.add_argument("--use_rle", action="store_true", help="Whether to output the segmentations as compressed RLE (rasterized polygons/bounding boxes) rather than as polygons.", required=False)
         return parser
 
     def _apply_args(self, ns: argparse.Namespace):
@@ -118,6 +116,7 @@ class COCOObjectDetectionWriter(SplittableBatchWriter, AnnotationsOnlyWriter, In
         self.sort_categories = ns.sort_categories
         self.category_output_file = ns.category_output_file
         self.annotations_only = ns.annotations_only
+        self.use_rle = ns.use_rle
 
     def accepts(self) -> List:
         """
@@ -136,6 +135,8 @@ class COCOObjectDetectionWriter(SplittableBatchWriter, AnnotationsOnlyWriter, In
 
         if self.annotations_only is None:
             self.annotations_only = False
+        if self.use_rle is None:
+            self.use_rle = False
 
         self._category_lookup = dict()
         if self.categories is not None:
@@ -198,26 +199,15 @@ class COCOObjectDetectionWriter(SplittableBatchWriter, AnnotationsOnlyWriter, In
             result.append(category)
         return result
 
-    def _init_annotations(self) -> Dict:
-        """
-        Initializes the annotations structure.
-        """
-        result = dict()
-        result["info"] = self._create_info()
-        result["licenses"] = self._create_licenses()
-        result["images"] = list()
-        result["annotations"] = list()
-        result["categories"] = list()
-        return result
-
-    def _append_image(self, data: Dict, item):
+    def _create_image(self, image_id: int, item) -> Dict:
         """
-        Appends the image to the images section.
+        Creates the image entry.
 
-        :param data: the annotations structure to update
-        :type data: dict
+        :param image_id: the ID of the image
+        :type image_id: int
+        :return: the image entry
+        :rtype: dict
         """
-        image_id = len(data["images"]) + 1
         self._image_lookup[item.image_name] = image_id
         image = dict()
         image["id"] = image_id
@@ -228,31 +218,140 @@ class COCOObjectDetectionWriter(SplittableBatchWriter, AnnotationsOnlyWriter, In
         image["flickr_url"] = ""
         image["coco_url"] = ""
         image["date_captured"] = ""
-        data["images"].append(image)
+        return image
 
-    def _append_annotations(self, data: Dict, item):
+    def _category_id(self, item, label: str) -> int:
         """
-        Appends the annotations to the annotations section.
+        Returns the category ID for the label, adds the label if necessary.
 
-        :param data: the annotations structure to update
-        :type data: dict
+        :param item: the item the label is from
+        :param label: the label to get the ID for
+        :type label: str
+        :return: the category ID
+        :rtype: int
+        """
+        if label not in self._category_lookup:
+            if self.error_on_new_category:
+                raise Exception("Undefined label encountered with image %s: %s" % (item.image_name, label))
+            self._category_lookup[label] = len(self._category_lookup) + 1
+        return self._category_lookup[label]
+
+    def _kept_rle(self, item, meta: Dict) -> Optional[Tuple[Dict, int, int]]:
+        """
+        Returns the RLE segmentation stored in the meta-data of an object, if any.
+
+        :param item: the item the object belongs to
+        :param meta: the meta-data of the object
+        :type meta: dict
+        :return: the tuple of segmentation, crowd flag and area, None if not available or not matching the image
+        :rtype: tuple
+        """
+        if (meta is None) or (meta.get(KEY_RLE) is None):
+            return None
+        size = [int(v) for v in str(meta.get(KEY_RLE_SIZE, "")).split(",") if len(v) > 0]
+        if size != [item.image_height, item.image_width]:
+            self.logger().warning("Size of RLE mask (%s) does not match image (%d,%d), ignoring mask: %s"
+                                  % (str(meta.get(KEY_RLE_SIZE)), item.image_height, item.image_width, item.image_name))
+            return None
+        segmentation = dict()
+        segmentation["size"] = size
+        segmentation["counts"] = meta[KEY_RLE]
+        return segmentation, int(meta.get(KEY_RLE_CROWD, 0)), rle_area(rle_decompress(meta[KEY_RLE]))
+
+    def _rasterized_rle(self, item, x_list: List, y_list: List) -> Tuple[Dict, int]:
+        """
+        Rasterizes the polygon and turns it into a compressed RLE segmentation.
+
+        :param item: the item the polygon belongs to
+        :param x_list: the x coordinates of the polygon
+        :type x_list: list
+        :param y_list: the y coordinates of the polygon
+        :type y_list: list
+        :return: the tuple of segmentation and area
+        :rtype: tuple
         """
+        counts = polygon_to_rle(x_list, y_list, item.image_height, item.image_width)
+        segmentation = dict()
+        segmentation["size"] = [item.image_height, item.image_width]
+        segmentation["counts"] = rle_compress(counts)
+        return segmentation, rle_area(counts)
+
+    def _create_annotations_columnar(self, annotation_id: int, item) -> List[Dict]:
+        """
+        Creates the annotation entries for the item using its columnar annotations.
+
+        :param annotation_id: the ID to use for the first annotation
+        :type annotation_id: int
+        :return: the annotation entries
+        :rtype: list
+        """
+        result = []
+        image_id = self._image_lookup[item.image_name]
+        cols = item.get_columnar()
+        labels = cols.get_labels()
+        boxes = np.column_stack((cols.x, cols.y, cols.width, cols.height)).tolist()
+        box_int = cols.box_int.tolist()
+        # polygons use rounded coordinates, just like LocatedObject.get_polygon_x/y
+        poly_coords = np.round(cols.poly_coords).astype(np.int64)
+        offsets = cols.poly_offsets.tolist()
+        rle_keys = [key for key in [KEY_RLE, KEY_RLE_SIZE, KEY_RLE_CROWD] if key in cols.metadata]
+        for i in range(len(cols)):
+            x, y, w, h = [int(v) if as_int else v for v, as_int in zip(boxes[i], box_int[i])]
+            annotation = dict()
+            annotation["id"] = annotation_id + len(result)
+            annotation["image_id"] = image_id
+            annotation["category_id"] = self._category_id(item, labels[i])
+            annotation["bbox"] = [x, y, w, h]
+            annotation["iscrowd"] = 0
+            rle = None
+            if len(rle_keys) > 0:
+                rle = self._kept_rle(item, {key: cols.metadata[key].get(i) for key in rle_keys})
+            if rle is not None:
+                annotation["segmentation"], annotation["iscrowd"], area = rle
+                annotation["area"] = float(area)
+                result.append(annotation)
+                continue
+            if offsets[i + 1] > offsets[i]:
+                coords = poly_coords[offsets[i]:offsets[i + 1]]
+                px = coords[:, 0]
+                py = coords[:, 1]
+                annotation["area"] = float(abs(int(np.sum(px * np.roll(py, -1) - np.roll(px, -1) * py)))) / 2
+                segmentation = coords.flatten().tolist()
+            else:
+                annotation["area"] = float(w * h)
+                segmentation = [x, y, x + w - 1, y, x + w - 1, y + h - 1, x, y + h - 1]
+            annotation["segmentation"] = [segmentation]
+            result.append(annotation)
+        return result
+
+    def _create_annotations(self, annotation_id: int, item) -> List[Dict]:
+        """
+        Creates the annotation entries for the item.
+
+        :param annotation_id: the ID to use for the first annotation
+        :type annotation_id: int
+        :return: the annotation entries
+        :rtype: list
+        """
+        if item.has_columnar() and not item.is_normalized() and not self.use_rle:
+            return self._create_annotations_columnar(annotation_id, item)
+        result = []
         image_id = self._image_lookup[item.image_name]
         absolute = item.get_absolute()
         for obj in absolute:
-            label = get_object_label(obj)
-            if label not in self._category_lookup:
-                if self.error_on_new_category:
-                    raise Exception("Undefined label encountered with image %s: %s" % (item.image_name, label))
-                self._category_lookup[label] = len(self._category_lookup) + 1
-            category_id = self._category_lookup[label]
-            annotation_id = len(data["annotations"]) + 1
+            category_id = self._category_id(item, get_object_label(obj))
             annotation = dict()
-            annotation["id"] = annotation_id
+            annotation["id"] = annotation_id + len(result)
             annotation["image_id"] = image_id
             annotation["category_id"] = category_id
             annotation["bbox"] = [obj.x, obj.y, obj.width, obj.height]
             annotation["iscrowd"] = 0
+            rle = self._kept_rle(item, obj.metadata)
+            if rle is not None:
+                annotation["segmentation"], annotation["iscrowd"], area = rle
+                annotation["area"] = float(area)
+                result.append(annotation)
+                continue
             if obj.has_polygon():
                 annotation["area"] = float(obj.get_actual_polygon().area())
                 x_list = obj.get_polygon_x()
@@ -261,12 +360,105 @@ class COCOObjectDetectionWriter(SplittableBatchWriter, AnnotationsOnlyWriter, In
                 annotation["area"] = float(obj.width * obj.height)
                 x_list = [obj.x, obj.x + obj.width - 1, obj.x + obj.width - 1, obj.x]
                 y_list = [obj.y, obj.y, obj.y + obj.height - 1, obj.y + obj.height - 1]
+            if self.use_rle:
+                annotation["segmentation"], area = self._rasterized_rle(item, x_list, y_list)
+                annotation["area"] = float(area)
+                result.append(annotation)
+                continue
             segmentation = []
             for x, y in zip(x_list, y_list):
                 segmentation.append(x)
                 segmentation.append(y)
             annotation["segmentation"] = [segmentation]
-            data["annotations"].append(annotation)
+            result.append(annotation)
+        return result
+
+    def _prepare_split(self, sub_dir: str, item):
+        """
+        Creates the output directory of the split if necessary and writes the image (unless annotations only).
+
+        :param sub_dir: the output directory of the split
+        :type sub_dir: str
+        :param item: the item to write the image for
+        """
+        if not os.path.exists(sub_dir):
+            self.logger().info("Creating dir: %s" % sub_dir)
+            os.makedirs(sub_dir)
+
+        # write image
+        path = os.path.join(sub_dir, item.image_name)
+        if not self.annotations_only:
+            self.logger().info("Writing image to: %s" % path)
+            item.save_image(path)
+
+    def _write_categories(self, sub_dir: str):
+        """
+        Writes the categories to the category output file of the split, if one was specified.
+
+        :param sub_dir: the output directory of the split
+        :type sub_dir: str
+        """
+        if self.category_output_file is not None:
+            categories = self._category_lookup.keys()
+            if self.sort_categories:
+                categories = sorted(categories)
+            path = os.path.join(sub_dir, self.category_output_file)
+            self.logger().info("Writing categories to: %s" % path)
+            with open(path, "w") as fp:
+                fp.write(",".join(categories))
+
+
+class COCOObjectDetectionWriter(COCOObjectDetectionWriterMixin, SplittableBatchWriter):
+
+    def name(self) -> str:
+        """
+        Returns the name of the handler, used as sub-command.
+
+        :return: the name
+        :rtype: str
+        """
+        return "to-coco-od"
+
+    def description(self) -> str:
+        """
+        Returns a description of the writer.
+
+        :return: the description
+        :rtype: str
+        """
+        return "Saves the bounding box/polygon definitions in MS COCO .json format. " \
+               "Objects with RLE masks in their meta-data (e.g., crowd annotations) get saved as RLE segmentations. " \
+               "Keeps all annotations in memory, use to-coco-od-stream for large datasets."
+
+    def _init_annotations(self) -> Dict:
+        """
+        Initializes the annotations structure.
+        """
+        result = dict()
+        result["info"] = self._create_info()
+        result["licenses"] = self._create_licenses()
+        result["images"] = list()
+        result["annotations"] = list()
+        result["categories"] = list()
+        return result
+
+    def _append_image(self, data: Dict, item):
+        """
+        Appends the image to the images section.
+
+        :param data: the annotations structure to update
+        :type data: dict
+        """
+        data["images"].append(self._create_image(len(data["images"]) + 1, item))
+
+    def _append_annotations(self, data: Dict, item):
+        """
+        Appends the annotations to the annotations section.
+
+        :param data: the annotations structure to update
+        :type data: dict
+        """
+        data["annotations"].extend(self._create_annotations(len(data["annotations"]) + 1, item))
 
     def write_batch(self, data: Iterable):
         """
@@ -280,15 +472,7 @@ class COCOObjectDetectionWriter(SplittableBatchWriter, AnnotationsOnlyWriter, In
             if self.splitter is not None:
                 split = self.splitter.next()
                 sub_dir = os.path.join(sub_dir, split)
-            if not os.path.exists(sub_dir):
-                self.logger().info("Creating dir: %s" % sub_dir)
-                os.makedirs(sub_dir)
-
-            # write image
-            path = os.path.join(sub_dir, item.image_name)
-            if not self.annotations_only:
-                self.logger().info("Writing image to: %s" % path)
-                item.save_image(path)
+            self._prepare_split(sub_dir, item)
 
             # append annotations
             if sub_dir not in self._splits:
@@ -305,18 +489,147 @@ class COCOObjectDetectionWriter(SplittableBatchWriter, AnnotationsOnlyWriter, In
 
         for sub_dir, annotations in self._splits.items():
             # save annotations
-            annotations["categories"] = self._create_categories()
             path = os.path.join(sub_dir, "annotations.json")
             self.logger().info("Writing annotations to: %s" % path)
+            annotations["categories"] = self._create_categories()
             with open(path, "w") as fp:
                 json.dump(annotations, fp)
 
             # save categories
-            if self.category_output_file is not None:
-                categories = self._category_lookup.keys()
-                if self.sort_categories:
-                    categories = sorted(categories)
-                path = os.path.join(sub_dir, self.category_output_file)
-                self.logger().info("Writing categories to: %s" % path)
-                with open(path, "w") as fp:
-                    fp.write(",".join(categories))
+            self._write_categories(sub_dir)
+
+
+class COCOObjectDetectionStreamWriter(COCOObjectDetectionWriterMixin, SplittableStreamWriter):
+
+    def name(self) -> str:
+        """
+        Returns the name of the handler, used as sub-command.
+
+        :return: the name
+        :rtype: str
+        """
+        return "to-coco-od-stream"
+
+    def description(self) -> str:
+        """
+        Returns a description of the writer.
+
+        :return: the description
+        :rtype: str
+        """
+        return "Saves the bounding box/polygon definitions in MS COCO .json format, without switching the pipeline " \
+               "into batch mode. The images and annotations get appended to fragment files per split as they arrive, " \
+               "which get combined into the annotations file when finishing. " \
+               "Objects with RLE masks in their meta-data (e.g., crowd annotations) get saved as RLE segmentations."
+
+    def _init_fragments(self, sub_dir: str) -> Dict:
+        """
+        Initializes the fragment files for the split.
+
+        :param sub_dir: the output directory of the split
+        :type sub_dir: str
+        :return: the fragments structure
+        :rtype: dict
+        """
+        result = dict()
+        for key in ["images", "annotations"]:
+            path = os.path.join(sub_dir, FRAGMENT_FILE % key)
+            self.logger().info("Writing %s fragments to: %s" % (key, path))
+            result[key] = open(path, "w")
+            result["num_" + key] = 0
+        return result
+
+    def _append_fragments(self, fragments: Dict, key: str, entries: List[Dict]):
+        """
+        Appends the entries to the fragment file, one JSON object per line.
+
+        :param fragments: the fragments structure to update
+        :type fragments: dict
+        :param key: the section to append to (images/annotations)
+        :type key: str
+        :param entries: the entries to append
+        :type entries: list
+        """
+        for entry in entries:
+            fragments[key].write(json.dumps(entry))
+            fragments[key].write("\n")
+        fragments[key].flush()
+        fragments["num_" + key] += len(entries)
+
+    def _write_section(self, fp, sub_dir: str, key: str):
+        """
+        Writes the section of the annotations file from the fragments file and removes the fragments.
+
+        :param fp: the annotations file to write to
+        :param sub_dir: the output directory of the split
+        :type sub_dir: str
+        :param key: the section to write (images/annotations)
+        :type key: str
+        """
+        path = os.path.join(sub_dir, FRAGMENT_FILE % key)
+        fp.write(", %s: [" % json.dumps(key))
+        with open(path, "r") as fp_frag:
+            first = True
+            for line in fp_frag:
+                if not first:
+                    fp.write(", ")
+                fp.write(line.rstrip("\n"))
+                first = False
+        fp.write("]")
+        os.remove(path)
+
+    def _finalize_fragments(self, sub_dir: str, fragments: Dict, path: str):
+        """
+        Combines the fragments of the split into the annotations file.
+
+        :param sub_dir: the output directory of the split
+        :type sub_dir: str
+        :param fragments: the fragments structure of the split
+        :type fragments: dict
+        :param path: the annotations file to write
+        :type path: str
+        """
+        fragments["images"].close()
+        fragments["annotations"].close()
+        with open(path, "w") as fp:
+            fp.write('{"info": %s' % json.dumps(self._create_info()))
+            fp.write(', "licenses": %s' % json.dumps(self._create_licenses()))
+            self._write_section(fp, sub_dir, "images")
+            self._write_section(fp, sub_dir, "annotations")
+            fp.write(', "categories": %s}' % json.dumps(self._create_categories()))
+
+    def write_stream(self, data):
+        """
+        Saves the data one by one.
+
+        :param data: the data to write (single record or iterable of records)
+        """
+        for item in make_list(data):
+            sub_dir = self.session.expand_variables(self.output_dir)
+            if self.splitter is not None:
+                split = self.splitter.next(item=item.image_name)
+                sub_dir = os.path.join(sub_dir, split)
+            self._prepare_split(sub_dir, item)
+
+            # append annotations
+            if sub_dir not in self._splits:
+                self._splits[sub_dir] = self._init_fragments(sub_dir)
+            fragments = self._splits[sub_dir]
+            self._append_fragments(fragments, "images", [self._create_image(fragments["num_images"] + 1, item)])
+            if item.has_annotation():
+                self._append_fragments(fragments, "annotations", self._create_annotations(fragments["num_annotations"] + 1, item))
+
+    def finalize(self):
+        """
+        Finishes the processing, e.g., for closing files or databases.
+        """
+        super().finalize()
+
+        for sub_dir, fragments in self._splits.items():
+            # save annotations
+            path = os.path.join(sub_dir, "annotations.json")
+            self.logger().info("Writing annotations to: %s" % path)
+            self._finalize_fragments(sub_dir, fragments, path)
+
+            # save categories
+            self._write_categories(sub_dir)
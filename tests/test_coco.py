@@ -0,0 +1,42 @@
+import io
+import json
+
+from idc.reader.objdet._coco import _iterate_json_object
+
+
+DOCUMENT = '{"a": [1.5, 2.25, -3e-2, 1E+3], "b": 3.75, "c": {"x": [true, false, null]}, ' \
+           '"d": [], "e": "some \\"text\\" \\u00e9", "f" : [ {"g": 10, "h": [0.125, 7]} , 12 ] , "i": 1000000}'
+
+
+def _parse(document: str, chunk_size: int) -> dict:
+    result = dict()
+    lists = set()
+    for key, value in _iterate_json_object(io.StringIO(document), chunk_size=chunk_size):
+        if key in lists:
+            result[key].append(value)
+        elif key in result:
+            result[key] = [result[key], value]
+            lists.add(key)
+        else:
+            result[key] = value
+    return result
+
+
+def test_parse_all_chunk_sizes():
+    expected = json.loads(DOCUMENT)
+    for chunk_size in range(1, len(DOCUMENT) + 2):
+        parsed = _parse(DOCUMENT, chunk_size)
+        for key in expected:
+            value = expected[key]
+            if isinstance(value, list) and (len(value) == 1):
+                value = value[0]
+            if isinstance(value, list) and (len(value) == 0):
+                assert key not in parsed, "chunk size %d: %s" % (chunk_size, key)
+                continue
+            assert parsed[key] == value, "chunk size %d: %s" % (chunk_size, key)
+
+
+def test_reviewer_example():
+    document = '{"a": [1.5, 2.25], "b": 3.75}'
+    for chunk_size in [1, 2, 3, 7, 9]:
+        assert _parse(document, chunk_size) == json.loads(document)
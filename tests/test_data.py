@@ -0,0 +1,62 @@
+import io
+import os
+
+from PIL import Image
+from wai.common.adams.imaging.locateobjects import LocatedObjects, LocatedObject
+
+from idc.api import ImageClassificationData, ObjectDetectionData
+from idc.filter import RemoveAlpha
+
+
+def _rgba_png() -> bytes:
+    img = Image.new("RGBA", (8, 6), (255, 0, 0, 128))
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_duplicate_with_image_drops_data():
+    item = ImageClassificationData(image_name="test.png", data=_rgba_png())
+    dup = item.duplicate(image=Image.new("RGB", (4, 3)))
+    assert dup.data is None
+    assert dup.image_dirty
+    assert dup.image_size == (4, 3)
+    assert Image.open(io.BytesIO(dup.image_bytes)).mode == "RGB"
+
+
+def test_duplicate_with_image_ignores_source(tmp_path):
+    path = os.path.join(str(tmp_path), "test.png")
+    with open(path, "wb") as fp:
+        fp.write(_rgba_png())
+    item = ImageClassificationData(source=path)
+    dup = item.duplicate(image=Image.new("RGB", (4, 3)))
+    assert dup.image_dirty
+    output = os.path.join(str(tmp_path), "output.png")
+    assert dup.save_image(output)
+    with Image.open(output) as img:
+        assert img.mode == "RGB"
+        assert img.size == (4, 3)
+
+
+def test_remove_alpha_then_save(tmp_path):
+    item = ImageClassificationData(image_name="test.png", data=_rgba_png())
+    f = RemoveAlpha()
+    f.initialize()
+    result = f.process(item)
+    output = os.path.join(str(tmp_path), "output.png")
+    assert result.save_image(output)
+    with Image.open(output) as img:
+        assert img.mode == "RGB"
+
+
+def test_read_only_access_keeps_sharing():
+    ann = LocatedObjects([LocatedObject(1, 2, 3, 4, type="cat")])
+    item = ObjectDetectionData(image_name="test.png", data=_rgba_png(), annotation=ann)
+    dup = item.duplicate()
+    assert dup.has_annotation()
+    assert dup.to_dict()["annotation"]["objects"][0]["x"] == 1
+    assert dup.image_size == (8, 6)
+    # still shared, copy only happens when accessing the annotation property
+    assert dup._peek_annotation() is item._peek_annotation()
+    assert dup.annotation is not item._peek_annotation()
+    assert item.annotation is ann
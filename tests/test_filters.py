@@ -0,0 +1,64 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+from wai.common.adams.imaging.locateobjects import LocatedObjects, LocatedObject
+
+from idc.api import ImageSegmentationData, ImageSegmentationAnnotations, ObjectDetectionData
+from idc.filter import RGBToGrayscale, ImageSegmentationToObjectDetection, ObjectDetectionToImageClassification, \
+    ObjectDetectionToImageSegmentation
+
+
+def _rgb_jpg() -> bytes:
+    img = Image.new("RGB", (20, 10), (255, 0, 0))
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def _process(f, item):
+    f.initialize()
+    return f.process(item)
+
+
+def test_dirty_image_to_od_bytes():
+    layer = np.zeros((10, 20), dtype=np.uint8)
+    layer[2:8, 5:15] = 255
+    ann = ImageSegmentationAnnotations(labels=["cat"], layers={"cat": layer})
+    item = ImageSegmentationData(image_name="test.jpg", data=_rgb_jpg(), annotation=ann)
+    gray = _process(RGBToGrayscale(), item)
+    assert gray.image_dirty
+    od = _process(ImageSegmentationToObjectDetection(labels=["cat"]), gray)
+    assert od.image_format == "JPEG"
+    img = Image.open(io.BytesIO(od.image_bytes))
+    assert img.format == "JPEG"
+    assert img.mode == "L"
+    assert len(od.annotation) == 1
+    od.to_dict()
+
+
+def test_dirty_image_to_ic_bytes():
+    item = ObjectDetectionData(image_name="test.jpg", image=Image.new("L", (20, 10)))
+    assert item.image_format == "JPEG"
+    ic = _process(ObjectDetectionToImageClassification(), item)
+    assert Image.open(io.BytesIO(ic.image_bytes)).format == "JPEG"
+
+
+def test_od_to_is_index_map_requires_labels():
+    f = ObjectDetectionToImageSegmentation(regexp="c.*", index_map=True)
+    with pytest.raises(Exception):
+        f.initialize()
+
+
+def test_od_to_is_index_map_unknown_label():
+    ann = LocatedObjects([LocatedObject(1, 2, 5, 5, type="cat"), LocatedObject(3, 2, 5, 5, type="cow")])
+    item = ObjectDetectionData(image_name="test.jpg", image=Image.new("L", (20, 10)), annotation=ann)
+    f = ObjectDetectionToImageSegmentation(labels=["cat"], regexp="c.*", index_map=True)
+    f.initialize()
+    with pytest.raises(Exception):
+        f.process(item)
+    f = ObjectDetectionToImageSegmentation(labels=["cat", "cow"], index_map=True)
+    f.initialize()
+    result = f.process(item)
+    assert result.annotation.present_labels() == ["cat", "cow"]
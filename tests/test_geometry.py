@@ -0,0 +1,23 @@
+import numpy as np
+import shapely
+
+from idc.api import polygon_iou_matrix, intersect_over_union
+
+
+def _polygons(rng, n: int) -> np.ndarray:
+    result = []
+    for i in range(n):
+        x, y = rng.uniform(0, 100, size=2)
+        result.append(shapely.Point(x, y).buffer(rng.uniform(1, 20)))
+    result.append(shapely.box(0, 0, 10, 10))
+    return np.array(result, dtype=object)
+
+
+def test_polygon_iou_matrix():
+    rng = np.random.default_rng(42)
+    polys1 = _polygons(rng, 20)
+    polys2 = _polygons(rng, 15)
+    expected = np.array([[intersect_over_union(p1, p2) for p2 in polys2] for p1 in polys1])
+    assert np.allclose(polygon_iou_matrix(polys1, polys2), expected)
+    shapely.prepare(polys2)
+    assert np.allclose(polygon_iou_matrix(polys1, polys2, prepared=True), expected)
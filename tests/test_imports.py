@@ -0,0 +1,19 @@
+import subprocess
+import sys
+
+
+def test_api_import_is_lazy():
+    code = "import sys\n" \
+           "import idc.api\n" \
+           "print(','.join(m for m in ['cv2', 'shapely', 'matplotlib'] if m in sys.modules))\n"
+    output = subprocess.check_output([sys.executable, "-c", code], text=True)
+    assert output.strip() == ""
+
+
+def test_lazy_names_resolve():
+    code = "import sys\n" \
+           "import idc.api\n" \
+           "idc.api.merge_polygons\n" \
+           "print('shapely' in sys.modules)\n"
+    output = subprocess.check_output([sys.executable, "-c", code], text=True)
+    assert output.strip() == "True"
@@ -0,0 +1,30 @@
+from wai.common.adams.imaging.locateobjects import LocatedObjects, LocatedObject
+
+from idc.api import ObjectDetectionData, ColumnarLocatedObjects
+
+
+def _objects() -> LocatedObjects:
+    result = LocatedObjects()
+    result.append(LocatedObject(10, 20, 30, 40, type="cat"))
+    return result
+
+
+def test_get_normalized_after_inplace_edits():
+    item = ObjectDetectionData(image_name="test.png", image_size=(100, 200), annotation=_objects())
+    ann = item.annotation
+    assert item.get_normalized()[0].x == 0.1
+    ann[0].x = 50
+    assert item.get_normalized()[0].x == 0.5
+    ann.append(LocatedObject(0, 0, 10, 10, type="dog"))
+    assert len(item.get_normalized()) == 2
+
+
+def test_converted_annotations_not_shared():
+    item = ObjectDetectionData(image_name="test.png", image_size=(100, 200))
+    item.set_columnar(ColumnarLocatedObjects.from_located_objects(_objects()))
+    first = item.get_normalized()
+    first[0].x = 0.9
+    first.append(first[0])
+    second = item.get_normalized()
+    assert len(second) == 1
+    assert second[0].x == 0.1